@@ -6,6 +6,7 @@
 import errno
 import os
 import select
+import timers
 import traceback
 import logging
 
@@ -48,15 +49,30 @@ class BaseEvent(object):
     def poll(self):
         pass
 
+    ##Unregister function of BaseEvent class.
+    # @ param fd (int) fd to unregister
+    def unregister(self, fd):
+        pass
+
+    ##Whether one instance is kept for the whole run, with registrations
+    #updated incrementally, instead of being built every iteration
+    PERSISTENT = False
+
 from tcpserver import DisconnectError
 
 ## Poll event.
 #
+# Keeps one poll object for the whole run, registering a file
+# descriptor again modifies its mask.
+#
 class PollEvent(BaseEvent):
 
     ##Name of class
     NAME = "poll"
 
+    ##One instance is kept for the whole run
+    PERSISTENT = True
+
     ##Init function of PollEvent.
     # @returns (PollEvent) PollEvent object
     def __init__(self):
@@ -70,12 +86,20 @@ class PollEvent(BaseEvent):
     def register(self, fd, mask):
         self._poller.register(fd, mask)
 
+    ##Unregister function of PollEvent.
+    # @ param fd (int) fd to unregister
+    def unregister(self, fd):
+        try:
+            self._poller.unregister(fd)
+        except KeyError:
+            pass
+
     ##Poll function.
     # Calls system call poll and returns the output.
     # @param timeout (int) timeout for poll system call in milliseconds
     # @returns (list) list of 2-length tuples: fd and event.
     def poll(self, timeout):
-        return self._poller.poll(timeout)
+        return self._poller.poll(max(timeout, 0))
 
 ## Select event.
 #
@@ -108,7 +132,7 @@ class SelectEvent(BaseEvent):
             if mask & BaseEvent.POLLOUT:
                 write.append(fd)
             error.append(fd)
-        read, write, error = select.select(read, write, error, timeout / 1000.0)
+        read, write, error = select.select(read, write, error, max(timeout, 0) / 1000.0)
         poller = []
         for fd in read:
             poller.append((fd, BaseEvent.POLLIN))
@@ -118,22 +142,125 @@ class SelectEvent(BaseEvent):
             poller.append((fd, BaseEvent.POLLERR))
         return poller
 
+if hasattr(select, "epoll"):
+
+    ## Epoll event.
+    #
+    # Keeps one epoll instance for the whole run, and only modifies the
+    # registration of a file descriptor when its mask changes. Linux only.
+    #
+    class EpollEvent(BaseEvent):
+
+        ##Name of class
+        NAME = "epoll"
+
+        ##One instance is kept for the whole run
+        PERSISTENT = True
+
+        ##Init function of EpollEvent.
+        # @returns (EpollEvent) EpollEvent object
+        def __init__(self):
+            ##Epoll object
+            self._poller = select.epoll()
+            ##Dictionary of registered file descriptors to IO masks
+            self._masks = {}
+
+        ##Register function of EpollEvent.
+        # Registers a file descriptor with a mask, or modifies its
+        # registration if the mask has changed.
+        # @ param fd (int) fd to register
+        # @ param mask (int) mask to register with
+        def register(self, fd, mask):
+            if fd not in self._masks:
+                try:
+                    self._poller.register(fd, mask)
+                except IOError as e:
+                    if e.errno != errno.EEXIST:
+                        raise
+                    self._poller.modify(fd, mask)
+            elif self._masks[fd] != mask:
+                self._poller.modify(fd, mask)
+            self._masks[fd] = mask
+
+        ##Unregister function of EpollEvent.
+        # The file descriptor may have been closed already, which removes
+        # it from the epoll object.
+        # @ param fd (int) fd to unregister
+        def unregister(self, fd):
+            if self._masks.pop(fd, None) is not None:
+                try:
+                    self._poller.unregister(fd)
+                except IOError as e:
+                    if e.errno not in (errno.EBADF, errno.ENOENT):
+                        raise
+
+        ##Poll function.
+        # Calls system call epoll_wait and returns the output.
+        # @param timeout (int) timeout for epoll_wait system call in milliseconds
+        # @returns (list) list of 2-length tuples: fd and event.
+        def poll(self, timeout):
+            return self._poller.poll(max(timeout, 0) / 1000.0)
+
+    ## Edge-triggered epoll event.
+    #
+    # Like EpollEvent, with file descriptors registered edge-triggered,
+    # so idle ones are never reported again. File descriptors reported
+    # by the last poll are re-armed on their next registration, as
+    # their handlers may have left data unread.
+    #
+    class EdgeTriggeredEpollEvent(EpollEvent):
+
+        ##Name of class
+        NAME = "epoll-et"
+
+        ##Init function of EdgeTriggeredEpollEvent.
+        # @returns (EdgeTriggeredEpollEvent) EdgeTriggeredEpollEvent object
+        def __init__(self):
+            super(EdgeTriggeredEpollEvent, self).__init__()
+            ##File descriptors reported by the last poll
+            self._active = set()
+
+        ##Register function of EdgeTriggeredEpollEvent.
+        # @ param fd (int) fd to register
+        # @ param mask (int) mask to register with
+        def register(self, fd, mask):
+            mask |= select.EPOLLET
+            if fd in self._active and self._masks.get(fd) == mask:
+                self._poller.modify(fd, mask)
+            else:
+                super(EdgeTriggeredEpollEvent, self).register(fd, mask)
+
+        ##Poll function.
+        # @param timeout (int) timeout for epoll_wait system call in milliseconds
+        # @returns (list) list of 2-length tuples: fd and event.
+        def poll(self, timeout):
+            events = super(EdgeTriggeredEpollEvent, self).poll(timeout)
+            self._active = set(fd for fd, event in events)
+            return events
+
 ##Map of class name to class for each event type
 MAP = {
     e.NAME: e for e in BaseEvent.__subclasses__()
 }
+if "epoll" in MAP:
+    MAP[EdgeTriggeredEpollEvent.NAME] = EdgeTriggeredEpollEvent
 
 ##Decides default poller type based on OS
 # @returns (string) poller type
 def default_poller_type():
     if os.name == "nt":
         return 'select'
+    elif "epoll" in MAP:
+        return 'epoll'
     else:
         return 'poll'
 
 ## Poller object.
 #
-# Holds fds and their according object and polls them.
+# Holds fds and their according object and polls them. Only pollables
+# whose state changed, by an event or by schedule_update(), are updated
+# and have their IO masks registered again before the next poll, so
+# idle pollables cost nothing per iteration.
 #
 class Poller(object):
 
@@ -150,24 +277,49 @@ class Poller(object):
         self._type = type
         ##Dictionary of file descriptors to matching objects
         self._pollables = {}
+        ##File descriptors of pollables to update before the next poll
+        self._changed = set()
+        ##File descriptors of pollables to register again before the
+        #next poll
+        self._registrations = set()
         ##Poll/Select default timeout
         self._timeout = timeout
+        ##Event object of persistent poller types, built once
+        self._poller = None
+        ##Timer service of every pollable and connection
+        self._timers = timers.TimerService()
 
     ##Register a pollable object with an fd to the poller object.
     # @param pollable (PollableObject) Pollable Object
     def register(self, pollable):
         self._pollables[pollable.fileno] = pollable
+        self._changed.add(pollable.fileno)
+
+    ##Schedule update of a pollable whose state changed outside its
+    #events, and registration of its IO mask, before the next poll.
+    # @param pollable (PollableObject) Pollable Object
+    def schedule_update(self, pollable):
+        self._changed.add(pollable.fileno)
 
-    ##Main loop of program. Builds poller, updates
+    ##Receive I/O event of a pollable. The pollable is updated before
+    #the next poll.
+    # @param fd (int) file descriptor of pollable
+    # @param event (int) event mask
+    def receive_event(self, fd, event):
+        self._changed.add(fd)
+        self._pollables[fd].receive_event(event)
+
+    ##Main loop of program. Fires expired timers, builds poller, updates
     #pollables, calls on them for events etc.
     def run(self):
         while self._pollables:
             try:
+                self._timers.run_expired()
                 self.update()
                 for fd, event in self.init_poller().poll(self.get_min_sleep_time()):
                     try:
                         try:
-                            self._pollables[fd].receive_event(event)
+                            self.receive_event(fd, event)
                         except IOError as e:
                             if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
                                 raise
@@ -197,18 +349,25 @@ class Poller(object):
                 else:
                     self.init_close()
 
-    ##Init a poller of the matching class
-    # @returns (BaseEvent) PollEvent or SelectEvent
+    ##Init a poller of the matching class, or update the registrations
+    #of a persistent one for the pollables updated since the last poll.
+    # @returns (BaseEvent) PollEvent, SelectEvent or EpollEvent
     def init_poller(self):
-        poller = self._type()
-        for fd, pollable in self._pollables.items():
-            poller.register(fd, pollable.get_io_mask())
-        return poller
+        if self._poller is None or not self._type.PERSISTENT:
+            self._poller = self._type()
+            self._registrations = set(self._pollables)
+        for fd in self._registrations:
+            self._poller.register(fd, self._pollables[fd].get_io_mask())
+        self._registrations.clear()
+        return self._poller
 
-    ##Updates every pollable in the record
+    ##Updates every pollable whose state changed since the last update.
+    #Pollables changed by the updates are updated too.
     def update(self):
-        for fd, pollable in self._pollables.items()[:]:
-            pollable.update()
+        while self._changed:
+            fd = self._changed.pop()
+            self._registrations.add(fd)
+            self._pollables[fd].update()
 
     ##Starts clean close, moves every pollable to closing state.
     def init_close(self):
@@ -225,16 +384,19 @@ class Poller(object):
     # @param fd (int) file descriptor of pollable to deregister
     def deregister(self, fd):
         del self._pollables[fd]
+        self._changed.discard(fd)
+        self._registrations.discard(fd)
+        if self._poller is not None:
+            self._poller.unregister(fd)
 
-    ##Calculates sleep time of next poll() call by
-    #calculating minimum of all sleep times wanted by pollables.
+    ##Calculates sleep time of next poll() call, until the next timer
+    #fires.
     # @ returns (int) timeout in milliseconds
     def get_min_sleep_time(self):
-        if self._pollables:
-            return min(
-                [
-                    pollable.get_sleep_time() for pollable in self._pollables.values()
-                ]
-            )
-        else:
-            return self._timeout
+        return self._timers.get_sleep_time(self._timeout)
+
+    ##Property method for timer service.
+    # @returns (TimerService) timer service of the poller
+    @property
+    def timers(self):
+        return self._timers
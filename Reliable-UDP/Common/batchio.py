@@ -0,0 +1,340 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Common.batchio
+## @file batchio.py Implementation of @ref Reliable-UDP.Common.batchio
+
+import errno
+import socket
+import struct
+
+try:
+    import ctypes
+    import ctypes.util
+    ##C library, None if it can't be loaded
+    _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if not hasattr(_libc, "recvmmsg") or not hasattr(_libc, "sendmmsg"):
+        _libc = None
+except (ImportError, OSError, TypeError):
+    _libc = None
+
+if _libc is not None:
+
+    ## C struct iovec.
+    #
+    class _IOVec(ctypes.Structure):
+        _fields_ = [
+            ("iov_base", ctypes.c_void_p),
+            ("iov_len", ctypes.c_size_t),
+        ]
+
+    ## C struct msghdr.
+    #
+    class _MsgHdr(ctypes.Structure):
+        _fields_ = [
+            ("msg_name", ctypes.c_void_p),
+            ("msg_namelen", ctypes.c_uint32),
+            ("msg_iov", ctypes.POINTER(_IOVec)),
+            ("msg_iovlen", ctypes.c_size_t),
+            ("msg_control", ctypes.c_void_p),
+            ("msg_controllen", ctypes.c_size_t),
+            ("msg_flags", ctypes.c_int),
+        ]
+
+    ## C struct mmsghdr.
+    #
+    class _MMsgHdr(ctypes.Structure):
+        _fields_ = [
+            ("msg_hdr", _MsgHdr),
+            ("msg_len", ctypes.c_uint),
+        ]
+
+    _libc.recvmmsg.argtypes = [
+        ctypes.c_int,
+        ctypes.POINTER(_MMsgHdr),
+        ctypes.c_uint,
+        ctypes.c_int,
+        ctypes.c_void_p,
+    ]
+    _libc.recvmmsg.restype = ctypes.c_int
+    _libc.sendmmsg.argtypes = [
+        ctypes.c_int,
+        ctypes.POINTER(_MMsgHdr),
+        ctypes.c_uint,
+        ctypes.c_int,
+    ]
+    _libc.sendmmsg.restype = ctypes.c_int
+
+##Size of a struct sockaddr buffer, large enough for any address family
+_SOCKADDR_SIZE = 128
+##Port of a struct sockaddr_in, in network order
+_SOCKADDR_IN_PORT = struct.Struct("!H")
+##Family of a struct sockaddr_in, in host order
+_SOCKADDR_IN_FAMILY = struct.Struct("=H")
+##Size of a struct sockaddr_in
+_SOCKADDR_IN_SIZE = 16
+
+##Parse a struct sockaddr_in.
+# @param raw (string) raw address
+# @returns (tuple) address and port
+def _parse_sockaddr_in(raw):
+    return (
+        socket.inet_ntoa(raw[4:8]),
+        _SOCKADDR_IN_PORT.unpack_from(raw, 2)[0],
+    )
+
+##Build a struct sockaddr_in.
+# @param address (tuple) address and port
+# @returns (string) raw address
+def _build_sockaddr_in(address):
+    addr, port = address
+    return (
+        _SOCKADDR_IN_FAMILY.pack(socket.AF_INET)
+        + _SOCKADDR_IN_PORT.pack(port)
+        + socket.inet_aton(addr)
+    ).ljust(_SOCKADDR_IN_SIZE, "\0")
+
+## Batch receiver base.
+#
+# Receives up to a batch of datagrams from a non-blocking datagram socket
+# in one call, into buffers allocated once.
+#
+class BatchReceiver(object):
+
+    ##Init function of BatchReceiver.
+    # @param s (socket) non-blocking datagram socket
+    # @param batch_size (int) max datagrams per call
+    # @param buffer_size (int) max size of a datagram
+    # @returns (BatchReceiver) BatchReceiver object
+    def __init__(self, s, batch_size, buffer_size):
+        ##Socket
+        self._s = s
+        ##Max datagrams per call
+        self._batch_size = batch_size
+        ##Max size of a datagram
+        self._buffer_size = buffer_size
+
+    ##Receive available datagrams, up to a batch.
+    # @returns (list) list of (datagram, address) tuples
+    def receive(self):
+        return []
+
+
+## Batch receiver with the recvmmsg system call.
+#
+# One system call for the whole batch. Linux only.
+#
+class MMsgReceiver(BatchReceiver):
+
+    ##Init function of MMsgReceiver.
+    # @param s (socket) non-blocking datagram socket
+    # @param batch_size (int) max datagrams per call
+    # @param buffer_size (int) max size of a datagram
+    # @returns (MMsgReceiver) MMsgReceiver object
+    def __init__(self, s, batch_size, buffer_size):
+        super(MMsgReceiver, self).__init__(s, batch_size, buffer_size)
+        ##Data buffers, one per datagram
+        self._buffers = [
+            ctypes.create_string_buffer(buffer_size) for i in range(batch_size)
+        ]
+        ##Address buffers, one per datagram
+        self._names = [
+            ctypes.create_string_buffer(_SOCKADDR_SIZE) for i in range(batch_size)
+        ]
+        ##I/O vectors, one per datagram
+        self._iovecs = (_IOVec * batch_size)()
+        ##Message headers passed to recvmmsg
+        self._msgs = (_MMsgHdr * batch_size)()
+        for i in range(batch_size):
+            self._iovecs[i].iov_base = ctypes.addressof(self._buffers[i])
+            self._iovecs[i].iov_len = buffer_size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self._names[i])
+            hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            hdr.msg_iovlen = 1
+
+    ##Receive available datagrams, up to a batch.
+    # @returns (list) list of (datagram, address) tuples
+    def receive(self):
+        for i in range(self._batch_size):
+            self._msgs[i].msg_hdr.msg_namelen = _SOCKADDR_SIZE
+        n = _libc.recvmmsg(self._s.fileno(), self._msgs, self._batch_size, 0, None)
+        if n < 0:
+            e = ctypes.get_errno()
+            if e in (errno.EWOULDBLOCK, errno.EAGAIN):
+                return []
+            raise IOError(e, "recvmmsg: %s" % errno.errorcode.get(e, e))
+        datagrams = []
+        for i in range(n):
+            hdr = self._msgs[i].msg_hdr
+            datagrams.append(
+                (
+                    ctypes.string_at(self._buffers[i], self._msgs[i].msg_len),
+                    _parse_sockaddr_in(self._names[i].raw[:hdr.msg_namelen]),
+                )
+            )
+        return datagrams
+
+
+## Batch receiver with a recvfrom_into loop.
+#
+# One system call per datagram, into a buffer allocated once. Used
+# where recvmmsg is not available.
+#
+class LoopReceiver(BatchReceiver):
+
+    ##Init function of LoopReceiver.
+    # @param s (socket) non-blocking datagram socket
+    # @param batch_size (int) max datagrams per call
+    # @param buffer_size (int) max size of a datagram
+    # @returns (LoopReceiver) LoopReceiver object
+    def __init__(self, s, batch_size, buffer_size):
+        super(LoopReceiver, self).__init__(s, batch_size, buffer_size)
+        ##Data buffer
+        self._buffer = bytearray(buffer_size)
+
+    ##Receive available datagrams, up to a batch.
+    # @returns (list) list of (datagram, address) tuples
+    def receive(self):
+        datagrams = []
+        try:
+            while len(datagrams) < self._batch_size:
+                n, address = self._s.recvfrom_into(self._buffer)
+                datagrams.append((bytes(self._buffer[:n]), address))
+        except IOError as e:
+            if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
+                raise
+        return datagrams
+
+## Batch sender base.
+#
+# Sends a batch of datagrams on a non-blocking datagram socket in one
+# call, as many as the socket takes.
+#
+class BatchSender(object):
+
+    ##Init function of BatchSender.
+    # @param s (socket) non-blocking datagram socket
+    # @param batch_size (int) max datagrams per call
+    # @returns (BatchSender) BatchSender object
+    def __init__(self, s, batch_size):
+        ##Socket
+        self._s = s
+        ##Max datagrams per call
+        self._batch_size = batch_size
+
+    ##Send datagrams, up to a batch. Datagrams the socket refuses as
+    #larger than the path MTU known to the kernel (EMSGSIZE) are passed
+    #over, the rest of the batch is still sent.
+    # @param datagrams (list) list of (datagram, address) tuples
+    # @returns (list) for each datagram done with, from the start of the
+    # list, whether it was sent (True) or refused as too large (False)
+    def send(self, datagrams):
+        return []
+
+
+## Batch sender with the sendmmsg system call.
+#
+# One system call for the whole batch. Linux only.
+#
+class MMsgSender(BatchSender):
+
+    ##Init function of MMsgSender.
+    # @param s (socket) non-blocking datagram socket
+    # @param batch_size (int) max datagrams per call
+    # @param buffer_size (int) max size of a datagram
+    # @returns (MMsgSender) MMsgSender object
+    def __init__(self, s, batch_size, buffer_size):
+        super(MMsgSender, self).__init__(s, batch_size)
+        ##Data buffers, one per datagram
+        self._buffers = [
+            ctypes.create_string_buffer(buffer_size) for i in range(batch_size)
+        ]
+        ##Address buffers, one per datagram
+        self._names = [
+            ctypes.create_string_buffer(_SOCKADDR_IN_SIZE) for i in range(batch_size)
+        ]
+        ##I/O vectors, one per datagram
+        self._iovecs = (_IOVec * batch_size)()
+        ##Message headers passed to sendmmsg
+        self._msgs = (_MMsgHdr * batch_size)()
+        for i in range(batch_size):
+            self._iovecs[i].iov_base = ctypes.addressof(self._buffers[i])
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = ctypes.addressof(self._names[i])
+            hdr.msg_namelen = _SOCKADDR_IN_SIZE
+            hdr.msg_iov = ctypes.pointer(self._iovecs[i])
+            hdr.msg_iovlen = 1
+
+    ##Send datagrams, up to a batch. sendmmsg stops at a datagram it
+    #refuses, and fails with its error when it is the first of the batch.
+    # @param datagrams (list) list of (datagram, address) tuples
+    # @returns (list) for each datagram done with, from the start of the
+    # list, whether it was sent (True) or refused as too large (False)
+    def send(self, datagrams):
+        n = min(len(datagrams), self._batch_size)
+        for i in range(n):
+            data, address = datagrams[i]
+            ctypes.memmove(self._names[i], _build_sockaddr_in(address), _SOCKADDR_IN_SIZE)
+            ctypes.memmove(self._buffers[i], data, len(data))
+            self._iovecs[i].iov_len = len(data)
+        sent = _libc.sendmmsg(self._s.fileno(), self._msgs, n, 0)
+        if sent < 0:
+            e = ctypes.get_errno()
+            if e in (errno.EWOULDBLOCK, errno.EAGAIN):
+                return []
+            if e == errno.EMSGSIZE:
+                return [False]
+            raise IOError(e, "sendmmsg: %s" % errno.errorcode.get(e, e))
+        return [True] * sent
+
+
+## Batch sender with a sendto loop.
+#
+# One system call per datagram. Used where sendmmsg is not available.
+#
+class LoopSender(BatchSender):
+
+    ##Send datagrams, up to a batch. Datagrams the socket refuses as
+    #larger than the path MTU known to the kernel (EMSGSIZE) are passed
+    #over, the rest of the batch is still sent.
+    # @param datagrams (list) list of (datagram, address) tuples
+    # @returns (list) for each datagram done with, from the start of the
+    # list, whether it was sent (True) or refused as too large (False)
+    def send(self, datagrams):
+        results = []
+        try:
+            for data, address in datagrams[:self._batch_size]:
+                try:
+                    self._s.sendto(data, address)
+                    results.append(True)
+                except IOError as e:
+                    if e.errno != errno.EMSGSIZE:
+                        raise
+                    results.append(False)
+        except IOError as e:
+            if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
+                raise
+        return results
+
+##Returns the best batch receiver available.
+# @param s (socket) non-blocking AF_INET datagram socket
+# @param batch_size (int) max datagrams per call
+# @param buffer_size (int) max size of a datagram
+# @returns (BatchReceiver) batch receiver object
+def batch_receiver(s, batch_size, buffer_size):
+    if _libc is not None and s.family == socket.AF_INET:
+        return MMsgReceiver(s, batch_size, buffer_size)
+    return LoopReceiver(s, batch_size, buffer_size)
+
+##Returns a batch sender. The sendto loop is the default: from Python
+#the per-datagram cost of filling the ctypes structures outweighs the
+#system calls sendmmsg saves.
+# @param s (socket) non-blocking AF_INET datagram socket
+# @param batch_size (int) max datagrams per call
+# @param buffer_size (int) max size of a datagram
+# @param mmsg (bool) use sendmmsg where available
+# @returns (BatchSender) batch sender object
+def batch_sender(s, batch_size, buffer_size, mmsg=False):
+    if mmsg and _libc is not None and s.family == socket.AF_INET:
+        return MMsgSender(s, batch_size, buffer_size)
+    return LoopSender(s, batch_size)
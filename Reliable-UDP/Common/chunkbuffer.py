@@ -0,0 +1,131 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Common.chunkbuffer
+## @file chunkbuffer.py Implementation of @ref Reliable-UDP.Common.chunkbuffer
+
+import collections
+
+## Chunk Buffer
+#
+# Byte buffer kept as a queue of chunks. Appending a chunk and consuming
+# bytes from the front do not copy the rest of the buffer, so a buffer
+# of megabytes drained a few kilobytes at a time stays linear.
+#
+class ChunkBuffer(object):
+
+    ##Init function of ChunkBuffer.
+    # @param data (string) initial data
+    # @returns (ChunkBuffer) ChunkBuffer object
+    def __init__(self, data=""):
+        ##Queue of chunks
+        self._chunks = collections.deque()
+        ##Bytes of the first chunk already consumed
+        self._offset = 0
+        ##Number of bytes in buffer
+        self._size = 0
+        self.append(data)
+
+    ##Appends data to the end of the buffer.
+    # @param data (string) data, bytearray is copied
+    def append(self, data):
+        if not data:
+            return
+        if isinstance(data, bytearray):
+            data = bytes(data)
+        self._chunks.append(data)
+        self._size += len(data)
+
+    ##Returns up to size bytes from the front without consuming them:
+    #a view of the first chunk when it is long enough, else the first
+    #chunks joined.
+    # @param size (int) max number of bytes
+    # @returns (memoryview or string) data
+    def peek(self, size):
+        first = self._chunks[0]
+        if len(first) - self._offset >= size or len(self._chunks) == 1:
+            return memoryview(first)[self._offset:self._offset + size]
+        parts = []
+        total = -self._offset
+        for chunk in self._chunks:
+            parts.append(chunk)
+            total += len(chunk)
+            if total >= size:
+                break
+        return "".join(parts)[self._offset:self._offset + size]
+
+    ##Removes up to size bytes from the front.
+    # @param size (int) number of bytes
+    def consume(self, size):
+        size = min(size, self._size)
+        self._size -= size
+        while size:
+            left = len(self._chunks[0]) - self._offset
+            if size < left:
+                self._offset += size
+                return
+            self._chunks.popleft()
+            self._offset = 0
+            size -= left
+
+    ##Removes and returns up to size bytes from the front.
+    # @param size (int) number of bytes, None for the whole buffer
+    # @returns (string) data
+    def take(self, size=None):
+        if size is None or size > self._size:
+            size = self._size
+        parts = []
+        self._size -= size
+        while size:
+            chunk = self._chunks[0]
+            left = len(chunk) - self._offset
+            if size < left:
+                parts.append(chunk[self._offset:self._offset + size])
+                self._offset += size
+                break
+            if self._offset:
+                chunk = chunk[self._offset:]
+            parts.append(chunk)
+            self._chunks.popleft()
+            self._offset = 0
+            size -= left
+        if len(parts) == 1:
+            return parts[0]
+        return "".join(parts)
+
+    ##Removes and returns the data before the first separator, and the
+    #separator. Chunks are joined on search, so later searches do not
+    #join them again.
+    # @param sep (string) separator
+    # @returns (string) data before separator, None if no separator
+    def read_until(self, sep):
+        if len(self._chunks) > 1 or self._offset:
+            self.append(self.take())
+        i = self._chunks[0].find(sep) if self._chunks else -1
+        if i == -1:
+            return None
+        line = self.take(i)
+        self.consume(len(sep))
+        return line
+
+    ##Removes all data.
+    def clear(self):
+        self._chunks.clear()
+        self._offset = 0
+        self._size = 0
+
+    ##Returns buffer content, without consuming it.
+    # @returns (string) data
+    def getvalue(self):
+        return "".join(self._chunks)[self._offset:]
+
+    ##Returns number of bytes in buffer.
+    # @returns (int) number of bytes
+    def __len__(self):
+        return self._size
+
+    ##Returns whether buffer is not empty.
+    # @returns (bool) not empty
+    def __nonzero__(self):
+        return self._size != 0
+
+    __bool__ = __nonzero__
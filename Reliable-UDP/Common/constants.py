@@ -15,26 +15,195 @@ _LOGGING_MAP = {
 ##Keep alive interval, after this time of idle connection
 # a keep-alive will be sent
 _KEEP_ALIVE_INTERVAL = 20000 #milliseconds
-##Retry interval or RTO, after this time packets that have not been
-#acked will be retransmitted
+##Initial retry interval or RTO, after this time packets that have not been
+#acked will be retransmitted. Adapted later from measured round trip times.
 _RETRY_INTERVAL = 1000
+##Lower bound of the adaptive retry interval
+_MIN_RETRY_INTERVAL = 200
+##Upper bound of the adaptive retry interval, also caps exponential backoff
+_MAX_RETRY_INTERVAL = 60000
+##Gain of a new RTT sample in the smoothed RTT (alpha)
+_SRTT_GAIN = 0.125
+##Gain of a new RTT deviation sample in the RTT variance (beta)
+_RTTVAR_GAIN = 0.25
 ##Connection approval interval, time that initiator of connection
 #will wait for connection approval before giving up and closing connection.
 _CONNECTION_APPROVAL_INTERVAL = 10000
 ##Maximum amount of retries before giving up and closing connection.
 _RETRY_COUNT = 15
-##Length in bytes of length component of RUDP packet.
+##Send window, maximum number of sequenced packets that may be
+#sent and not yet acknowledged in a connection.
+_SEND_WINDOW = 64
+##Max data bytes an initiator sends before its connection is approved,
+#buffered by the answerer until it connected to the user
+_EARLY_DATA_LIMIT = 16384
+##Max time in milliseconds data from the user shorter than a data
+#packet is held for more data, while packets of its connection are in
+#flight. Interactive connections never hold data.
+_TAIL_DELAY = 10
+##Least send budget of a connection: bytes taken from the user and not
+#yet acked, queued and in flight, before its data socket stops reading
+_SEND_BUDGET = 65536
+##Send budget of a connection in its share of the congestion window of
+#its session, when more than _SEND_BUDGET
+_SEND_BUDGET_CWND_GAIN = 2
+##Number of packets selectively acked after a missing packet before
+#it is considered lost and fast retransmitted.
+_DUP_THRESHOLD = 3
+##Maximum number of SACK blocks in an ACK packet
+_MAX_SACK_BLOCKS = 4
+##Default congestion control algorithm
+_CONGESTION_CONTROL = "newreno"
+##Initial congestion window in packets
+_INITIAL_CWND = 10
+##Minimum congestion window in packets after a loss
+_MIN_CWND = 2
+##Maximum congestion window in packets
+_MAX_CWND = 4096
+##Pacing gain over window per RTT during slow start
+_SLOW_START_PACING_GAIN = 2.0
+##Pacing gain over window per RTT during congestion avoidance
+_CONGESTION_AVOIDANCE_PACING_GAIN = 1.25
+##Time in milliseconds that paced sending may catch up in a burst
+#after being delayed
+_PACING_BURST = 2
+##BBR pacing and window gain during startup
+_BBR_HIGH_GAIN = 2.89
+##BBR window gain after startup
+_BBR_CWND_GAIN = 2.0
+##BBR pacing gains cycled every round while probing bandwidth
+_BBR_GAIN_CYCLE = (1.25, 0.75, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0)
+##Number of rounds the BBR bandwidth estimate is the max over
+_BBR_BW_ROUNDS = 10
+##Time in milliseconds the BBR minimum RTT estimate is valid
+_BBR_MIN_RTT_WINDOW = 10000
+##Time in milliseconds BBR keeps the window minimal to probe RTT
+_BBR_PROBE_RTT_TIME = 200
+##Minimum BBR congestion window in packets
+_BBR_MIN_CWND = 4
+##Bandwidth growth per round under which BBR startup counts a round
+#as not growing
+_BBR_FULL_BW_GROWTH = 1.25
+##Rounds without bandwidth growth after which BBR leaves startup
+_BBR_FULL_BW_ROUNDS = 3
+##Protocol version of the legacy hex-ASCII packet header
+_LEGACY_VERSION = 1
+##First protocol version with a binary packet header
+_BINARY_VERSION = 2
+##First protocol version with delayed ACKs, ACKs piggybacked on data
+#packets and the ACK frequency in the connection approval
+_DELAYED_ACK_VERSION = 3
+##First protocol version with frames of several connections coalesced
+#into one datagram
+_COALESCE_VERSION = 4
+##First protocol version with path MTU discovery, and data packets
+#beyond _DATA_LENGTH
+_PMTU_VERSION = 5
+##First protocol version with forward error correction parity packets
+_FEC_VERSION = 6
+##First protocol version with compression of the tunneled stream,
+#offered in init packets
+_COMPRESSION_VERSION = 7
+##First protocol version with the receive window in ACKs
+_FLOW_CONTROL_VERSION = 8
+##First protocol version with sequenced closing packets, received in
+#order after the data before them and acked
+_CLOSE_VERSION = 9
+##Highest protocol version supported, offered to peers in init packets.
+_PROTOCOL_VERSION = 9
+##Mark in the first byte of a binary header, never set in the first
+#byte of a legacy header, which is a hex digit.
+_BINARY_HEADER_MARK = 0x80
+##Length in bytes of length component of legacy RUDP packet.
 _LENGTH_LENGTH = 4
-##Length in bytes of CID component of RUDP packet.
+##Length in bytes of CID component of legacy RUDP packet.
 _CID_LENGTH = 4
-##Length in bytes of flag component of RUDP packet.
+##Length in bytes of flag component of legacy RUDP packet.
 _FLAG_LENGTH = 1
-##Length in bytes of sequence number component of RUDP packet.
+##Length in bytes of sequence number component of legacy RUDP packet.
 _SQN_LENGTH = 4
+##Width in bits of sequence numbers on the wire in legacy packets
+_LEGACY_SQN_BITS = _SQN_LENGTH * 4
+##Width in bits of sequence numbers on the wire in binary packets
+_SQN_BITS = 32
 ##Max length in bytes of data component of RUDP packet.
 _DATA_LENGTH = 1024
-##Max length of RUDP packet, calculated by other values.
-_MAX_RUDP_SIZE = _DATA_LENGTH + _SQN_LENGTH + _FLAG_LENGTH + _CID_LENGTH + _LENGTH_LENGTH
+##Length in bytes of the ACK field of binary data packets that carry one
+_ACK_FIELD_LENGTH = 4
+##Max length of RUDP packet, calculated by other values. The legacy
+#header is longer than the binary header, but not with an ACK field.
+_MAX_RUDP_SIZE = _DATA_LENGTH + _SQN_LENGTH + _FLAG_LENGTH + _CID_LENGTH + _LENGTH_LENGTH + _ACK_FIELD_LENGTH
+##Size of datagrams to a peer before path MTU discovery found a larger
+#size to pass (BASE_PLPMTU of RFC 8899)
+_BASE_DATAGRAM_SIZE = 1200
+##Datagram sizes probed in path MTU discovery, in increasing order: an
+#Ethernet MTU and a jumbo frame MTU, less the IPv4 and UDP headers
+_PMTU_PROBE_SIZES = (1472, 8972)
+##Max size of a datagram, the largest probe
+_MAX_DATAGRAM_SIZE = _PMTU_PROBE_SIZES[-1]
+##Max probes of a size sent without answer before the size is taken
+#not to pass (MAX_PROBES of RFC 8899)
+_MAX_PROBES = 3
+##Time in milliseconds after which path MTU discovery probes larger
+#sizes again (PMTU_RAISE_TIMER of RFC 8899)
+_PMTU_RAISE_INTERVAL = 600000
+##Value of IP_MTU_DISCOVER (Linux), for socket modules that lack it
+_IP_MTU_DISCOVER = 10
+##Value of IP_PMTUDISC_PROBE (Linux): set the don't fragment flag and
+#ignore the path MTU known to the kernel
+_IP_PMTUDISC_PROBE = 3
+##Fewest data packets covered by one parity packet of forward error
+#correction, on the lossiest links
+_FEC_MIN_BLOCK = 2
+##Most data packets covered by one parity packet of forward error
+#correction, on links without loss
+_FEC_MAX_BLOCK = 16
+##Gain of the loss rate estimate of a session, per packet acked or lost
+_FEC_LOSS_GAIN = 1 / 64.
+##Compression level of the tunneled stream
+_COMPRESSION_LEVEL = 6
+##Bytes of a buffer from the user test compressed to tell whether the
+#buffer is worth compressing
+_COMPRESSION_SAMPLE = 512
+##Max ratio of compressed size to size of a sample of a buffer worth
+#compressing
+_COMPRESSION_THRESHOLD = 0.9
+##Number of packets received in order before an ACK is sent, announced
+#by answerers in the connection approval
+_ACK_FREQUENCY = 2
+##Max time in milliseconds an ACK is delayed waiting for more packets
+#or for a data packet to ride on
+_ACK_DELAY = 20
+##Share of the smoothed RTT an ACK is delayed, when less than _ACK_DELAY
+_ACK_DELAY_RTT_SHARE = 0.25
+##Max datagrams received from the RUDP socket per read event
+_RECV_BATCH = 64
+##Max datagrams sent on the RUDP socket per batch
+_SEND_BATCH = 64
+##Max bytes joined per send on TCP sockets
+_TCP_SEND_SIZE = 65536
+##Size of the read buffer shared by TCP sockets, max bytes per read
+_TCP_READ_SIZE = 65536
+##Default rate of per-packet log lines, one in every _LOG_SAMPLE packets
+_LOG_SAMPLE = 1
+##Default number of server worker processes
+_WORKERS = 1
+##Interval in milliseconds of workers publishing their statistics
+_STATISTICS_INTERVAL = 1000
+##Default number of threads resolving host names
+_RESOLVER_THREADS = 4
+##Time in milliseconds resolved host names are cached
+_RESOLVER_TTL = 60000
+##Time in milliseconds host names that failed to resolve are cached
+_RESOLVER_NEGATIVE_TTL = 5000
+##Max host names cached by the resolver
+_RESOLVER_CACHE_SIZE = 1024
+##Max bytes read from the resolver wake-up pipe per read
+_RESOLVER_DRAIN_SIZE = 4096
+##Value of SO_REUSEPORT (Linux), for socket modules that lack it
+_SO_REUSEPORT = 15
+##Clock ID of CLOCK_MONOTONIC in clock_gettime (Linux)
+_CLOCK_MONOTONIC = 1
 ##Default HTTP port for listening to HTTP Connections
 _HTTP_PORT = 80
 ##Default RUDP Port for the UDP socket
@@ -54,9 +223,15 @@ _CONTROL_BLOCK_SIZE = 1024
 ##Reading block size of files
 _FILE_BLOCK_SIZE = 1024
 ##Receive buff limit of Data socket objects
-_DATA_BUFF_LIMIT = 4096
+_DATA_BUFF_LIMIT = 65536
 ##Reading block size of Data socket objects
-_DATA_BLOCK_SIZE = 1024
+_DATA_BLOCK_SIZE = 65536
+##Max bytes a connection queues in its Data socket to be sent to the
+#user, its receive window is the free space left
+_DATA_SEND_BUFF_LIMIT = 262144
+##Max number of RUDP servers whose negotiated protocol version is
+#remembered, for early data to servers known to be past legacy
+_PEER_VERSION_CACHE_SIZE = 1024
 ##Max number of connections per two servers, calculated by CID length
 _MAX_CONNECTIONS = 16 ** (_CID_LENGTH)
 ##Control code in reponse for success
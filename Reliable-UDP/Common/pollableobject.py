@@ -42,11 +42,17 @@ class PollableObject(object):
         self._async_manager.register(self)
         logging.info("%s: Initialized" % self)
 
-    ##Updates state of pollable object
+    ##Updates state of pollable object, after an event or a change of
+    #its state.
     def update(self):
         if self._closing:
             self.terminate()
 
+    ##Schedule update of the object and registration of its IO mask,
+    #after a change of its state outside its events.
+    def schedule_update(self):
+        self._async_manager.schedule_update(self)
+
     ##Receive I/O event.
     # @param event (int) event mask.
     def receive_event(self, event):
@@ -58,14 +64,10 @@ class PollableObject(object):
             self.log_error()
             self.terminate()
 
-    ##Returns preferred sleep time of pollable object
-    # @returns (int) timeout in milliseconds.
-    def get_sleep_time(self):
-        return self._timeout
-
     ##Starts clean close of pollable object.
     def init_close(self):
         self._closing = True
+        self.schedule_update()
 
     ##Terminates pollable object completely,
     #including deregister from Poller object.
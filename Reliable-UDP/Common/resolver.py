@@ -0,0 +1,202 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Common.resolver
+## @file resolver.py Implementation of @ref Reliable-UDP.Common.resolver
+
+import asyncio
+import collections
+import constants
+import errno
+import fcntl
+import logging
+import os
+import socket
+import threading
+import timers
+import traceback
+from pollableobject import PollableObject
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+## Resolver
+#
+# Resolves host names to IPv4 addresses on a small pool of threads, so
+# a slow name server never stalls the event loop. Addresses are cached
+# for a time to live, and names that failed to resolve for a shorter
+# one. Threads hand their results back through a pipe registered with
+# the poller, and callbacks are called on the event loop thread.
+#
+class Resolver(PollableObject):
+
+    ##Init Resolver
+    # @param async_manager (Poller) Poller object
+    # @param timeout (int) default timeout in milliseconds
+    # @param threads (int) number of lookup threads
+    # @param ttl (int) time in milliseconds addresses are cached
+    # @param negative_ttl (int) time in milliseconds failures are cached
+    # @param cache_size (int) max names cached
+    # @returns (Resolver) Resolver object
+    def __init__(
+        self,
+        async_manager,
+        timeout,
+        threads=constants._RESOLVER_THREADS,
+        ttl=constants._RESOLVER_TTL,
+        negative_ttl=constants._RESOLVER_NEGATIVE_TTL,
+        cache_size=constants._RESOLVER_CACHE_SIZE,
+    ):
+        ##Read and write ends of the pipe waking the event loop
+        self._pipe_r, self._pipe_w = os.pipe()
+        for fd in (self._pipe_r, self._pipe_w):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        super(Resolver, self).__init__(
+            async_manager=async_manager,
+            fileno=self._pipe_r,
+            timeout=timeout,
+        )
+        ##Time in milliseconds addresses are cached
+        self._ttl = ttl
+        ##Time in milliseconds failures are cached
+        self._negative_ttl = negative_ttl
+        ##Max names cached
+        self._cache_size = cache_size
+        ##Dictionary of name to (address or None, expiry time)
+        self._cache = {}
+        ##Dictionary of name being resolved to callbacks waiting for it
+        self._pending = {}
+        ##Names for the threads to resolve
+        self._requests = queue.Queue()
+        ##Results of the threads: (name, address or None)
+        self._results = collections.deque()
+        ##Lookup threads
+        self._threads = []
+        for i in range(threads):
+            thread = threading.Thread(target=self._lookup)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    ##Resolves a name. The callback is called at once for addresses and
+    #cached names, and on the event loop thread once resolved otherwise.
+    # @param name (string) host name or address
+    # @param callback (function) called with the address, None if the name
+    # could not be resolved. None to only fill the cache.
+    def resolve(self, name, callback=None):
+        address = self.lookup(name)
+        if address is not False:
+            if callback is not None:
+                callback(address)
+            return
+        if name not in self._pending:
+            self._pending[name] = []
+            self._requests.put(name)
+        if callback is not None:
+            self._pending[name].append(callback)
+
+    ##Returns the address of a name without blocking.
+    # @param name (string) host name or address
+    # @returns (string) address, None if the name failed to resolve, False
+    # if not known yet
+    def lookup(self, name):
+        try:
+            return socket.inet_ntoa(socket.inet_aton(name))
+        except (socket.error, TypeError):
+            pass
+        entry = self._cache.get(name)
+        if entry is None:
+            return False
+        address, expiry = entry
+        if expiry <= timers.now():
+            del self._cache[name]
+            return False
+        return address
+
+    ##Caches the result of a lookup, evicting expired names when full.
+    # @param name (string) host name
+    # @param address (string) address, None if the name failed to resolve
+    def store(self, name, address):
+        now = timers.now()
+        if len(self._cache) >= self._cache_size:
+            for n, (a, expiry) in self._cache.items():
+                if expiry <= now:
+                    del self._cache[n]
+            if len(self._cache) >= self._cache_size:
+                self._cache.popitem()
+        ttl = self._ttl if address is not None else self._negative_ttl
+        self._cache[name] = address, now + ttl
+
+    ##Lookup thread: resolves names until given None.
+    def _lookup(self):
+        while True:
+            name = self._requests.get()
+            if name is None:
+                break
+            try:
+                address = socket.gethostbyname(name)
+            except (socket.error, UnicodeError):
+                address = None
+            self._results.append((name, address))
+            try:
+                os.write(self._pipe_w, "\0")
+            except OSError as e:
+                if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN, errno.EPIPE):
+                    raise
+
+    ##Logic on read event. Caches the results of the threads and calls
+    #their callbacks. The pipe is drained first, so a result added later
+    #wakes the loop again.
+    def read(self):
+        try:
+            while os.read(self._pipe_r, constants._RESOLVER_DRAIN_SIZE):
+                pass
+        except OSError as e:
+            if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
+                raise
+        while self._results:
+            name, address = self._results.popleft()
+            self.store(name, address)
+            if address is None:
+                logging.warning("%s: Couldn't resolve %s" % (self, name))
+            for callback in self._pending.pop(name, ()):
+                try:
+                    callback(address)
+                except Exception:
+                    logging.error(
+                        "%s: Unexpected error in callback of %s:\n%s" % (
+                            self,
+                            name,
+                            traceback.format_exc(),
+                        )
+                    )
+
+    ##Starts clean close. The resolver stays open for the connections
+    #closing, until its RUDP manager terminates and closes it.
+    def init_close(self):
+        pass
+
+    ##Closes the resolver on the next update, once its RUDP manager
+    #terminated.
+    def close(self):
+        self._closing = True
+        self.schedule_update()
+
+    ##Terminates the resolver. Threads stop after their lookup, the
+    #write end of the pipe is left open for them.
+    def terminate(self):
+        for thread in self._threads:
+            self._requests.put(None)
+        self._pending.clear()
+        super(Resolver, self).terminate()
+        os.close(self._pipe_r)
+
+    ##Return IO mask for the object.
+    # @returns (int) IO mask
+    def get_io_mask(self):
+        return asyncio.BaseEvent.POLLERR | asyncio.BaseEvent.POLLIN
+
+    ##String representation of object.
+    # @returns (string) representation
+    def __repr__(self):
+        return "Resolver (%s)" % self._fileno
@@ -4,11 +4,20 @@
 ## @file tcpserver.py Implementation of @ref Reliable-UDP.Common.tcpserver
 
 from asyncio import BaseEvent
+from chunkbuffer import ChunkBuffer
+import constants
 import errno
 import socket
 import traceback
 from asyncsocket import AsyncSocket
 import logging
+import util
+
+##Read buffer shared by every TCP socket, data read into it is copied
+#out at once
+_read_buff = bytearray(constants._TCP_READ_SIZE)
+##View of the shared read buffer
+_read_view = memoryview(_read_buff)
 
 ## DisconnectError
 #
@@ -79,29 +88,36 @@ class TCPServerSocket(AsyncSocket):
             timeout=timeout,
         )
         ##Send buffer
-        self._send_buff = ""
+        self._send_buff = ChunkBuffer()
         ##Receive buffer
-        self._recv_buff = ""
+        self._recv_buff = ChunkBuffer()
+        ##Address of peer, cached on first use
+        self._peer = None
         ##Read block size
         self._block_size = block_size
         ##Receive buff limit
         self._buff_limit = buff_limit
 
-    ##Updates TCPServerSocket
+    ##Updates TCPServerSocket, terminating it once it is closing and
+    #its send buffer is empty.
     def update(self):
         if self._closing and not self._send_buff:
             self.terminate()
 
-    ##Logic on read event
+    ##Logic on read event. Reads into the shared read buffer, up to the
+    #block size or the size of the buffer.
     def read(self):
+        size = min(self._block_size, len(_read_buff))
         try:
             while True:
                 if not self.receiving():
                     break
-                buf = self._s.recv(self._block_size)
-                if not buf:
+                n = self._s.recv_into(_read_buff, size)
+                if not n:
                     raise IOError('Disconnect')
-                self.log_data_received(buf)
+                buf = _read_view[:n].tobytes()
+                if util.log_enabled(logging.INFO):
+                    self.log_data_received(buf)
                 self.handle_buf_received(buf)
         except IOError as e:
             if e.errno == errno.ECONNRESET or str(e) == 'Disconnect':
@@ -124,11 +140,13 @@ class TCPServerSocket(AsyncSocket):
                 self.approve_connection()
             elif self._state == self._CONNECTED:
                 while self._send_buff:
-                    n = self._s.send(self._send_buff)
-                    buf_sent = self._send_buff[:n]
-                    self._send_buff = self._send_buff[n:]
+                    n = self._s.send(
+                        self._send_buff.peek(constants._TCP_SEND_SIZE)
+                    )
+                    buf_sent = self._send_buff.take(n)
                     self.handle_buf_sent(buf_sent)
-                    self.log_data_sent(buf_sent)
+                    if util.log_enabled(logging.INFO):
+                        self.log_data_sent(buf_sent)
         except IOError as e:
             if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
                 raise
@@ -151,7 +169,7 @@ class TCPServerSocket(AsyncSocket):
                 "%s: Data sent: Address: %s; Data: %s"
             ) % (
                 self,
-                self._s.getpeername(),
+                self.peer,
                 buf_sent,
             )
         )
@@ -164,7 +182,7 @@ class TCPServerSocket(AsyncSocket):
                 "%s: Data received from: Address: %s; Data: %s"
             ) % (
                 self,
-                self._s.getpeername(),
+                self.peer,
                 buf,
             )
         )
@@ -182,7 +200,8 @@ class TCPServerSocket(AsyncSocket):
     ##Queues TCP buffer to be sent
     # @param buffer (string) buffer to be sent
     def queue_buffer(self, buffer):
-        self._send_buff += buffer
+        self._send_buff.append(buffer)
+        self.schedule_update()
 
     ##String representation of object.
     # @returns (string) representation
@@ -194,6 +213,19 @@ class TCPServerSocket(AsyncSocket):
     def receiving(self):
         return len(self._recv_buff) <= self._buff_limit
 
+    ##Property method for address of peer, cached after the first
+    #call, so logging it costs no system call.
+    # @returns (tuple) address of peer, None if the socket is no longer
+    # connected and the address was never asked for
+    @property
+    def peer(self):
+        if self._peer is None:
+            try:
+                self._peer = self._s.getpeername()
+            except socket.error:
+                return None
+        return self._peer
+
     ##Logic on connection success
     def approve_connection(self):
         pass
@@ -201,7 +233,7 @@ class TCPServerSocket(AsyncSocket):
     ##Logic on user disconnect
     def user_disconnected(self):
         logging.info(
-            "%s: User at %s disconnected" % (self, self._s.getpeername())
+            "%s: User at %s disconnected" % (self, self.peer)
         )
         raise DisconnectError('Disconnected')
 
@@ -228,6 +260,8 @@ class TCPServerListener(AsyncSocket):
     # @param timeout (int) default timeout in milliseconds
     # @param block_size (int) reading block size in bytes
     # @param buff_limit (int) receiving buff limit in bytes
+    # @param reuse_port (bool) bind with SO_REUSEPORT, sharing the port
+    # between processes
     # @returns TCPServerListener object
     def __init__(
         self,
@@ -236,12 +270,19 @@ class TCPServerListener(AsyncSocket):
         timeout,
         block_size,
         buff_limit,
+        reuse_port=False,
     ):
         s = socket.socket(
             family=socket.AF_INET,
             type=socket.SOCK_STREAM,
         )
         s.setblocking(0)
+        if reuse_port:
+            s.setsockopt(
+                socket.SOL_SOCKET,
+                getattr(socket, "SO_REUSEPORT", constants._SO_REUSEPORT),
+                1,
+            )
         try:
             s.bind(bind_address)
         except IOError as e:
@@ -272,7 +313,7 @@ class TCPServerListener(AsyncSocket):
         try:
             s1, addr = self._s.accept()
             logging.info(
-                "%s: Connection accepted from %s" % (self, s1.getpeername())
+                "%s: Connection accepted from %s" % (self, addr)
             )
             s1.setblocking(0)
             TCPServerSocket(
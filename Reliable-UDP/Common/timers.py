@@ -0,0 +1,204 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Common.timers
+## @file timers.py Implementation of @ref Reliable-UDP.Common.timers
+
+import heapq
+import itertools
+import util
+
+##Cancelled timers under which the heap is never compacted
+_MIN_COMPACT = 64
+
+##Returns present monotonic time in milliseconds.
+# @returns (float) time in milliseconds
+def now():
+    return util.monotonic() * 1000.0
+
+## Timer
+#
+# A callback scheduled at a deadline in a TimerService.
+#
+class Timer(object):
+
+    ##Init function of Timer.
+    # @param service (TimerService) timer service of the timer
+    # @param deadline (float) monotonic time in milliseconds to fire at
+    # @param callback (function) function called with no arguments
+    # @returns (Timer) Timer object
+    def __init__(self, service, deadline, callback):
+        ##Timer service of the timer
+        self._service = service
+        ##Monotonic time in milliseconds to fire at
+        self._deadline = deadline
+        ##Function called when the timer fires
+        self._callback = callback
+        ##Boolean - cancelled or already fired
+        self._cancelled = False
+
+    ##Cancel the timer. It stays in the heap until it reaches the top
+    #or the heap is compacted.
+    def cancel(self):
+        if not self._cancelled:
+            self._cancelled = True
+            self._service.timer_cancelled()
+
+    ##Property method for deadline.
+    # @returns (float) monotonic time in milliseconds to fire at
+    @property
+    def deadline(self):
+        return self._deadline
+
+    ##Property method for cancelled boolean.
+    # @returns (bool) cancelled or already fired
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+
+## Timer service
+#
+# Heap of timers ordered by deadline, with lazy cancellation. Each
+# iteration of the poller only touches the timers that expired.
+#
+class TimerService(object):
+
+    ##Init function of TimerService.
+    # @returns (TimerService) TimerService object
+    def __init__(self):
+        ##Heap of (deadline, order, timer) tuples
+        self._heap = []
+        ##Counter keeping timers with equal deadlines in schedule order
+        self._order = itertools.count()
+        ##Cancelled timers still in the heap
+        self._cancelled = 0
+
+    ##Schedule a callback at a deadline.
+    # @param deadline (float) monotonic time in milliseconds
+    # @param callback (function) function called with no arguments
+    # @returns (Timer) Timer object
+    def call_at(self, deadline, callback):
+        timer = Timer(self, deadline, callback)
+        heapq.heappush(self._heap, (deadline, next(self._order), timer))
+        return timer
+
+    ##Schedule a callback after a delay.
+    # @param delay (float) delay in milliseconds
+    # @param callback (function) function called with no arguments
+    # @returns (Timer) Timer object
+    def call_later(self, delay, callback):
+        return self.call_at(now() + delay, callback)
+
+    ##Logic when a timer in the heap is cancelled, compacts the heap
+    #when most of it is cancelled timers.
+    def timer_cancelled(self):
+        self._cancelled += 1
+        if self._cancelled > _MIN_COMPACT and self._cancelled * 2 > len(self._heap):
+            self._heap = [e for e in self._heap if not e[2]._cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    ##Pop timers from the top of the heap that were cancelled.
+    def pop_cancelled(self):
+        while self._heap and self._heap[0][2]._cancelled:
+            heapq.heappop(self._heap)
+            self._cancelled -= 1
+
+    ##Fire every timer whose deadline has passed.
+    def run_expired(self):
+        t = now()
+        while self._heap and self._heap[0][0] <= t:
+            deadline, order, timer = heapq.heappop(self._heap)
+            if timer._cancelled:
+                self._cancelled -= 1
+            else:
+                timer._cancelled = True
+                timer._callback()
+
+    ##Returns time until the next timer fires.
+    # @param timeout (int) max sleep time in milliseconds
+    # @returns (float) sleep time in milliseconds
+    def get_sleep_time(self, timeout):
+        self.pop_cancelled()
+        if not self._heap:
+            return timeout
+        return min(timeout, max(self._heap[0][0] - now(), 0))
+
+    ##Returns number of timers that are not cancelled.
+    # @returns (int) number of pending timers
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+
+## Deadline
+#
+# A deadline that moves often, such as a retransmission or keep-alive
+# deadline pushed back on every packet. Moving it later is only recorded;
+# when its timer fires early it re-arms itself at the recorded deadline,
+# so the heap sees at most one timer per deadline.
+#
+class Deadline(object):
+
+    ##Init function of Deadline.
+    # @param service (TimerService) timer service
+    # @param callback (function) function called with no arguments
+    # when the deadline passes
+    # @returns (Deadline) Deadline object
+    def __init__(self, service, callback):
+        ##Timer service
+        self._service = service
+        ##Function called when the deadline passes
+        self._callback = callback
+        ##Monotonic time in milliseconds of the deadline, None when unset
+        self._deadline = None
+        ##Timer in the timer service, None when not scheduled
+        self._timer = None
+
+    ##Set the deadline after a delay from now.
+    # @param delay (float) delay in milliseconds
+    def set(self, delay):
+        self.set_at(now() + delay)
+
+    ##Set the deadline.
+    # @param deadline (float) monotonic time in milliseconds
+    def set_at(self, deadline):
+        self._deadline = deadline
+        if self._timer is None or self._timer.deadline > deadline:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = self._service.call_at(deadline, self.expired)
+
+    ##Unset the deadline. Its timer fires later and does nothing.
+    def clear(self):
+        self._deadline = None
+
+    ##Unset the deadline and cancel its timer.
+    def cancel(self):
+        self._deadline = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    ##Logic when the timer fires. Re-arms the timer if the deadline
+    #was moved later, otherwise calls the callback.
+    def expired(self):
+        self._timer = None
+        if self._deadline is None:
+            return
+        if now() < self._deadline:
+            self._timer = self._service.call_at(self._deadline, self.expired)
+            return
+        self._deadline = None
+        self._callback()
+
+    ##Property method for deadline.
+    # @returns (float) monotonic time in milliseconds, None when unset
+    @property
+    def deadline(self):
+        return self._deadline
+
+    ##Property method for whether the deadline is set.
+    # @returns (bool) set or not
+    @property
+    def pending(self):
+        return self._deadline is not None
@@ -3,13 +3,59 @@
 ## @package Reliable-UDP.Common.util
 ## @file util.py Implementation of @ref Reliable-UDP.Common.util
 
+import atexit
+import binascii
 from datetime import datetime
 import os
 import socket
 import errno
 import constants
 import logging
+import logging.handlers
 import signal
+import threading
+import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+##Returns the best monotonic clock function available: time.monotonic,
+#else clock_gettime(CLOCK_MONOTONIC) through ctypes, else wall clock time.
+# @returns (function) clock function returning time in seconds
+def _init_monotonic():
+    if hasattr(time, "monotonic"):
+        return time.monotonic
+    try:
+        import ctypes
+        import ctypes.util
+
+        ## C struct timespec.
+        #
+        class _Timespec(ctypes.Structure):
+            _fields_ = [
+                ("tv_sec", ctypes.c_long),
+                ("tv_nsec", ctypes.c_long),
+            ]
+
+        librt = ctypes.CDLL(ctypes.util.find_library("rt") or ctypes.util.find_library("c"), use_errno=True)
+        clock_gettime = librt.clock_gettime
+        clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_Timespec)]
+        ts = _Timespec()
+        if clock_gettime(constants._CLOCK_MONOTONIC, ctypes.byref(ts)) != 0:
+            return time.time
+
+        def monotonic():
+            clock_gettime(constants._CLOCK_MONOTONIC, ctypes.byref(ts))
+            return ts.tv_sec + ts.tv_nsec * 1e-9
+
+        return monotonic
+    except (ImportError, OSError, AttributeError, TypeError):
+        return time.time
+
+##Returns monotonic clock time, not affected by changes of wall clock time.
+# @returns (float) time in seconds
+monotonic = _init_monotonic()
 
 ##Checks if tcp address if proper.
 # @param address (tuple) TCP address
@@ -24,11 +70,132 @@ def check_tcp_address(address):
         return None
     return True
 
+if hasattr(logging.handlers, "QueueHandler"):
+    _QueueHandler = logging.handlers.QueueHandler
+    _QueueListener = logging.handlers.QueueListener
+else:
+
+    ## Queue Handler
+    #
+    # Logging handler that puts records on a queue, for a listener
+    # thread to write. Fallback of logging.handlers.QueueHandler
+    # (Python 3.2 and up).
+    #
+    class _QueueHandler(logging.Handler):
+
+        ##Init function of _QueueHandler.
+        # @param q (Queue) queue of records
+        # @returns (_QueueHandler) _QueueHandler object
+        def __init__(self, q):
+            logging.Handler.__init__(self)
+            ##Queue of records
+            self.queue = q
+
+        ##Formats record message and puts the record on the queue.
+        #Arguments and traceback are merged into the message, so the
+        #record can be written on another thread.
+        # @param record (LogRecord) record
+        def emit(self, record):
+            try:
+                record.msg = self.format(record)
+                record.args = None
+                record.exc_info = None
+                self.queue.put_nowait(record)
+            except Exception:
+                self.handleError(record)
+
+    ## Queue Listener
+    #
+    # Thread writing records from a queue to handlers. Fallback of
+    # logging.handlers.QueueListener (Python 3.2 and up).
+    #
+    class _QueueListener(object):
+
+        ##Init function of _QueueListener.
+        # @param q (Queue) queue of records
+        # @param handlers (list) handlers writing the records
+        # @returns (_QueueListener) _QueueListener object
+        def __init__(self, q, *handlers):
+            ##Queue of records
+            self.queue = q
+            ##Handlers writing the records
+            self.handlers = handlers
+            ##Listener thread
+            self._thread = None
+
+        ##Starts listener thread.
+        def start(self):
+            self._thread = threading.Thread(target=self._monitor)
+            self._thread.daemon = True
+            self._thread.start()
+
+        ##Writes records until stopped.
+        def _monitor(self):
+            while True:
+                record = self.queue.get()
+                if record is None:
+                    break
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+
+        ##Stops listener thread, after the records queued so far
+        #are written.
+        def stop(self):
+            self.queue.put_nowait(None)
+            self._thread.join()
+            self._thread = None
+
 ## Inits log to file and file-level
 # @param log (string) log filename
 # @param log_level (int) log level numerical value
-def init_log(log, log_level):
+# @param threaded (bool) write log records on a separate thread, the
+# logging threads only format them
+def init_log(log, log_level, threaded=False):
     logging.basicConfig(format='%(levelname)s:%(asctime)s:%(message)s', level=log_level, filename=log)
+    if threaded:
+        root = logging.getLogger()
+        handlers = root.handlers[:]
+        for handler in handlers:
+            root.removeHandler(handler)
+        q = queue.Queue()
+        root.addHandler(_QueueHandler(q))
+        listener = _QueueListener(q, *handlers)
+        listener.start()
+        atexit.register(listener.stop)
+
+##Returns whether a log level is enabled, to skip formatting log
+#lines that would not be written.
+# @param level (int) log level numerical value
+# @returns (bool) enabled or not
+def log_enabled(level):
+    return logging.root.isEnabledFor(level)
+
+## Log Sampler
+#
+# Decides which per-packet log lines are written: one in every N
+# calls, when the log level is enabled at all.
+#
+class LogSampler(object):
+
+    ##Init function of LogSampler.
+    # @param rate (int) write one in every rate lines
+    # @returns (LogSampler) LogSampler object
+    def __init__(self, rate):
+        ##Write one in every rate lines
+        self._rate = max(rate, 1)
+        ##Lines asked for so far
+        self._count = 0
+
+    ##Returns whether a log line should be written.
+    # @param level (int) log level numerical value
+    # @returns (bool) write or not
+    def sample(self, level):
+        if not logging.root.isEnabledFor(level):
+            return False
+        write = self._count % self._rate == 0
+        self._count += 1
+        return write
 
 ##Checks if TCP port is proper.
 # @param port (int) port
@@ -67,6 +234,42 @@ def send_all(s, buff):
     while buff:
         buff = buff[s.send(buff):]
 
+##Returns the distance from serial number b to serial number a, in
+#serial number arithmetic (RFC 1982). Negative when a is before b.
+# @param a (int) serial number
+# @param b (int) serial number
+# @param bits (int) width of serial numbers in bits
+# @returns (int) distance
+def serial_diff(a, b, bits):
+    d = (a - b) & ((1 << bits) - 1)
+    if d >= 1 << (bits - 1):
+        d -= 1 << bits
+    return d
+
+##Returns the full number nearest to reference whose lowest bits are
+#the given serial number, recovering a number that wrapped around on
+#the wire.
+# @param serial (int) serial number as received
+# @param reference (int) full number close to the original number
+# @param bits (int) width of serial numbers in bits
+# @returns (int) full number
+def serial_unwrap(serial, reference, bits):
+    return reference + serial_diff(serial, reference, bits)
+
+##Returns the XOR of strings, the shorter ones padded with zero bytes
+#to the length of the longest.
+# @param strings (list) strings
+# @returns (string) XOR of the strings
+def xor_strings(strings):
+    length = max([len(s) for s in strings] or [0])
+    if not length:
+        return ""
+    value = 0
+    for s in strings:
+        if s:
+            value ^= int(binascii.hexlify(s), 16) << (8 * (length - len(s)))
+    return binascii.unhexlify("%0*x" % (2 * length, value))
+
 ##Returns present datetime in nice format.
 # @param now (datetime) datetime
 # @returns (string) nice format
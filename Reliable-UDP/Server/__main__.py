@@ -6,7 +6,11 @@
 import logging
 import argparse
 from rudpmanager import RUDPManager
+import compression
+import congestioncontrol
 import signal
+import tempfile
+import workers
 from ..Common import util, constants, asyncio
 from controlserver import ControlListener
 from httpserver import HTTPListener
@@ -42,6 +46,72 @@ def parse_args():
         default=0,
         help="Percentage chance that a given packet will be dropped in RUDP protocol (testing)"
     )
+    parser.add_argument(
+        '--send-window',
+        type=int,
+        default=constants._SEND_WINDOW,
+        help="Max packets in flight (sent and not yet acknowledged) per connection"
+    )
+    parser.add_argument(
+        '--send-budget',
+        type=int,
+        default=constants._SEND_BUDGET,
+        help="Least bytes per connection read from the user and not yet acknowledged, grows with the congestion window"
+    )
+    parser.add_argument(
+        '--tail-delay',
+        type=float,
+        default=constants._TAIL_DELAY,
+        help="Max milliseconds data shorter than a packet is held for more data while packets are in flight, 0 to never hold"
+    )
+    parser.add_argument(
+        '--congestion-control',
+        default=constants._CONGESTION_CONTROL,
+        choices=tuple(congestioncontrol.MAP.keys()),
+        help="Congestion control algorithm of connections"
+    )
+    parser.add_argument(
+        '--recv-batch',
+        type=int,
+        default=constants._RECV_BATCH,
+        help="Max datagrams received from the RUDP socket per read event"
+    )
+    parser.add_argument(
+        '--send-batch',
+        type=int,
+        default=constants._SEND_BATCH,
+        help="Max datagrams sent on the RUDP socket per batch"
+    )
+    parser.add_argument(
+        '--fec',
+        help="Send forward error correction parity, rebuilding lost packets on lossy links",
+        action='store_true',
+        default=False,
+    )
+    parser.add_argument(
+        '--compression',
+        default=None,
+        choices=tuple(compression.MAP.keys()),
+        help="Codec offered to compress the stream of connections initiated",
+    )
+    parser.add_argument(
+        '--send-mmsg',
+        help="Send batches of datagrams with sendmmsg (Linux)",
+        action='store_true',
+        default=False,
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=constants._WORKERS,
+        help="Number of worker processes sharing the ports with SO_REUSEPORT",
+    )
+    parser.add_argument(
+        '--resolver-threads',
+        type=int,
+        default=constants._RESOLVER_THREADS,
+        help="Number of threads resolving host names of RUDP servers and users",
+    )
     parser.add_argument(
         '--log',
         help="Log filename"
@@ -52,6 +122,18 @@ def parse_args():
         default="info",
         choices=constants._LOGGING_MAP.keys()
     )
+    parser.add_argument(
+        '--log-sample',
+        type=int,
+        default=constants._LOG_SAMPLE,
+        help="Log one in every N packets of each connection",
+    )
+    parser.add_argument(
+        '--sync-log',
+        help="Write log records on the main thread instead of a logging thread",
+        action='store_true',
+        default=False,
+    )
     parser.add_argument(
         '--daemon',
         help="Turn server into daemon process",
@@ -65,6 +147,8 @@ def parse_args():
     )
     args = parser.parse_args()
     args.poller_class = asyncio.MAP[args.poller_type]
+    args.congestion_control_class = congestioncontrol.MAP[args.congestion_control]
+    args.compression_class = compression.MAP.get(args.compression)
     args.log_level = constants._LOGGING_MAP[args.log_level]
     return args
 
@@ -73,7 +157,14 @@ def __main__():
     args = parse_args()
     if args.daemon:
         util.daemon()
-    util.init_log(args.log, args.log_level)
+    worker = 0
+    run_dir = None
+    if args.workers > 1:
+        run_dir = tempfile.mkdtemp(prefix="rudp-")
+        worker = workers.fork_workers(args.workers, run_dir)
+        if worker is None:
+            return
+    util.init_log(args.log, args.log_level, threaded=not args.sync_log)
 
     try:
         async_manager = asyncio.Poller(
@@ -85,6 +176,20 @@ def __main__():
             bind_address=("0.0.0.0", args.rudp_port),
             timeout=constants._TIMEOUT,
             random_drop=args.random_drop,
+            send_window=args.send_window,
+            send_budget=args.send_budget,
+            tail_delay=args.tail_delay,
+            congestion_control=args.congestion_control_class,
+            recv_batch=args.recv_batch,
+            send_batch=args.send_batch,
+            send_mmsg=args.send_mmsg,
+            log_sample=args.log_sample,
+            fec=args.fec,
+            compression=args.compression_class,
+            worker=worker,
+            worker_count=args.workers,
+            run_dir=run_dir,
+            resolver_threads=args.resolver_threads,
         )
         ControlListener(
             async_manager=async_manager,
@@ -93,6 +198,7 @@ def __main__():
             timeout=constants._TIMEOUT,
             block_size=constants._CONTROL_BLOCK_SIZE,
             buff_limit=constants._CONTROL_BUFF_LIMIT,
+            reuse_port=args.workers > 1,
         )
         HTTPListener(
             async_manager=async_manager,
@@ -101,6 +207,7 @@ def __main__():
             timeout=constants._TIMEOUT,
             block_size=constants._HTTP_BLOCK_SIZE,
             buff_limit=constants._HTTP_BUFF_LIMIT,
+            reuse_port=args.workers > 1,
         )
         def handler_exit(signalnum, frame):
             logging.info("Closing RUDP server...")
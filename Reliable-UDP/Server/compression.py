@@ -0,0 +1,106 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Server.compression
+## @file compression.py Implementation of @ref Reliable-UDP.Server.compression
+
+import struct
+import zlib
+from ..Common import constants
+
+## zlib codec.
+#
+# Compresses the byte stream a connection sends, and decompresses the
+# byte stream it receives. The stream is cut into frames, one for each
+# buffer from the user: frames of data that compress well hold the
+# compressed data, flushed so the peer can decompress every frame as
+# it arrives. Frames of data that doesn't, like data already compressed,
+# hold the data as is. One deflate stream is kept for each direction,
+# so compressed frames build on all data compressed before.
+#
+class ZlibCodec(object):
+
+    ##Name of class
+    NAME = "zlib"
+
+    ##Frame header: whether the frame is compressed and length of its data
+    _FRAME_HEADER = struct.Struct("!BI")
+
+    ##Init function of ZlibCodec.
+    # @returns (ZlibCodec) ZlibCodec object
+    def __init__(self):
+        ##Received stream data not yet a whole frame
+        self._recv_buff = ""
+        ##Overall data bytes encoded
+        self._bytes_in = 0
+        ##Overall bytes of frames encoded from that data
+        self._bytes_out = 0
+        ##Compressor of the sent stream
+        self._compressor = zlib.compressobj(constants._COMPRESSION_LEVEL)
+        ##Decompressor of the received stream
+        self._decompressor = zlib.decompressobj()
+
+    ##Compress data, flushing so the peer can decompress all of it.
+    # @param data (string) data
+    # @returns (string) compressed data
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    ##Decompress data compressed by the codec of the peer.
+    # @param data (string) compressed data
+    # @returns (string) data
+    def decompress(self, data):
+        return self._decompressor.decompress(data)
+
+    ##Returns whether data is worth compressing, by how much a sample of
+    #it shrinks in fast zlib compression.
+    # @param data (string) data
+    # @returns (bool) worth compressing or not
+    def compressible(self, data):
+        sample = data[:constants._COMPRESSION_SAMPLE]
+        return len(zlib.compress(sample, 1)) < len(sample) * constants._COMPRESSION_THRESHOLD
+
+    ##Encode a buffer from the user as a frame of the stream.
+    # @param data (string) data
+    # @returns (string) frame
+    def encode(self, data):
+        self._bytes_in += len(data)
+        compressed = self.compressible(data)
+        if compressed:
+            data = self.compress(data)
+        frame = ZlibCodec._FRAME_HEADER.pack(compressed, len(data)) + data
+        self._bytes_out += len(frame)
+        return frame
+
+    ##Decode received stream data. Data of frames not yet received whole
+    #is kept for the next call.
+    # @param data (string) stream data
+    # @returns (string) data of the whole frames received
+    def decode(self, data):
+        self._recv_buff += data
+        decoded = []
+        while len(self._recv_buff) >= ZlibCodec._FRAME_HEADER.size:
+            compressed, length = ZlibCodec._FRAME_HEADER.unpack_from(self._recv_buff)
+            end = ZlibCodec._FRAME_HEADER.size + length
+            if len(self._recv_buff) < end:
+                break
+            frame = self._recv_buff[ZlibCodec._FRAME_HEADER.size:end]
+            self._recv_buff = self._recv_buff[end:]
+            if compressed:
+                frame = self.decompress(frame)
+            decoded.append(frame)
+        return "".join(decoded)
+
+    ##Property method for compression ratio.
+    # @returns (float) data bytes encoded per byte of frames, None
+    # before any data
+    @property
+    def ratio(self):
+        if not self._bytes_out:
+            return None
+        return float(self._bytes_in) / self._bytes_out
+
+
+##Map of class name to class for each codec
+MAP = {
+    c.NAME: c for c in (ZlibCodec,)
+}
@@ -0,0 +1,294 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Server.congestioncontrol
+## @file congestioncontrol.py Implementation of @ref Reliable-UDP.Server.congestioncontrol
+
+import collections
+from ..Common import constants
+from ..Common.timers import now as _now
+
+## Base congestion controller.
+#
+# Decides how many packets a session may have in flight
+# (congestion window) and how fast it may send them (pacing).
+# Windows are counted in packets, times are in milliseconds. Packets
+# are numbered in the session, across the sequence spaces of its
+# connections.
+#
+class CongestionController(object):
+
+    ##Name of class
+    NAME = ""
+
+    ##Init function of CongestionController.
+    # @returns (CongestionController) CongestionController object
+    def __init__(self):
+        ##Congestion window in packets
+        self._cwnd = float(constants._INITIAL_CWND)
+
+    ##Logic on ACK that acknowledged new packets.
+    # @param acked (int) number of packets newly acked or selectively acked
+    # @param rtt (float) RTT sample in milliseconds, None if no sample
+    # @param ack_number (int) packet number following the packets newly
+    # acked cumulatively
+    # @param in_flight (int) packets sent and not acked after this ACK
+    def on_ack(self, acked, rtt, ack_number, in_flight):
+        pass
+
+    ##Logic on packet loss detected by SACK.
+    # @param packet_number (int) packet number of the next packet to be sent
+    def on_loss(self, packet_number):
+        pass
+
+    ##Logic on retransmission timeout.
+    # @param packet_number (int) packet number of the next packet to be sent
+    def on_timeout(self, packet_number):
+        pass
+
+    ##Returns time between two sent packets.
+    # @returns (float) pacing interval in milliseconds, None for no pacing
+    def get_pacing_interval(self):
+        return None
+
+    ##Property method for congestion window.
+    # @returns (int) congestion window in packets
+    @property
+    def cwnd(self):
+        return max(int(self._cwnd), 1)
+
+
+## NewReno congestion controller.
+#
+# Loss-based AIMD: slow start up to the slow start threshold, then
+# one packet per RTT of additive increase. The window is halved once
+# per loss event, and drops to one packet on timeout.
+#
+class NewRenoController(CongestionController):
+
+    ##Name of class
+    NAME = "newreno"
+
+    ##Init function of NewRenoController.
+    # @returns (NewRenoController) NewRenoController object
+    def __init__(self):
+        super(NewRenoController, self).__init__()
+        ##Slow start threshold in packets
+        self._ssthresh = float(constants._MAX_CWND)
+        ##Highest packet number sent when loss recovery started,
+        #None when not in recovery
+        self._recovery_point = None
+        ##Smoothed RTT in milliseconds, for pacing
+        self._srtt = None
+
+    ##Logic on ACK, grows the window when not in loss recovery.
+    # @param acked (int) number of packets newly acked or selectively acked
+    # @param rtt (float) RTT sample in milliseconds, None if no sample
+    # @param ack_number (int) packet number following the packets newly
+    # acked cumulatively
+    # @param in_flight (int) packets sent and not acked after this ACK
+    def on_ack(self, acked, rtt, ack_number, in_flight):
+        if rtt is not None:
+            if self._srtt is None:
+                self._srtt = rtt
+            else:
+                self._srtt = (1 - constants._SRTT_GAIN) * self._srtt + constants._SRTT_GAIN * rtt
+        if self._recovery_point is not None:
+            if ack_number <= self._recovery_point:
+                return
+            self._recovery_point = None
+        if self._cwnd < self._ssthresh:
+            self._cwnd += acked
+        else:
+            self._cwnd += float(acked) / self._cwnd
+        self._cwnd = min(self._cwnd, constants._MAX_CWND)
+
+    ##Logic on loss, halves the window once per loss event.
+    # @param packet_number (int) packet number of the next packet to be sent
+    def on_loss(self, packet_number):
+        if self._recovery_point is not None:
+            return
+        self._ssthresh = max(self._cwnd / 2, constants._MIN_CWND)
+        self._cwnd = self._ssthresh
+        self._recovery_point = packet_number - 1
+
+    ##Logic on timeout, restarts slow start from one packet.
+    # @param packet_number (int) packet number of the next packet to be sent
+    def on_timeout(self, packet_number):
+        self._ssthresh = max(self._cwnd / 2, constants._MIN_CWND)
+        self._cwnd = 1.0
+        self._recovery_point = None
+
+    ##Returns time between two sent packets, spreading a window
+    #over a smoothed RTT. Paces faster during slow start so the
+    #window can grow.
+    # @returns (float) pacing interval in milliseconds, None for no pacing
+    def get_pacing_interval(self):
+        if self._srtt is None:
+            return None
+        if self._cwnd < self._ssthresh:
+            gain = constants._SLOW_START_PACING_GAIN
+        else:
+            gain = constants._CONGESTION_AVOIDANCE_PACING_GAIN
+        return self._srtt / (self._cwnd * gain)
+
+
+## BBR-like congestion controller.
+#
+# Delay-based: estimates bottleneck bandwidth (windowed max of delivery
+# rate) and minimum RTT, and sends at that rate with a window of about
+# one bandwidth-delay product, so queues at the bottleneck stay short.
+# Loss is not treated as a congestion signal.
+#
+class BBRController(CongestionController):
+
+    ##Name of class
+    NAME = "bbr"
+
+    ##States of a BBR controller
+    _STATES = (
+        _STARTUP,
+        _DRAIN,
+        _PROBE_BW,
+        _PROBE_RTT,
+    ) = range(4)
+
+    ##Init function of BBRController.
+    # @returns (BBRController) BBRController object
+    def __init__(self):
+        super(BBRController, self).__init__()
+        now = _now()
+        ##Current state
+        self._state = BBRController._STARTUP
+        ##Pacing gain of current state
+        self._pacing_gain = constants._BBR_HIGH_GAIN
+        ##Window gain of current state
+        self._cwnd_gain = constants._BBR_HIGH_GAIN
+        ##Delivery rate samples of the last rounds, in packets per millisecond
+        self._bw_samples = collections.deque(maxlen=constants._BBR_BW_ROUNDS)
+        ##Bottleneck bandwidth estimate in packets per millisecond
+        self._btl_bw = 0.0
+        ##Minimum RTT estimate in milliseconds, None until sampled
+        self._min_rtt = None
+        ##Time the minimum RTT estimate was last lowered, or probe RTT
+        #state was last left
+        self._min_rtt_stamp = now
+        ##Start time of current round
+        self._round_start = now
+        ##Packets delivered in current round
+        self._delivered = 0
+        ##Bandwidth when startup last saw growth
+        self._full_bw = 0.0
+        ##Rounds in startup without bandwidth growth
+        self._full_bw_count = 0
+        ##Whether startup has filled the pipe
+        self._filled_pipe = False
+        ##Index of current gain in probe bandwidth gain cycle
+        self._cycle_index = 0
+        ##Time to leave probe RTT state
+        self._probe_rtt_done = None
+
+    ##Returns bandwidth-delay product.
+    # @returns (float) bandwidth-delay product in packets
+    def bdp(self):
+        if self._min_rtt is None or not self._btl_bw:
+            return float(constants._INITIAL_CWND)
+        return self._btl_bw * self._min_rtt
+
+    ##Logic on ACK, updates the model and sets the window. The minimum
+    #RTT estimate is only lowered here, probe RTT state takes a new one
+    #once it is too old.
+    # @param acked (int) number of packets newly acked or selectively acked
+    # @param rtt (float) RTT sample in milliseconds, None if no sample
+    # @param ack_number (int) packet number following the packets newly
+    # acked cumulatively
+    # @param in_flight (int) packets sent and not acked after this ACK
+    def on_ack(self, acked, rtt, ack_number, in_flight):
+        now = _now()
+        if rtt is not None and (self._min_rtt is None or rtt <= self._min_rtt):
+            self._min_rtt = rtt
+            self._min_rtt_stamp = now
+        self._delivered += acked
+        if self._min_rtt is not None and now - self._round_start >= self._min_rtt:
+            self._bw_samples.append(self._delivered / (now - self._round_start))
+            self._btl_bw = max(self._bw_samples)
+            self._delivered = 0
+            self._round_start = now
+            self.on_round_end(in_flight, now)
+        if self._state == BBRController._PROBE_RTT:
+            self._cwnd = float(constants._BBR_MIN_CWND)
+            return
+        target = self._cwnd_gain * self.bdp()
+        if self._filled_pipe:
+            self._cwnd = min(self._cwnd + acked, target)
+        elif self._cwnd < target or not self._btl_bw:
+            self._cwnd += acked
+        self._cwnd = min(
+            max(self._cwnd, constants._BBR_MIN_CWND),
+            constants._MAX_CWND,
+        )
+
+    ##Logic at the end of every round (about one minimum RTT),
+    #moves between states. When the minimum RTT estimate was not lowered
+    #for _BBR_MIN_RTT_WINDOW, probe RTT state drains the pipe and takes
+    #the estimate anew from its samples.
+    # @param in_flight (int) packets sent and not acked
+    # @param now (float) present time in milliseconds
+    def on_round_end(self, in_flight, now):
+        if self._state == BBRController._STARTUP:
+            if self._btl_bw >= self._full_bw * constants._BBR_FULL_BW_GROWTH:
+                self._full_bw = self._btl_bw
+                self._full_bw_count = 0
+            else:
+                self._full_bw_count += 1
+            if self._full_bw_count >= constants._BBR_FULL_BW_ROUNDS:
+                self._filled_pipe = True
+                self._state = BBRController._DRAIN
+                self._pacing_gain = 1 / constants._BBR_HIGH_GAIN
+        elif self._state == BBRController._DRAIN:
+            if in_flight <= self.bdp():
+                self.enter_probe_bw()
+        elif self._state == BBRController._PROBE_BW:
+            self._cycle_index = (self._cycle_index + 1) % len(constants._BBR_GAIN_CYCLE)
+            self._pacing_gain = constants._BBR_GAIN_CYCLE[self._cycle_index]
+        elif self._state == BBRController._PROBE_RTT:
+            if now >= self._probe_rtt_done:
+                self._min_rtt_stamp = now
+                if self._filled_pipe:
+                    self.enter_probe_bw()
+                else:
+                    self._state = BBRController._STARTUP
+                    self._pacing_gain = self._cwnd_gain = constants._BBR_HIGH_GAIN
+        if (
+            self._state != BBRController._PROBE_RTT
+            and now - self._min_rtt_stamp > constants._BBR_MIN_RTT_WINDOW
+        ):
+            self._state = BBRController._PROBE_RTT
+            self._pacing_gain = 1.0
+            self._probe_rtt_done = now + max(constants._BBR_PROBE_RTT_TIME, self._min_rtt)
+            self._min_rtt = None
+
+    ##Enter probe bandwidth state, cycling the pacing gain around 1.
+    def enter_probe_bw(self):
+        self._state = BBRController._PROBE_BW
+        self._cycle_index = 0
+        self._pacing_gain = constants._BBR_GAIN_CYCLE[0]
+        self._cwnd_gain = constants._BBR_CWND_GAIN
+
+    ##Logic on timeout, falls back to the minimal window.
+    # @param packet_number (int) packet number of the next packet to be sent
+    def on_timeout(self, packet_number):
+        self._cwnd = float(constants._BBR_MIN_CWND)
+
+    ##Returns time between two sent packets, from the bottleneck
+    #bandwidth estimate and the pacing gain of the state.
+    # @returns (float) pacing interval in milliseconds, None for no pacing
+    def get_pacing_interval(self):
+        if not self._btl_bw:
+            return None
+        return 1 / (self._pacing_gain * self._btl_bw)
+
+
+##Map of class name to class for each congestion controller
+MAP = {
+    c.NAME: c for c in CongestionController.__subclasses__()
+}
@@ -27,7 +27,8 @@ class ConnectionsService(HTTPService):
     def prepare_response(self):
         self._content = constants._CONNECTIONS_HTML
         table_data = ""
-        for c in self._http_socket._rudp_manager._connections:
+        statistics = self._http_socket._rudp_manager.get_server_statistics()
+        for (rudp_peer, cid), c in sorted(statistics["connections"].items()):
             table_data += (
                 """
                     <tr>
@@ -40,14 +41,14 @@ class ConnectionsService(HTTPService):
                         <td class="table-data">%s</td>
                     </tr>
                 """ % (
-                    c._rudp_peer,
-                    c._cid,
-                    c._close_user,
-                    c._remote_user,
-                    c._bytes_sent,
-                    c._bytes_received,
-                    c._sequence_num,
-                    c._peer_sequence_num,
+                    rudp_peer,
+                    cid,
+                    c["connected_user"],
+                    c["remote_user"],
+                    c["bytes_sent"],
+                    c["bytes_received"],
+                    c["sequence_number"],
+                    c["peer_sequence_number"],
                 )
             )
         self._content = self._content.replace(
@@ -25,6 +25,7 @@ class ConnectRequest(ControlRequest):
         "dest_port",
         "if_exists",
         "ttl",
+        "interactive",
     )
 
     ##Init Connect Request
@@ -35,22 +36,29 @@ class ConnectRequest(ControlRequest):
             control_socket
         )
 
-    ##Prepares response for send.
+    ##Prepares response for send. The exit server address starts
+    #resolving at once, so the first connection through the port finds
+    #it cached.
     # @returns (bool) finished preparing or not
     def prepare_response(self):
         if self._headers_in["if_exists"] == '':
             self._headers_in["if_exists"] = "0"
+        if self._headers_in["interactive"] == '':
+            self._headers_in["interactive"] = "0"
         self.check_headers()
+        rudp_manager = self._control_socket._rudp_manager
+        rudp_manager.resolver.resolve(self._headers_in["exit_address"])
         dl = DataListener(
             async_manager=self._control_socket._async_manager,
             bind_address=("0.0.0.0", self._headers_in["if_exists"]),
             exit_address=(self._headers_in["exit_address"], self._headers_in["exit_port"]),
             dest_address=(self._headers_in["dest_address"], self._headers_in["dest_port"]),
-            rudp_manager=self._control_socket._rudp_manager,
+            rudp_manager=rudp_manager,
             timeout=self._control_socket._timeout,
             block_size=constants._DATA_BLOCK_SIZE,
             buff_limit=constants._DATA_BUFF_LIMIT,
             ttl=self._headers_in["ttl"],
+            interactive=self._headers_in["interactive"],
         )
         self._headers_out["port"] = dl._s.getsockname()[1]
         return super(ConnectRequest, self).prepare_response()
@@ -63,6 +71,8 @@ class ConnectRequest(ControlRequest):
         print self._headers_in["if_exists"]
         if_exists = self._headers_in["if_exists"] = util.str_to_int(self._headers_in["if_exists"])
         print self._headers_in["if_exists"]
+        interactive = util.str_to_int(self._headers_in["interactive"])
+        self._headers_in["interactive"] = bool(interactive)
         if any(
             [
                 a is None for a in (
@@ -70,6 +80,7 @@ class ConnectRequest(ControlRequest):
                     exit_port,
                     dest_port,
                     if_exists,
+                    interactive,
                     util.check_tcp_port(
                         dest_port
                     ),
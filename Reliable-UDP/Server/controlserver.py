@@ -90,14 +90,14 @@ class ControlSocket(TCPServerSocket):
     ##Handles buffer received.
     # @param buf (string) buffer
     def handle_buf_received(self, buf):
-        self._recv_buff += buf
+        self._recv_buff.append(buf)
         self.parse_buffer()
 
     ##Parses current buffer
     def parse_buffer(self):
         if self._current_request:
             try:
-                self._current_request.parse_buffer(self._recv_buff)
+                self._current_request.parse_buffer(self._recv_buff.take())
             except Exception as e:
                 logging.info(
                     "%s: %s" % (self, traceback.format_exc())
@@ -108,7 +108,7 @@ class ControlSocket(TCPServerSocket):
 
             if self._current_request.finished():
                 self._current_request = None
-                self._recv_buff = ""
+                self._recv_buff.clear()
         else:
             try:
                 op = self.parse_op()
@@ -121,21 +121,19 @@ class ControlSocket(TCPServerSocket):
                 )
                 self.send_error(e)
                 self._current_request = None
-                self._recv_buff = ""
+                self._recv_buff.clear()
 
     ##Parses operation (op) - statistics or connect.
     # @returns (ControlRequest) type of request
     def parse_op(self):
-        i = self._recv_buff.find("\n")
-        if i != -1:
-            line, buf = self._recv_buff[:i], self._recv_buff[(i+1):]
+        line = self._recv_buff.read_until("\n")
+        if line is not None:
             i = line.find("=")
             if i == -1:
                 raise ControlError(code=1, message="Invalid Header")
             field, op = line.split("=")
             if field != "op" or op not in ControlSocket._REQUEST_CLASSES:
                 raise ControlError(code=1, message="Invalid Header")
-            self._recv_buff = buf
             return ControlSocket._REQUEST_CLASSES[op]
 
     ##Sends error code to user
@@ -193,6 +191,7 @@ class ControlListener(TCPServerListener):
     # @param timeout (int) default timeout in milliseconds
     # @param block_size (int) reading block size in bytes
     # @param buff_limit (int) receiving buff limit in bytes
+    # @param reuse_port (bool) bind with SO_REUSEPORT
     # @returns (ControlListener) object
     def __init__(
         self,
@@ -202,6 +201,7 @@ class ControlListener(TCPServerListener):
         timeout,
         block_size,
         buff_limit,
+        reuse_port=False,
     ):
         super(ControlListener, self).__init__(
             bind_address=bind_address,
@@ -209,6 +209,7 @@ class ControlListener(TCPServerListener):
             timeout=timeout,
             block_size=block_size,
             buff_limit=buff_limit,
+            reuse_port=reuse_port,
         )
         ##RUDP Manager object
         self._rudp_manager = rudp_manager
@@ -219,7 +220,7 @@ class ControlListener(TCPServerListener):
         try:
             s1, addr = self._s.accept()
             logging.info(
-                "%s: Control Connection accepted from %s" % (self, s1.getpeername())
+                "%s: Control Connection accepted from %s" % (self, addr)
             )
             s1.setblocking(0)
             ControlSocket(
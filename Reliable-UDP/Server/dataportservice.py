@@ -34,30 +34,38 @@ class DataPortService(HTTPService):
         ttl = self._qs["ttl"][0] = util.str_to_float(self._qs["ttl"][0])
         exit_port = self._qs["exit_port"][0] = util.str_to_int(self._qs["exit_port"][0])
         dest_port = self._qs["dest_port"][0] = util.str_to_int(self._qs["dest_port"][0])
+        interactive = util.str_to_int(self._qs.get("interactive", ["0"])[0])
+        self._qs["interactive"] = [bool(interactive)]
         if any(
             [
                 a is None for a in (
                     ttl,
                     exit_port,
                     dest_port,
+                    interactive,
                 )
             ]
         ):
             raise RuntimeError("Invalid Request")
 
-    ##Prepares response for send
+    ##Prepares response for send. The exit server address starts
+    #resolving at once, so the first connection through the port finds
+    #it cached.
     # @returns (bool) finished preparing or not
     def prepare_response(self):
+        rudp_manager = self._http_socket._rudp_manager
+        rudp_manager.resolver.resolve(self._qs["exit_address"][0])
         dl = DataListener(
             async_manager=self._http_socket._async_manager,
             bind_address=("0.0.0.0", 0),
             exit_address=(self._qs["exit_address"][0], self._qs["exit_port"][0]),
             dest_address=(self._qs["dest_address"][0], self._qs["dest_port"][0]),
-            rudp_manager=self._http_socket._rudp_manager,
+            rudp_manager=rudp_manager,
             timeout=self._http_socket._timeout,
-            block_size=self._http_socket._block_size,
-            buff_limit=self._http_socket._buff_limit,
+            block_size=constants._DATA_BLOCK_SIZE,
+            buff_limit=constants._DATA_BUFF_LIMIT,
             ttl=self._qs["ttl"][0],
+            interactive=self._qs["interactive"][0],
         )
         self._content = constants._FORM_HTML.replace(
             "$port$",
@@ -4,10 +4,7 @@
 ## @file dataserver.py Implementation of @ref Reliable-UDP.Server.dataserver
 
 import traceback
-from ..Common import constants
 from ..Common.tcpserver import TCPServerSocket, TCPServerListener
-from datetime import datetime, timedelta
-import rudpconnection
 import logging
 
 ## Data Socket
@@ -33,6 +30,7 @@ class DataSocket(TCPServerSocket):
     # @param exit_address (tuple) exit server address for connection
     # @param dest_address (tuple) destination address for connection
     # @param connection (RUDPConnection) RUDPConnection object
+    # @param interactive (bool) connection never holds data for more data
     # @returns DataSocket object
     def __init__(
         self,
@@ -46,6 +44,7 @@ class DataSocket(TCPServerSocket):
         exit_address=None,
         dest_address=None,
         connection=None,
+        interactive=False,
     ):
         super(DataSocket, self).__init__(
             async_manager=async_manager,
@@ -62,28 +61,53 @@ class DataSocket(TCPServerSocket):
             self._exit_address = exit_address
             ##Destination address
             self._dest_address = dest_address
-            ##Connection object
-            self._connection = self._rudp_manager.init_connection(
-                rudp_exit=exit_address,
-                initiator=self._s.getpeername(),
-                endpoint=dest_address,
-                data_socket=self,
-            )
+            ##Connection never holds data for more data
+            self._interactive = interactive
+            ##Connection object, made once the exit server address is
+            #resolved
+            self._connection = None
+            self._rudp_manager.resolver.resolve(exit_address[0], self.exit_resolved)
         else:
             assert connect_address is not None and connection is not None
             self._connection = connection
 
-    ##Handle buffer received.
+    ##Logic when the address of the exit server is resolved: inits the
+    #connection through it.
+    # @param address (string) IPv4 address, None if not resolved
+    def exit_resolved(self, address):
+        if self._closing:
+            return
+        if address is None:
+            logging.error(
+                "%s: Couldn't resolve address of exit server %s, closing" % (self, self._exit_address[0])
+            )
+            self.init_close()
+            return
+        self._connection = self._rudp_manager.init_connection(
+            rudp_exit=(address, self._exit_address[1]),
+            initiator=self.peer,
+            endpoint=self._dest_address,
+            data_socket=self,
+            interactive=self._interactive,
+        )
+        self.schedule_update()
+
+    ##Handle buffer received. Buffers are given to the connection at
+    #once, before the remote connection is approved too.
     # @param buf (string) buffer
     def handle_buf_received(self, buf):
-        self._recv_buff += buf
-        if self._connection._connection_state not in (
-            rudpconnection.RUDPConnection._WAITING_FOR_ACK,
-            rudpconnection.RUDPConnection._WAITING_FOR_INIT_ACK,
-            rudpconnection.RUDPConnection._WAITING_REMOTE_CONNECTION_APPROVAL,
-        ):
-            self._connection.queue_buffer(self._recv_buff)
-            self._recv_buff = ""
+        self._connection.queue_buffer(buf)
+
+    ##Handle buffer sent to user.
+    # @param buf (string) buffer
+    def handle_buf_sent(self, buf):
+        if self._connection and not self._connection._closing:
+            self._connection.user_data_sent()
+
+    ##Returns bytes queued to be sent to the user.
+    # @returns (int) bytes queued
+    def bytes_queued(self):
+        return len(self._send_buff)
 
     ##Logic when connection is successful
     def approve_connection(self):
@@ -94,17 +118,15 @@ class DataSocket(TCPServerSocket):
     def __repr__(self):
         return "Data Socket (%s)" % self._fileno
 
-    ##Returns whether or not socket is receiving.
+    ##Returns whether or not socket is receiving. The socket reads
+    #while its connection is within its send budget, so a saturated
+    #connection stops the user. The connection schedules an update of
+    #the socket when ACKs free its budget.
     # @returns (bool) receiving or not
     def receiving(self):
         return (
-            len(self._recv_buff) < self._buff_limit
-            and self._connection
-            and self._connection._connection_state not in (
-                rudpconnection.RUDPConnection._WAITING_FOR_ACK,
-                rudpconnection.RUDPConnection._WAITING_FOR_INIT_ACK,
-                rudpconnection.RUDPConnection._WAITING_REMOTE_CONNECTION_APPROVAL,
-            )
+            self._connection
+            and self._connection.bytes_pending() < self._connection.get_send_budget()
         )
 
     ##Terminates object completely.
@@ -136,6 +158,7 @@ class DataListener(TCPServerListener):
     # @param buff_limit (int) receiving buff limit in bytes
     # @param ttl (int) How long in seconds the DataListener object
     #will stay alive.
+    # @param interactive (bool) connections never hold data for more data
     # @returns (DataListener) Data Listener object
     def __init__(
         self,
@@ -148,6 +171,7 @@ class DataListener(TCPServerListener):
         block_size,
         buff_limit,
         ttl,
+        interactive=False,
     ):
         super(DataListener, self).__init__(
             bind_address=bind_address,
@@ -164,14 +188,18 @@ class DataListener(TCPServerListener):
         self._dest_address = dest_address
         ##Time to live of socket
         self._ttl = ttl
-        ##Datetime object of when to close the socket
-        self._time_to_close = datetime.now() + timedelta(seconds=ttl)
-
-    ##Updates DataListener. Closes if TTL has passed
-    def update(self):
-        if self._ttl and datetime.now() >= self._time_to_close:
-            self.init_close()
-        return super(DataListener, self).update()
+        ##Connections never hold data for more data
+        self._interactive = interactive
+        ##Timer to close the socket when its TTL has passed
+        self._ttl_timer = None
+        if ttl:
+            self._ttl_timer = async_manager.timers.call_later(ttl * 1000, self.init_close)
+
+    ##Terminate DataListener, cancelling its TTL timer.
+    def terminate(self):
+        if self._ttl_timer is not None:
+            self._ttl_timer.cancel()
+        super(DataListener, self).terminate()
 
     ##Logic on read event. Accept connections and make Data Sockets.
     def read(self):
@@ -179,7 +207,7 @@ class DataListener(TCPServerListener):
         try:
             s1, addr = self._s.accept()
             logging.info(
-                "%s: Data Connection accepted from %s" % (self, s1.getpeername())
+                "%s: Data Connection accepted from %s" % (self, addr)
             )
             s1.setblocking(0)
             DataSocket(
@@ -191,6 +219,7 @@ class DataListener(TCPServerListener):
                 socket=s1,
                 block_size=self._block_size,
                 buff_limit=self._buff_limit,
+                interactive=self._interactive,
             )
         except IOError:
             logging.error(
@@ -199,16 +228,6 @@ class DataListener(TCPServerListener):
             if s1:
                 s1.close()
 
-    ##Returns preferred sleep time of DataListener.
-    # @returns (int) sleep time in milliseconds
-    def get_sleep_time(self):
-        t = constants._TIMEOUT
-        if self._ttl and not self._closing:
-            t = min (
-                t, (self._time_to_close - datetime.now()).total_seconds() * 1000.0,
-            )
-        return t
-
     ##String representation of object.
     # @returns (string) representation
     def __repr__(self):
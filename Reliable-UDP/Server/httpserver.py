@@ -4,7 +4,6 @@
 ## @file httpserver.py Implementation of @ref Reliable-UDP.Server.httpserver
 
 import traceback
-from ..Common import util
 from ..Common.tcpserver import TCPServerSocket, TCPServerListener
 import urlparse
 from fileservice import FileService
@@ -113,14 +112,14 @@ class HTTPSocket(TCPServerSocket):
     ##Handle buffer received (pass on to parse).
     # @param buf (string) buffer received.
     def handle_buf_received(self, buf):
-        self._recv_buff += buf
+        self._recv_buff.append(buf)
         self.parse_buffer()
 
     ##Parse buffer received.
     def parse_buffer(self):
         if self._service:
             try:
-                self._service.parse_buffer(self._recv_buff)
+                self._service.parse_buffer(self._recv_buff.take())
             except Exception as e:
                 logging.error(
                     "%s: %s" % (self, traceback.format_exc())
@@ -132,7 +131,7 @@ class HTTPSocket(TCPServerSocket):
             if self._service.finished():
                 self.init_close()
                 self._service = None
-                self._recv_buff = ""
+                self._recv_buff.clear()
 
         else:
             try:
@@ -152,7 +151,7 @@ class HTTPSocket(TCPServerSocket):
     ## Parse HTTP status message.
     # @returns (bool) Status parsed or not
     def parse_status(self):
-        status, self._recv_buff = util.split_buffer(self._recv_buff, constants._CRLF_BIN)
+        status = self._recv_buff.read_until(constants._CRLF_BIN)
         if not status:
             return
         status_comps = status.split(' ', 2)
@@ -253,6 +252,7 @@ class HTTPListener(TCPServerListener):
     # @param timeout (int) default timeout in milliseconds
     # @param block_size (int) reading block size in bytes
     # @param buff_limit (int) receiving buff limit in bytes
+    # @param reuse_port (bool) bind with SO_REUSEPORT
     # @returns (HTTPListener) object
     def __init__(
         self,
@@ -262,6 +262,7 @@ class HTTPListener(TCPServerListener):
         timeout,
         block_size,
         buff_limit,
+        reuse_port=False,
     ):
         super(HTTPListener, self).__init__(
             bind_address=bind_address,
@@ -269,6 +270,7 @@ class HTTPListener(TCPServerListener):
             timeout=timeout,
             block_size=block_size,
             buff_limit=buff_limit,
+            reuse_port=reuse_port,
         )
         ##RUDP Manager object
         self._rudp_manager = rudp_manager
@@ -279,7 +281,7 @@ class HTTPListener(TCPServerListener):
         try:
             s1, addr = self._s.accept()
             logging.info(
-                "%s: HTTP Connection accepted from %s" % (self, s1.getpeername())
+                "%s: HTTP Connection accepted from %s" % (self, addr)
             )
             s1.setblocking(0)
             HTTPSocket(
@@ -3,11 +3,13 @@
 ## @package Reliable-UDP.Server.rudpconnection
 ## @file rudpconnection.py Implementation of @ref Reliable-UDP.Server.rudpconnection
 
-from datetime import datetime, timedelta
+import bisect
+import compression
 from dataserver import DataSocket
-import random
+from ..Common import timers
 from ..Common import util
-import socket
+from ..Common.chunkbuffer import ChunkBuffer
+import struct
 from ..Common import constants
 import traceback
 import logging
@@ -36,14 +38,18 @@ class RUDPConnection(object):
         _FLAG_CLOSE,
         _FLAG_INIT,
         _FLAG_KPALIVE,
+        _FLAG_PROBE,
+        _FLAG_FEC,
     ) = (
         0,
         1,
         2,
         4,
         8,
+        32,
+        64,
     )
-    ##Components of an RUDP packet
+    ##Components of a legacy RUDP packet, in order
     _COMPONENTS = (
         _LENGTH,
         _CID,
@@ -51,7 +57,16 @@ class RUDPConnection(object):
         _SQN_NUM,
         _DATA,
     ) = range(5)
-    ##Map of component to length of that component
+    ##Protocol version of a received packet, not a component of
+    #legacy packets
+    _VERSION = 5
+    ##Cumulative ACK carried by a received data packet, not a component
+    #of legacy packets
+    _ACK_NUM = 6
+    ##Receive window carried by a received ACK packet or ACK field, not a
+    #component of legacy packets
+    _WINDOW = 7
+    ##Map of component to length of that component in legacy packets
     _LENGTHS = {
         _LENGTH: constants._LENGTH_LENGTH,
         _CID: constants._CID_LENGTH,
@@ -67,18 +82,63 @@ class RUDPConnection(object):
         _SQN_NUM: 'int',
         _DATA: 'str',
     }
+    ##Binary header: version with binary mark, flag, CID, sequence
+    #number and data length, in network byte order
+    _HEADER = struct.Struct("!BBHIH")
+    ##Binary SACK block: first and last sequence number
+    _SACK_BLOCK = struct.Struct("!II")
+    ##Bit of the flag of binary data packets that carry an ACK field
+    #before their data
+    _ACK_FIELD_FLAG = 0x10
+    ##ACK field: sequence number acknowledged cumulatively
+    _ACK_FIELD = struct.Struct("!I")
+    ##ACK field of versions with flow control: sequence number
+    #acknowledged cumulatively and receive window in bytes
+    _ACK_WINDOW_FIELD = struct.Struct("!II")
+    ##Receive window in bytes, before the SACK blocks in the data of ACK
+    #packets of versions with flow control
+    _WINDOW_FIELD = struct.Struct("!I")
+    ##Prefix of the data of connection approval packets that announce
+    #the ACK frequency
+    _ACK_FREQUENCY_PREFIX = "Ack Frequency:"
+    ##Prefix of the codec in the data of connection approval packets
+    _COMPRESSION_PREFIX = "Compression:"
+    ##Option of the version line of init packets: codec offered
+    _COMPRESSION_OPTION = "Compression"
+    ##Option of the version line of init packets: interactive connection
+    _INTERACTIVE_OPTION = "Interactive"
+    ##Header of the data of parity packets: number of data packets in the
+    #block and XOR of their data lengths, followed by the XOR of their data
+    _FEC_HEADER = struct.Struct("!BH")
+    ##Data of closing packets that abort the connection, in versions
+    #with sequenced closing packets. Such packets are not sequenced, and
+    #are received at once
+    _ABORT_DATA = "Abort"
 
     ##Init RUDPConnection
     # @param rudp_manager (RUDPManager) RUDP Manager object
     # @param async_manager (Poller) Poller object
-    # @param rudp_peer_address (tuple) Exit server address
+    # @param rudp_peer_address (tuple) Exit server address, resolved
+    # @param session (RUDPSession) Session with the exit server
     # @param cid (int) Connection ID
     # @param state (int) Numerical value of starting state
-    # @param keep_alive_interval (int) Keep alive interval of connection in milliseconds
-    # @param retry_interval (int) Retry interval (RTO) of connection in milliseconds
+    # @param retry_interval (int) Initial retry interval (RTO) of connection
+    # in milliseconds, until the session has measured round trip times
     # @param connection_approval_interval (int) Connection approval interval
     # of connection in milliseconds
     # @param retry_count (int) Max transmits before exhaustion
+    # @param send_window (int) Max sequenced packets sent and not yet acked
+    # @param send_budget (int) Least bytes taken from the user and not yet
+    # acked
+    # @param tail_delay (float) Max time in milliseconds data shorter than
+    # a data packet is held for more data
+    # @param log_sample (int) Log one in every log_sample packets
+    # @param fec (bool) Send forward error correction parity, if the peer
+    # speaks it
+    # @param compression (class) Codec class offered to the answerer for
+    # the tunneled stream, None for no compression
+    # @param interactive (bool) Never hold data for more data, in both
+    # directions
     # @param data_socket (DataSocket) Data socket object of the connection
     # @param initiator (tuple) Address of initiator user
     # @param endpoint (tuple) Address of target user
@@ -87,12 +147,19 @@ class RUDPConnection(object):
         rudp_manager,
         async_manager,
         rudp_peer_address,
+        session,
         cid,
         state,
-        keep_alive_interval,
         retry_interval,
         connection_approval_interval,
         retry_count,
+        send_window,
+        send_budget=constants._SEND_BUDGET,
+        tail_delay=constants._TAIL_DELAY,
+        log_sample=constants._LOG_SAMPLE,
+        fec=False,
+        compression=None,
+        interactive=False,
         data_socket=None,
         initiator=None,
         endpoint=None,
@@ -101,45 +168,133 @@ class RUDPConnection(object):
         ##Connection state
         self._connection_state = state
         self._rudp_peer_addr, self._rudp_peer_port = rudp_peer_address
-        self._rudp_peer_addr = socket.gethostbyname(self._rudp_peer_addr)
         ##Address of remote RUDP server
         self._rudp_peer = self._rudp_peer_addr, self._rudp_peer_port
         ##RUDP Manager object
         self._rudp_manager = rudp_manager
+        ##Session with the remote RUDP server, shared by its connections
+        self._session = session
         ##Async manager object (Poller)
         self._async_manager = async_manager
-        ##Sequence number of packets sent
+        ##Sequence number of the next sequenced packet to be sent
         self._sequence_num = 0
-        ##Sequence number of packets received from peer
+        ##Highest sequence number received in order from peer
         self._peer_sequence_num = None
         ##Connection ID
         self._cid = cid
+        ##Protocol version of the connection, legacy until negotiated
+        #in the init exchange
+        self._version = constants._LEGACY_VERSION
+        ##Width in bits of sequence numbers on the wire, by protocol version
+        self._sqn_bits = constants._LEGACY_SQN_BITS
         ##Data socket object
         self._data_socket = data_socket
-        ##Retry interval (RTO) of no ack before retransmitting
+        ##Retry interval (RTO) of no ack before retransmitting, from the
+        #round trip times measured by the session, with backoff
         self._retry_interval = retry_interval
+        if session.srtt is not None:
+            self._retry_interval = session.retry_interval
+        ##Times in milliseconds of when sequenced packets that have not been
+        #retransmitted were sent, by sequence number - used for RTT samples
+        self._send_times = {}
         ##Retry count before giving up and closing connection
         self._retry_count = retry_count
-        ##Keep-alive interval of idle connection
-        #before sending keep-alive packet
-        self._keep_alive_interval = keep_alive_interval
+        ##Send window - max sequenced packets sent and not yet acked,
+        #flow control of the stream
+        self._send_window = send_window
+        ##Least send budget - bytes taken from the user and not yet acked
+        self._send_budget = send_budget
+        ##Sampler of per-packet log lines
+        self._log_sampler = util.LogSampler(log_sample)
         ##Connection approval interval - time to wait for connection
         #approval before giving up and closing connection
         self._connection_approval_interval = connection_approval_interval
-        if keep_alive_interval == constants._KEEP_ALIVE_INTERVAL:
-            self._keep_alive_interval -= random.random() * 1000
-        ##Datetime object to send keep-alive
-        self._time_send_kp_alive = None
-        ##Datetime object to retransmit packet
-        self._time_send_retry = None
-        ##Datetime object to give up on connection approval
+        ##Deadline to retransmit packets
+        self._retry_deadline = timers.Deadline(
+            async_manager.timers,
+            self.retry_expired,
+        )
+        ##Deadline to give up on connection approval
         #and close connection
-        self._time_give_up_connection_approval = None
-        ##Last non-ack datagram sent - used for retransmissions
-        self._last_datagram_sent = None
+        self._connection_approval_deadline = timers.Deadline(
+            async_manager.timers,
+            self.connection_approval_expired,
+        )
+        ##Deadline to send the next paced packet, or data held for
+        #more data
+        self._pacing_deadline = timers.Deadline(
+            async_manager.timers,
+            self.send_buffered,
+        )
+        ##Deadline to send a delayed ACK
+        self._ack_deadline = timers.Deadline(
+            async_manager.timers,
+            self.queue_ack,
+        )
+        ##Packets received and not yet acked
+        self._ack_pending = 0
+        ##Packets received in order before an ACK is sent, every packet
+        #is acked at once until the answerer announced otherwise
+        self._ack_frequency = 1
+        ##Sequenced packets sent and neither acked nor selectively acked,
+        #dictionary of sequence number to (flag, data) - used for retransmissions
+        self._retransmit_buffer = {}
+        ##Lowest sequence number not yet acknowledged cumulatively
+        self._send_base = 0
+        ##Data bytes of data packets sent and not acked cumulatively, by
+        #sequence number
+        self._data_in_flight = {}
+        ##Data bytes of data packets sent and not acked cumulatively
+        self._bytes_in_flight = 0
+        ##Receive window of the peer in bytes - max data bytes sent and not
+        #acked cumulatively, None for peers that don't advertise one
+        self._peer_window = None
+        ##Receive window last advertised to the peer in bytes
+        self._advertised_window = constants._DATA_SEND_BUFF_LIMIT
+        ##Deadline to probe the receive window of the peer when it is
+        #full and no ACK is coming
+        self._persist_deadline = timers.Deadline(
+            async_manager.timers,
+            self.persist_expired,
+        )
+        ##Sequence numbers above the send base selectively acked by peer
+        self._sacked = set()
+        ##Sequence numbers already fast retransmitted since last timeout
+        self._fast_retransmitted = set()
+        ##Packets received out of order, dictionary of sequence number
+        #to packet, waiting for the gap before them to be filled
+        self._reorder_buffer = {}
+        ##Send forward error correction parity or not
+        self._fec = fec
+        ##Sequence numbers and data of the data packets sent since the
+        #last parity packet
+        self._fec_block = []
+        ##Data of data packets received, by sequence number - used to
+        #rebuild a lost packet from parity, once the peer sent parity
+        self._fec_received = {}
+        ##Whether the peer sends parity
+        self._fec_receiving = False
+        ##Overall data packets rebuilt from parity
+        self._packets_rebuilt = 0
+        ##Codec class offered to the answerer
+        self._compression = compression
+        ##Codec of the tunneled stream, None until negotiated
+        self._codec = None
         ##Buffer to be queued as datagrams
-        self._send_buff = ""
-        ##Times retrasmitted current packet
+        self._send_buff = ChunkBuffer()
+        ##Data received for the user before the data socket to it was
+        #made, while its address is resolved
+        self._resolve_buff = ChunkBuffer()
+        ##Never hold data for more data or not
+        self._interactive = interactive
+        ##Max time in milliseconds data shorter than a data packet is held
+        self._tail_delay = tail_delay
+        ##Time in milliseconds of when the data held began waiting, None
+        #when no data is held
+        self._tail_time = None
+        ##Data bytes sent before the connection was approved
+        self._early_data = 0
+        ##Consecutive retransmission timeouts without progress
         self._times_retried = 0
         ##Overall data bytes sent since beginning of connection
         self._bytes_sent = 0
@@ -147,6 +302,11 @@ class RUDPConnection(object):
         self._bytes_received = 0
         ##Boolean - closing or not
         self._closing = False
+        ##Whether the user is gone and the connection sends what is left
+        #of the data taken from the user before closing
+        self._draining = False
+        ##Whether the sequenced closing packet was sent
+        self._close_queued = False
         logging.info(
             "%s: Initialized" % self
         )
@@ -166,10 +326,21 @@ class RUDPConnection(object):
                     self._close_user,
                 )
             )
-            self._time_give_up_connection_approval = None
+            self._connection_approval_deadline.cancel()
+            if d[RUDPConnection._DATA]:
+                self._ack_frequency, codec = self.parse_approval_data(d[RUDPConnection._DATA])
+                if self._compression and codec == self._compression.NAME:
+                    self.set_codec(codec)
             self._connection_state = RUDPConnection._READY_FOR_SEND
+            self.send_buffered()
         elif self._connection_state == RUDPConnection._INIT_ANSWERER:
-            initiator_address, initiator_port, endpoint_addr, endpoint_port = self.parse_init_data(d[RUDPConnection._DATA])
+            initiator_address, initiator_port, endpoint_addr, endpoint_port, version, options = self.parse_init_data(d[RUDPConnection._DATA])
+            self.set_version(min(version, constants._PROTOCOL_VERSION))
+            codec = options.get(RUDPConnection._COMPRESSION_OPTION)
+            if codec in compression.MAP and self._version >= constants._COMPRESSION_VERSION:
+                self.set_codec(codec)
+            if options.get(RUDPConnection._INTERACTIVE_OPTION) == "1":
+                self._interactive = True
             self._close_user = endpoint_addr, endpoint_port
             self._remote_user = initiator_address, initiator_port
             logging.info(
@@ -179,57 +350,225 @@ class RUDPConnection(object):
                     self._rudp_peer,
                 )
             )
-            try:
-                self._data_socket = DataSocket(
-                    async_manager=self._async_manager,
-                    rudp_manager=self._rudp_manager,
-                    timeout=constants._TIMEOUT,
-                    block_size=constants._DATA_BLOCK_SIZE,
-                    buff_limit=constants._DATA_BUFF_LIMIT,
-                    connect_address=self._close_user,
-                    connection=self,
-                )
-                self._connection_state = RUDPConnection._WAITING_CONNECT_STATUS
-            except IOError:
-                logging.error(
-                    "%s: Failed to initalize connection:\n%s" % (self, traceback.format_exc())
-                )
-                self.init_close()
+            self._connection_state = RUDPConnection._WAITING_CONNECT_STATUS
+            self._rudp_manager.resolver.resolve(endpoint_addr, self.endpoint_resolved)
+
+    ##Logic when the address of the target user is resolved: connects
+    #the data socket to it, with the data received for it so far.
+    # @param address (string) IPv4 address, None if not resolved
+    def endpoint_resolved(self, address):
+        if self._closing:
+            return
+        if address is None:
+            logging.error(
+                "%s: Couldn't resolve address of user %s, closing connection" % (self, self._close_user)
+            )
+            self.init_close()
+            return
+        try:
+            self._data_socket = DataSocket(
+                async_manager=self._async_manager,
+                rudp_manager=self._rudp_manager,
+                timeout=constants._TIMEOUT,
+                block_size=constants._DATA_BLOCK_SIZE,
+                buff_limit=constants._DATA_BUFF_LIMIT,
+                connect_address=(address, self._close_user[1]),
+                connection=self,
+            )
+        except IOError:
+            logging.error(
+                "%s: Failed to initalize connection:\n%s" % (self, traceback.format_exc())
+            )
+            self.init_close()
+            return
+        if self._resolve_buff:
+            self._data_socket.queue_buffer(self._resolve_buff.take())
 
     ##Receive data packet and apply logic.
     # @param d (dict) Data Packet
     def receive_data(self, d):
-        self._bytes_received += len(d[RUDPConnection._DATA])
-        self._data_socket.queue_buffer(d[RUDPConnection._DATA])
+        data = d[RUDPConnection._DATA]
+        self._bytes_received += len(data)
+        if self._codec:
+            data = self._codec.decode(data)
+        if not data:
+            return
+        if self._data_socket:
+            self._data_socket.queue_buffer(data)
+        elif not self._draining:
+            self._resolve_buff.append(data)
 
     ##Receive ACK packet and apply logic.
+    #ACKs are cumulative, acknowledging every sequence number up to
+    #and including the one in the packet. The data of the packet holds
+    #SACK blocks of packets received after a gap. Sequence numbers on the
+    #wire wrap around, and are taken as the nearest to the send base.
+    #The receive window of the peer is taken from ACKs not older than
+    #the last cumulative ACK.
     # @param d (dict) ACK Packet
     def receive_ack(self, d):
-        if d[RUDPConnection._SQN_NUM] == self._sequence_num:
+        if RUDPConnection._WINDOW in d and d[RUDPConnection._SQN_NUM] + 1 >= self._send_base:
+            self._peer_window = d[RUDPConnection._WINDOW]
+        send_times = []
+        in_flight = len(self._retransmit_buffer)
+        ack_number = 0
+        for start, end in self.parse_sack_blocks(d[RUDPConnection._DATA], d[RUDPConnection._VERSION]):
+            start = util.serial_unwrap(start, self._send_base, self._sqn_bits)
+            end = util.serial_unwrap(end, self._send_base, self._sqn_bits)
+            for sqn in range(max(start, self._send_base), min(end + 1, self._sequence_num)):
+                if sqn in self._retransmit_buffer:
+                    del self._retransmit_buffer[sqn]
+                    self._sacked.add(sqn)
+                    if sqn in self._send_times:
+                        send_times.append(self._send_times.pop(sqn))
+        progress = d[RUDPConnection._SQN_NUM] >= self._send_base
+        if progress:
+            for sqn in range(self._send_base, d[RUDPConnection._SQN_NUM] + 1):
+                segment = self._retransmit_buffer.pop(sqn, None)
+                if segment is not None:
+                    ack_number = max(ack_number, segment[2] + 1)
+                self._bytes_in_flight -= self._data_in_flight.pop(sqn, 0)
+                self._sacked.discard(sqn)
+                self._fast_retransmitted.discard(sqn)
+                if sqn in self._send_times:
+                    send_times.append(self._send_times.pop(sqn))
+        rtt = None
+        if send_times:
+            rtt = timers.now() - max(send_times)
+            self.update_rtt(rtt)
+        if progress:
+            self._send_base = d[RUDPConnection._SQN_NUM] + 1
             if self._connection_state == RUDPConnection._WAITING_FOR_INIT_ACK:
                 self._connection_state = RUDPConnection._WAITING_REMOTE_CONNECTION_APPROVAL
-                self._time_give_up_connection_approval = datetime.now() + timedelta(microseconds=self._connection_approval_interval * 1000)
+                self._connection_approval_deadline.set(self._connection_approval_interval)
                 logging.info(
                     "%s: Received init ack" % self
                 )
                 logging.debug(
-                    "%s: Last time set for receiving connection approval: %s" % (
+                    "%s: Waiting %s ms for connection approval" % (
                         self,
-                        util.present_datetime(self._time_give_up_connection_approval),
+                        self._connection_approval_interval,
                     )
                 )
-            else:
+            elif self._connection_state == RUDPConnection._WAITING_FOR_ACK:
                 self._connection_state = RUDPConnection._READY_FOR_SEND
+            if self._log_sampler.sample(logging.DEBUG):
+                logging.debug(
+                    "%s: Acknowledged up to sequence number %s, %s packets in flight" % (
+                        self,
+                        d[RUDPConnection._SQN_NUM],
+                        len(self._retransmit_buffer),
+                    )
+                )
+            self._times_retried = 0
+            self._retry_deadline.clear()
+            if self._retransmit_buffer:
+                self._retry_deadline.set(self._retry_interval)
+            if self._data_socket:
+                self._data_socket.schedule_update()
+        if len(self._retransmit_buffer) < in_flight:
+            self._session.on_ack(
+                in_flight - len(self._retransmit_buffer),
+                rtt,
+                ack_number,
+            )
+        self.fast_retransmit()
+        self.send_buffered()
+        self._session.send_waiting()
+
+    ##Update the RTT estimate of the session with a new round trip time
+    #sample, and take its retry interval (RTO). Samples are only taken
+    #from packets that were never retransmitted (Karn's rule), so a
+    #sample also ends any exponential backoff.
+    # @param rtt (float) round trip time sample in milliseconds
+    def update_rtt(self, rtt):
+        self._session.update_rtt(rtt)
+        self._retry_interval = self._session.retry_interval
+        if self._log_sampler.sample(logging.DEBUG):
             logging.debug(
-                "%s: Incremented sequence number from %s to %s" % (self, self._sequence_num, self._sequence_num + 1)
+                "%s: RTT sample %.1f ms, smoothed RTT %.1f ms, RTT variance %.1f ms, RTO %.1f ms" % (
+                    self,
+                    rtt,
+                    self._session.srtt,
+                    self._session.rttvar,
+                    self._retry_interval,
+                )
             )
-            self._sequence_num += 1
-            self._times_retried = 0
-            self._time_send_retry = None
 
-    ##Receive close packet and apply logic.
+    ##Retransmit packets that are considered lost because at least
+    #_DUP_THRESHOLD packets sent after them have been selectively acked.
+    #Every packet is fast retransmitted at most once between timeouts.
+    def fast_retransmit(self):
+        if len(self._sacked) < constants._DUP_THRESHOLD:
+            return
+        sacked = sorted(self._sacked)
+        for sqn_num in sorted(self._retransmit_buffer):
+            if sqn_num in self._fast_retransmitted:
+                continue
+            if len(sacked) - bisect.bisect(sacked, sqn_num) < constants._DUP_THRESHOLD:
+                break
+            flag, data, packet_number = self._retransmit_buffer[sqn_num]
+            self._fast_retransmitted.add(sqn_num)
+            if self._log_sampler.sample(logging.INFO):
+                logging.info(
+                    "%s: Packet %s reported missing by peer, fast retransmitting" % (self, sqn_num)
+                )
+            self._session.on_loss()
+            self.queue_datagram(
+                flag=flag,
+                sqn_num=sqn_num,
+                data=data,
+                retry=True,
+            )
+
+    ##Parse SACK blocks from the data of an ACK packet.
+    # @param data (string) Data of ACK packet
+    # @param version (int) Protocol version of ACK packet
+    # @returns (list) list of (first, last) sequence number ranges
+    def parse_sack_blocks(self, data, version):
+        if version >= constants._BINARY_VERSION:
+            size = RUDPConnection._SACK_BLOCK.size
+            return [
+                RUDPConnection._SACK_BLOCK.unpack_from(data, offset)
+                for offset in range(0, len(data) - size + 1, size)
+            ]
+        blocks = []
+        while len(data) >= 2 * constants._SQN_LENGTH:
+            blocks.append(
+                (
+                    int(data[:constants._SQN_LENGTH], 16),
+                    int(data[constants._SQN_LENGTH:2 * constants._SQN_LENGTH], 16),
+                )
+            )
+            data = data[2 * constants._SQN_LENGTH:]
+        return blocks
+
+    ##Build SACK blocks of packets received out of order.
+    # @returns (string) data of ACK packet
+    def build_sack_blocks(self):
+        blocks = []
+        for sqn_num in sorted(self._reorder_buffer):
+            if blocks and blocks[-1][1] == sqn_num - 1:
+                blocks[-1][1] = sqn_num
+            elif len(blocks) == constants._MAX_SACK_BLOCKS:
+                break
+            else:
+                blocks.append([sqn_num, sqn_num])
+        mask = (1 << self._sqn_bits) - 1
+        return "".join(
+            RUDPConnection._SACK_BLOCK.pack(start & mask, end & mask) for start, end in blocks
+        )
+
+    ##Receive close packet and apply logic. A sequenced closing packet
+    #is received in order, and acked at once.
     # @param d (dict) Close Packet
     def receive_close(self, d):
+        if (
+            self._version >= constants._CLOSE_VERSION
+            and d[RUDPConnection._DATA] != RUDPConnection._ABORT_DATA
+        ):
+            self._peer_sequence_num = d[RUDPConnection._SQN_NUM]
+            self.queue_ack()
         if self._connection_state == RUDPConnection._WAITING_FOR_INIT_ACK:
             logging.info(
                 "%s: Connection process to user %s through %s unsucessful, closing connection with user %s" % (
@@ -259,18 +598,60 @@ class RUDPConnection(object):
         _FLAG_KPALIVE: receive_kpalive,
     }
 
-    ##Queue closing packet.
+    ##Queue closing packet that aborts the connection, not sequenced.
     def queue_close(self):
+        data = ""
+        if self._version >= constants._CLOSE_VERSION:
+            data = RUDPConnection._ABORT_DATA
         self.queue_datagram(
             RUDPConnection._FLAG_CLOSE,
             self._sequence_num,
-            "",
+            data,
         )
 
-    ##Init closing sequence of connection.
+    ##Init closing sequence of connection. The data socket is closed at
+    #once. A connection that takes data from the user keeps sending the
+    #data taken so far, and sends the closing packet once all of it is
+    #acked.
     # @param queue_close (bool) Queue closing packet or not
     def init_close(self, queue_close=True):
+        if self._data_socket and not self._data_socket._closing:
+            self._data_socket.init_close()
+        self._data_socket = None
+        if queue_close and self._connection_state in (
+            RUDPConnection._WAITING_FOR_INIT_ACK,
+            RUDPConnection._WAITING_REMOTE_CONNECTION_APPROVAL,
+            RUDPConnection._WAITING_FOR_ACK,
+            RUDPConnection._READY_FOR_SEND,
+        ):
+            if not self._draining:
+                self._draining = True
+                self.send_buffered()
+            return
+        self.terminate(queue_close)
+
+    ##Logic when a closing connection may have sent everything: once
+    #the send buffer is empty and every packet is acked, the closing
+    #packet is sent. Peers that speak sequenced closing packets get it
+    #as the last packet of the stream, and the connection is closed once
+    #it is acked.
+    def close_if_sent(self):
+        if not self._draining or self._send_buff or self._send_base != self._sequence_num:
+            return
+        if self._version < constants._CLOSE_VERSION:
+            self.terminate()
+        elif self._close_queued:
+            self.terminate(queue_close=False)
+        else:
+            self._close_queued = True
+            self.queue_segment(RUDPConnection._FLAG_CLOSE, "")
+
+    ##Terminates the connection at once, dropping data not yet sent or
+    #acked.
+    # @param queue_close (bool) Queue closing packet or not
+    def terminate(self, queue_close=True):
         self._closing = True
+        self.cancel_timers()
         if self._data_socket and not self._data_socket._closing:
             self._data_socket.init_close()
         self._data_socket = None
@@ -278,7 +659,36 @@ class RUDPConnection(object):
             self.queue_close()
         self._rudp_manager.close_connection(self)
 
-    ##Logic when data connection to user is successful.
+    ##Returns statistics of the connection.
+    # @returns (dict) statistics by info type
+    def get_statistics(self):
+        return {
+            "bytes_sent": self._bytes_sent,
+            "bytes_received": self._bytes_received,
+            "remote_user": self._remote_user,
+            "connected_user": self._close_user,
+            "sequence_number": self._sequence_num,
+            "peer_sequence_number": self._peer_sequence_num,
+            "srtt": self._session.srtt,
+            "rttvar": self._session.rttvar,
+            "rto": self._retry_interval,
+            "cwnd": self._session.congestion_controller.cwnd,
+            "max_datagram_size": self._session.max_datagram_size,
+            "packets_rebuilt": self._packets_rebuilt,
+            "compression_ratio": self._codec.ratio if self._codec else None,
+        }
+
+    ##Cancel every timer of the connection.
+    def cancel_timers(self):
+        self._retry_deadline.cancel()
+        self._connection_approval_deadline.cancel()
+        self._pacing_deadline.cancel()
+        self._ack_deadline.cancel()
+        self._persist_deadline.cancel()
+
+    ##Logic when data connection to user is successful. Answerers that
+    #speak delayed ACKs announce the ACK frequency of the connection in
+    #the approval, and the codec accepted if one was offered.
     def approve_data_socket(self):
         logging.info(
             "%s: Connection to user %s sucessful, completing connection process with %s" % (
@@ -287,20 +697,69 @@ class RUDPConnection(object):
                 self._rudp_peer,
             )
         )
-        self.queue_datagram(
+        data = ""
+        if self._version >= constants._DELAYED_ACK_VERSION:
+            self._ack_frequency = constants._ACK_FREQUENCY
+            data = "%s%s" % (RUDPConnection._ACK_FREQUENCY_PREFIX, self._ack_frequency)
+        if self._codec:
+            data += "\n%s%s" % (RUDPConnection._COMPRESSION_PREFIX, self._codec.NAME)
+        self.queue_segment(
             flag=RUDPConnection._FLAG_INIT,
-            sqn_num=self._sequence_num,
-            data="",
+            data=data,
+        )
+        if self._version >= constants._PMTU_VERSION:
+            self._session.start_probing()
+
+    ##Returns whether data of an init packet is a connection approval,
+    #empty or announcing the ACK frequency, rather than a request.
+    # @param data (string) Init data
+    # @returns (bool) approval or not
+    @staticmethod
+    def is_approval(data):
+        return data == "" or data.startswith(RUDPConnection._ACK_FREQUENCY_PREFIX)
+
+    ##Parse data of connection approval packet.
+    # @param data (string) Approval data
+    # @returns (tuple) ACK frequency, name of codec accepted or None
+    def parse_approval_data(self, data):
+        data = data.split("\n")
+        codec = None
+        if len(data) > 1 and data[1].startswith(RUDPConnection._COMPRESSION_PREFIX):
+            codec = data[1][len(RUDPConnection._COMPRESSION_PREFIX):]
+        return (
+            max(int(data[0][len(RUDPConnection._ACK_FREQUENCY_PREFIX):]), 1),
+            codec,
+        )
+
+    ##Set codec of the tunneled stream. Data already buffered and not
+    #yet sent is encoded too.
+    # @param name (string) name of codec
+    def set_codec(self, name):
+        logging.info(
+            "%s: Compressing stream with %s" % (self, name)
         )
+        self._codec = compression.MAP[name]()
+        if self._send_buff:
+            self._send_buff = ChunkBuffer(self._codec.encode(self._send_buff.take()))
 
-    ##Parse data of Init packet.
+    ##Parse data of Init packet. The protocol version offered by the
+    #initiator follows the last line, legacy initiators offer none.
+    #Options of the connection follow the version on the same line as
+    #name and value pairs, where answerers that don't know them
+    #ignore them.
     # @param data (string) Init data
     # @returns (tuple) Initiator address, initiator port, endpoint address,
-    # endpoint port
+    # endpoint port, protocol version, dictionary of option to value
     def parse_init_data(self, data):
         data = data.split("\n")
         if len(data) != 5:
             raise RuntimeError("Invalid init data")
+        version = constants._LEGACY_VERSION
+        options = {}
+        if data[4]:
+            line = data[4].split(":")
+            version = int(line[1])
+            options = dict(zip(line[2::2], line[3::2]))
         data = data[:4]
         data = [d.split(":")[1] for d in data]
         return (
@@ -308,127 +767,475 @@ class RUDPConnection(object):
             int(data[1]),
             data[2],
             int(data[3]),
+            version,
+            options,
         )
 
-    #Send datagram to RUDP Manager to queue.
+    #Send datagram to RUDP Manager to queue, with a header of the
+    #protocol version of the connection. A delayed ACK rides on data
+    #packets in the ACK field, unless packets were received out of order
+    #and the peer needs SACK blocks. ACKs carry the receive window in
+    #versions with flow control.
     # @param flag (int) Flag of packet
     # @param sqn_num (int) Sequence num of packet
     # @param data (string) Data of packet
     # @param retry (bool) Whether this is retry or not
     def queue_datagram(self, flag, sqn_num, data, retry=False):
-        content = "%04x%01x%04x%s" %(
-                    self._cid,
-                    flag,
-                    sqn_num,
-                    data,
-        )
+        mask = (1 << self._sqn_bits) - 1
+        if self._version >= constants._BINARY_VERSION:
+            wire_flag, wire_data = flag, data
+            if (
+                flag == RUDPConnection._FLAG_DATA
+                and self._ack_pending
+                and self._version >= constants._DELAYED_ACK_VERSION
+                and not self._reorder_buffer
+            ):
+                self._ack_pending = 0
+                self._ack_deadline.clear()
+                wire_flag |= RUDPConnection._ACK_FIELD_FLAG
+                if self._version >= constants._FLOW_CONTROL_VERSION:
+                    self._advertised_window = self.receive_window()
+                    wire_data = RUDPConnection._ACK_WINDOW_FIELD.pack(
+                        self._peer_sequence_num & mask,
+                        self._advertised_window,
+                    ) + data
+                else:
+                    wire_data = RUDPConnection._ACK_FIELD.pack(self._peer_sequence_num & mask) + data
+            elif flag == RUDPConnection._FLAG_ACK and self._version >= constants._FLOW_CONTROL_VERSION:
+                self._advertised_window = self.receive_window()
+                wire_data = RUDPConnection._WINDOW_FIELD.pack(self._advertised_window) + data
+            datagram = RUDPConnection._HEADER.pack(
+                constants._BINARY_HEADER_MARK | self._version,
+                wire_flag,
+                self._cid,
+                sqn_num & mask,
+                len(wire_data),
+            ) + wire_data
+        else:
+            content = "%04x%01x%04x%s" %(
+                        self._cid,
+                        flag,
+                        sqn_num & mask,
+                        data,
+            )
+            datagram = "%04x%s" % (
+                len(content),
+                content,
+            )
         params = {
             RUDPConnection._FLAG: flag,
             RUDPConnection._SQN_NUM: sqn_num,
             RUDPConnection._DATA: data,
             "Retry": retry
         }
-        datagram = "%04x%s" % (
-            len(content),
-            content,
-        )
         self._rudp_manager.queue_datagram(
             self,
             datagram,
             params,
         )
         if flag == RUDPConnection._FLAG_INIT:
-            if data == "":
+            if self.is_approval(data):
                 self._connection_state = RUDPConnection._WAITING_FOR_ACK
             else:
                 self._connection_state = RUDPConnection._WAITING_FOR_INIT_ACK
-        elif flag != RUDPConnection._FLAG_ACK:
-            self._connection_state = RUDPConnection._WAITING_FOR_ACK
-        if retry:
-            self._times_retried += 1
+
+    ##Send a sequenced packet. The packet is given the next sequence
+    #number and kept for retransmission until it is acked, with its
+    #packet number in the session.
+    # @param flag (int) Flag of packet
+    # @param data (string) Data of packet
+    def queue_segment(self, flag, data):
+        sqn_num = self._sequence_num
+        self._sequence_num += 1
+        self._retransmit_buffer[sqn_num] = flag, data, self._session.packet_queued()
+        if flag == RUDPConnection._FLAG_DATA:
+            self._data_in_flight[sqn_num] = len(data)
+            self._bytes_in_flight += len(data)
+        if self._fec_block and flag != RUDPConnection._FLAG_DATA:
+            self.queue_parity()
+        self.queue_datagram(
+            flag=flag,
+            sqn_num=sqn_num,
+            data=data,
+        )
+        if flag == RUDPConnection._FLAG_DATA and self._fec and self._version >= constants._FEC_VERSION:
+            self._fec_block.append((sqn_num, data))
+            if len(self._fec_block) >= self._session.fec_block_size:
+                self.queue_parity()
+
+    ##Queues a parity packet of forward error correction over the data
+    #packets sent since the last one, with which the peer rebuilds any
+    #one of them that is lost. Parity packets are neither sequenced nor
+    #retransmitted, their sequence number is the first of the block.
+    def queue_parity(self):
+        sqn_nums, data = zip(*self._fec_block)
+        self._fec_block = []
+        lengths = 0
+        for d in data:
+            lengths ^= len(d)
+        self.queue_datagram(
+            RUDPConnection._FLAG_FEC,
+            sqn_nums[0],
+            RUDPConnection._FEC_HEADER.pack(len(data), lengths) + util.xor_strings(data),
+        )
+
+    ##Returns whether the send window is full. The send window of the
+    #stream spans from the lowest sequence number not acked cumulatively,
+    #the congestion window of the session limits packets in flight of
+    #all its streams, and the receive window of the peer limits data
+    #bytes not acked cumulatively. Legacy peers get one packet at a time.
+    # @returns (bool) window full or not
+    def window_full(self):
+        return (
+            self._sequence_num - self._send_base >= self._send_window
+            or (self.legacy_peer() and self._sequence_num != self._send_base)
+            or self.peer_window_full()
+            or self._session.window_full()
+        )
+
+    ##Returns bytes taken from the user and not yet acked cumulatively,
+    #queued or in flight.
+    # @returns (int) bytes
+    def bytes_pending(self):
+        return len(self._send_buff) + self._bytes_in_flight
+
+    ##Returns the send budget of the connection: bytes it takes from the
+    #user and not yet acked, before its data socket stops reading. The
+    #budget follows the share of the connection in the congestion window
+    #of the session, and is never less than the configured budget.
+    # @returns (int) budget in bytes
+    def get_send_budget(self):
+        return max(
+            self._send_budget,
+            int(
+                constants._SEND_BUDGET_CWND_GAIN
+                * self._session.congestion_controller.cwnd
+                * self.get_data_length()
+                / max(len(self._session), 1)
+            ),
+        )
+
+    ##Returns whether the receive window of the peer is full.
+    # @returns (bool) window full or not
+    def peer_window_full(self):
+        return self._peer_window is not None and self._bytes_in_flight >= self._peer_window
+
+    ##Returns the receive window advertised to the peer: free space left
+    #in the data socket to the user. Windows less than a data packet are
+    #advertised as zero, so the peer doesn't trickle tiny packets.
+    # @returns (int) window in bytes
+    def receive_window(self):
+        if self._data_socket:
+            window = constants._DATA_SEND_BUFF_LIMIT - self._data_socket.bytes_queued()
+        else:
+            window = constants._DATA_SEND_BUFF_LIMIT - len(self._resolve_buff)
+        if window < self.get_data_length():
+            return 0
+        return window
+
+    ##Logic when the data socket sent data to the user. Once the receive
+    #window opened by half the limit since it was last advertised, an ACK
+    #announces it, so a peer stopped by the window doesn't wait for its
+    #persist probe.
+    def user_data_sent(self):
+        if (
+            self._version >= constants._FLOW_CONTROL_VERSION
+            and self._peer_sequence_num is not None
+            and self.receive_window() - self._advertised_window >= constants._DATA_SEND_BUFF_LIMIT / 2
+        ):
+            self.queue_ack()
+
+    ##Logic when the receive window of the peer is full and no packet is
+    #in flight to bring an ACK that opens it. A keep-alive packet probes
+    #the window, its ACK carries the window of the peer.
+    def persist_expired(self):
+        if self._send_buff and self.peer_window_full() and not self._retransmit_buffer:
+            logging.debug(
+                "%s: Receive window of peer full, probing" % self
+            )
+            self.queue_kp_alive()
 
     ##Logic when datagram is sent from queue in RUDPManager.
+    #Starts the retransmission timer if it is not running already.
     # @param datagram (string) Datagram in string form
     # @param params (dict) Parts of the datagram
     def datagram_sent(self, datagram, params):
-        logging.info(
-            (
-                "%s: Datagram sent: Flag: %s; Sequence number: %s; Data: %s"
-            ) % (
-                self,
-                params[RUDPConnection._FLAG],
-                params[RUDPConnection._SQN_NUM],
-                params[RUDPConnection._DATA],
+        if self._log_sampler.sample(logging.INFO):
+            logging.info(
+                (
+                    "%s: Datagram sent: Flag: %s; Sequence number: %s; Data: %s"
+                ) % (
+                    self,
+                    params[RUDPConnection._FLAG],
+                    params[RUDPConnection._SQN_NUM],
+                    params[RUDPConnection._DATA],
+                )
             )
-        )
         if params[RUDPConnection._FLAG] == RUDPConnection._FLAG_DATA:
             self._bytes_sent += len(params[RUDPConnection._DATA])
-        self._time_send_kp_alive = datetime.now() + timedelta(microseconds=self._keep_alive_interval*1000)
-        logging.debug(
-            "%s: Time to send keep-alive set to %s" % (self, util.present_datetime(self._time_send_kp_alive))
-        )
-        flag = params[RUDPConnection._FLAG]
-        if flag != RUDPConnection._FLAG_ACK:
-            self._last_datagram_sent = datagram, params
-            self._time_send_retry = datetime.now() + timedelta(microseconds=self._retry_interval*1000)
-            logging.debug(
-                "%s: Time to resend packet set to %s" % (self, util.present_datetime(self._time_send_retry))
-            )
+        if self._closing or params[RUDPConnection._FLAG] in (
+            RUDPConnection._FLAG_PROBE,
+            RUDPConnection._FLAG_FEC,
+        ):
+            return
+        now = timers.now()
         if params["Retry"]:
+            self._send_times.pop(params[RUDPConnection._SQN_NUM], None)
+        elif params[RUDPConnection._SQN_NUM] in self._retransmit_buffer:
+            self._send_times[params[RUDPConnection._SQN_NUM]] = now
+        if not self._retry_deadline.pending and params[RUDPConnection._SQN_NUM] in self._retransmit_buffer:
+            self._retry_deadline.set_at(now + self._retry_interval)
+            if self._log_sampler.sample(logging.DEBUG):
+                logging.debug(
+                    "%s: Resending packets in %s ms if not acked" % (self, self._retry_interval)
+                )
+        if params["Retry"] and self._log_sampler.sample(logging.INFO):
             logging.info(
-                "%s: No acknowledgement received from peer, resent packet for the %s time out of %s"
+                "%s: No acknowledgement received from peer, resent packet %s for the %s time out of %s"
                  % (
                     self,
+                    params[RUDPConnection._SQN_NUM],
                     self._times_retried,
                     self._retry_count
                 )
             )
 
+    ##Logic when the socket refused a datagram holding a frame of the
+    #connection as larger than the path MTU known to the kernel. A
+    #refused probe is lost at once, other frames are lost like on the
+    #wire and retransmitted.
+    # @param datagram (string) datagram in string form
+    # @param params (dict) parts of the datagram
+    def datagram_refused(self, datagram, params):
+        if params[RUDPConnection._FLAG] == RUDPConnection._FLAG_PROBE:
+            self._session.probe_refused(params[RUDPConnection._SQN_NUM])
+        else:
+            self.datagram_sent(datagram, params)
+
+    ##Set protocol version of the connection.
+    # @param version (int) protocol version
+    def set_version(self, version):
+        self._version = version
+        if version >= constants._BINARY_VERSION:
+            self._sqn_bits = constants._SQN_BITS
+        else:
+            self._sqn_bits = constants._LEGACY_SQN_BITS
+
+    ##Returns max length of data of a data packet. With peers that speak
+    #path MTU discovery, the largest datagram the session found to pass
+    #less the binary header and ACK field.
+    # @returns (int) length in bytes
+    def get_data_length(self):
+        if self._version >= constants._FLOW_CONTROL_VERSION:
+            return (
+                self._session.max_datagram_size
+                - RUDPConnection._HEADER.size
+                - RUDPConnection._ACK_WINDOW_FIELD.size
+            )
+        if self._version >= constants._PMTU_VERSION:
+            return (
+                self._session.max_datagram_size
+                - RUDPConnection._HEADER.size
+                - RUDPConnection._ACK_FIELD.size
+            )
+        return constants._DATA_LENGTH
+
+    ##Queues a probe packet padded to a datagram size, for path MTU
+    #discovery. Probes are neither sequenced nor retransmitted, their
+    #sequence number is their size.
+    # @param size (int) datagram size in bytes
+    def queue_probe(self, size):
+        self.queue_datagram(
+            RUDPConnection._FLAG_PROBE,
+            size,
+            "\0" * (size - RUDPConnection._HEADER.size),
+        )
+
+    ##Receive probe packet. A padded probe is answered with an empty
+    #probe of the same sequence number, an answer tells the session that
+    #the size passed. Probes that arrive before the version is known are
+    #not answered, the peer probes again.
+    # @param d (dict) Probe packet
+    def receive_probe(self, d):
+        if self._version < constants._PMTU_VERSION:
+            return
+        if d[RUDPConnection._DATA]:
+            self.queue_datagram(
+                RUDPConnection._FLAG_PROBE,
+                d[RUDPConnection._SQN_NUM],
+                "",
+            )
+        else:
+            self._session.probe_acked(d[RUDPConnection._SQN_NUM])
+
+    ##Receive parity packet. When exactly one data packet of its block
+    #is missing and the others were received, the missing packet is
+    #rebuilt and received as if it arrived, without waiting for the
+    #peer to retransmit it. Parity packets too short for their header,
+    #or of blocks no sender makes, are dropped.
+    # @param d (dict) Parity packet
+    def receive_fec(self, d):
+        if self._version < constants._FEC_VERSION:
+            return
+        count = lengths = 0
+        if len(d[RUDPConnection._DATA]) >= RUDPConnection._FEC_HEADER.size:
+            count, lengths = RUDPConnection._FEC_HEADER.unpack_from(d[RUDPConnection._DATA])
+        if not 1 <= count <= constants._FEC_MAX_BLOCK:
+            if self._log_sampler.sample(logging.INFO):
+                logging.info(
+                    "%s: Invalid parity packet %s, discarding packet" % (self, d[RUDPConnection._SQN_NUM])
+                )
+            return
+        self._fec_receiving = True
+        first = d[RUDPConnection._SQN_NUM]
+        for sqn_num in [s for s in self._fec_received if s < first]:
+            del self._fec_received[sqn_num]
+        expected = 0 if self._peer_sequence_num is None else self._peer_sequence_num + 1
+        missing = [
+            s for s in range(first, first + count)
+            if s not in self._fec_received
+        ]
+        if len(missing) != 1 or missing[0] < expected:
+            return
+        data = [d[RUDPConnection._DATA][RUDPConnection._FEC_HEADER.size:]]
+        for sqn_num in range(first, first + count):
+            if sqn_num != missing[0]:
+                data.append(self._fec_received[sqn_num])
+                lengths ^= len(self._fec_received[sqn_num])
+        if self._log_sampler.sample(logging.INFO):
+            logging.info(
+                "%s: Packet %s rebuilt from parity" % (self, missing[0])
+            )
+        self._packets_rebuilt += 1
+        self.receive_datagram({
+            RUDPConnection._VERSION: self._version,
+            RUDPConnection._CID: self._cid,
+            RUDPConnection._FLAG: RUDPConnection._FLAG_DATA,
+            RUDPConnection._SQN_NUM: missing[0] & ((1 << self._sqn_bits) - 1),
+            RUDPConnection._DATA: util.xor_strings(data)[:lengths],
+        })
+
     ##Receive packet and apply general logic before splitting
-    #into specific methods.
+    #into specific methods. Sequence numbers are kept whole in the
+    #connection and wrap around on the wire, a received sequence number
+    #is taken as the nearest to the one expected. An ACK field in the
+    #packet is handled before the packet itself. Once the peer sends
+    #parity, the data of data packets is kept for rebuilding lost ones.
+    #Closing packets are received in order like data, unless the peer
+    #doesn't sequence them or they abort the connection.
     # @param d (dict) Parts of the packet.
     def receive_datagram(self, d):
-        self._time_send_kp_alive = datetime.now() + timedelta(microseconds=self._keep_alive_interval*1000)
-        logging.debug(
-            "%s: Time to set keep-alive set to %s" % (self, util.present_datetime(self._time_send_kp_alive))
-        )
-        logging.info(
-            (
-                "%s: Datagram received: Flag: %s; Sequence number: %s; Data: %s"
-            ) % (
-                self,
-                d[RUDPConnection._FLAG],
-                d[RUDPConnection._SQN_NUM],
-                d[RUDPConnection._DATA],
+        if d[RUDPConnection._FLAG] == RUDPConnection._FLAG_PROBE:
+            self.receive_probe(d)
+            return
+        if self._connection_state == RUDPConnection._WAITING_FOR_INIT_ACK:
+            #The answerer replies in the version it accepted, or in the
+            #legacy format if it did not understand the offer
+            self.set_version(min(d[RUDPConnection._VERSION], constants._PROTOCOL_VERSION))
+            self._rudp_manager.set_peer_version(self._rudp_peer, self._version)
+            if self._version >= constants._PMTU_VERSION:
+                self._session.start_probing()
+        if self._peer_sequence_num is None:
+            expected = 0
+        else:
+            expected = self._peer_sequence_num + 1
+        if d[RUDPConnection._FLAG] == RUDPConnection._FLAG_ACK:
+            d[RUDPConnection._SQN_NUM] = util.serial_unwrap(d[RUDPConnection._SQN_NUM], self._send_base, self._sqn_bits)
+        else:
+            d[RUDPConnection._SQN_NUM] = util.serial_unwrap(d[RUDPConnection._SQN_NUM], expected, self._sqn_bits)
+        self._session.datagram_received()
+        if self._fec_receiving and d[RUDPConnection._FLAG] == RUDPConnection._FLAG_DATA:
+            self._fec_received[d[RUDPConnection._SQN_NUM]] = d[RUDPConnection._DATA]
+        if self._log_sampler.sample(logging.INFO):
+            logging.info(
+                (
+                    "%s: Datagram received: Flag: %s; Sequence number: %s; Data: %s"
+                ) % (
+                    self,
+                    d[RUDPConnection._FLAG],
+                    d[RUDPConnection._SQN_NUM],
+                    d[RUDPConnection._DATA],
+                )
             )
-        )
+        if d[RUDPConnection._FLAG] == RUDPConnection._FLAG_FEC:
+            self.receive_fec(d)
+            return
+        if RUDPConnection._ACK_NUM in d:
+            ack = {
+                RUDPConnection._VERSION: d[RUDPConnection._VERSION],
+                RUDPConnection._SQN_NUM: util.serial_unwrap(d[RUDPConnection._ACK_NUM], self._send_base, self._sqn_bits),
+                RUDPConnection._DATA: "",
+            }
+            if RUDPConnection._WINDOW in d:
+                ack[RUDPConnection._WINDOW] = d[RUDPConnection._WINDOW]
+            self.receive_ack(ack)
+            if self._closing:
+                return
+        immediate = True
         if d[RUDPConnection._FLAG] == RUDPConnection._FLAG_ACK:
             self.receive_ack(d)
         elif d[RUDPConnection._FLAG] == RUDPConnection._FLAG_INIT and self._connection_state == RUDPConnection._WAITING_FOR_INIT_ACK:
             logging.info("%s: Received connection approval before init ack, init ack probably lost")
         else:
-            duplicate = False
-            if self._peer_sequence_num is None:
-                self._peer_sequence_num = d[RUDPConnection._SQN_NUM]
-            elif d[RUDPConnection._SQN_NUM] <= self._peer_sequence_num:
-                duplicate = True
-            if not duplicate:
-                self._RECV_FUNCS[d[RUDPConnection._FLAG]](self, d)
-                self._peer_sequence_num = d[RUDPConnection._SQN_NUM]
-            else:
-                logging.info(
-                    "%s: Sequence num of received packet: %s, highest sequence num already received: %s, discarding duplicate packet"
-                     % (
-                        self,
-                        d[RUDPConnection._SQN_NUM],
-                        self._peer_sequence_num,
+            if d[RUDPConnection._SQN_NUM] < expected:
+                if self._log_sampler.sample(logging.INFO):
+                    logging.info(
+                        "%s: Sequence num of received packet: %s, highest sequence num already received: %s, discarding duplicate packet"
+                         % (
+                            self,
+                            d[RUDPConnection._SQN_NUM],
+                            self._peer_sequence_num,
+                        )
+                    )
+            elif d[RUDPConnection._FLAG] == RUDPConnection._FLAG_CLOSE and (
+                self._version < constants._CLOSE_VERSION
+                or d[RUDPConnection._DATA] == RUDPConnection._ABORT_DATA
+            ):
+                self.receive_close(d)
+            elif d[RUDPConnection._SQN_NUM] > expected:
+                if d[RUDPConnection._SQN_NUM] - expected < self._send_window:
+                    if self._log_sampler.sample(logging.INFO):
+                        logging.info(
+                            "%s: Sequence num of received packet: %s, expected: %s, buffering out of order packet"
+                             % (
+                                self,
+                                d[RUDPConnection._SQN_NUM],
+                                expected,
+                            )
+                        )
+                    self._reorder_buffer[d[RUDPConnection._SQN_NUM]] = d
+                elif self._log_sampler.sample(logging.INFO):
+                    logging.info(
+                        "%s: Sequence num of received packet: %s, expected: %s, discarding packet beyond window"
+                         % (
+                            self,
+                            d[RUDPConnection._SQN_NUM],
+                            expected,
+                        )
                     )
+            else:
+                immediate = (
+                    d[RUDPConnection._FLAG] != RUDPConnection._FLAG_DATA
+                    or bool(self._reorder_buffer)
                 )
-            if d[RUDPConnection._FLAG] not in (RUDPConnection._FLAG_ACK, RUDPConnection._FLAG_CLOSE):
-                self.queue_ack()
+                self._RECV_FUNCS[d[RUDPConnection._FLAG]](self, d)
+                self._peer_sequence_num = d[RUDPConnection._SQN_NUM]
+                while not self._closing and self._peer_sequence_num + 1 in self._reorder_buffer:
+                    d = self._reorder_buffer.pop(self._peer_sequence_num + 1)
+                    self._RECV_FUNCS[d[RUDPConnection._FLAG]](self, d)
+                    self._peer_sequence_num = d[RUDPConnection._SQN_NUM]
+            if not self._closing and self._peer_sequence_num is not None:
+                self.schedule_ack(immediate)
 
-    ##Start the connection sequence with a remote server.
+    ##Start the connection sequence with a remote server. The init
+    #packet is sent in the legacy format and offers the highest supported
+    #protocol version, with the options of the connection.
     def connect_to_remote(self):
+        version = "Version:%s" % constants._PROTOCOL_VERSION
+        if self._interactive:
+            version += ":%s:1" % RUDPConnection._INTERACTIVE_OPTION
+        if self._compression:
+            version += ":%s:%s" % (RUDPConnection._COMPRESSION_OPTION, self._compression.NAME)
         logging.info(
             "%s: Trying to connect to %s through %s, waiting for response" % (
                 self,
@@ -436,95 +1243,218 @@ class RUDPConnection(object):
                 self._rudp_peer,
             )
         )
-        self.queue_datagram(
+        self.queue_segment(
             RUDPConnection._FLAG_INIT,
-            self._sequence_num,
             (
                 "Source Address:%s\n"
                 "Source Port:%s\n"
                 "Destination Address:%s\n"
                 "Destination Port:%s\n"
+                "%s"
             ) % (
                 self._close_user_addr,
                 self._close_user_port,
                 self._remote_user_addr,
                 self._remote_user_port,
+                version,
             )
         )
 
     ##Queue a TCP buffer received from user, to be sent
-    #as datagram.
+    #as datagrams, encoded by the codec of the stream if any.
     # @param buf (string) TCP buffer
     def queue_buffer(self, buf):
-        self._send_buff += buf
-        self.queue_datagram(
-            RUDPConnection._FLAG_DATA,
-            self._sequence_num,
-            self._send_buff[:constants._DATA_LENGTH],
+        if self._codec:
+            buf = self._codec.encode(buf)
+        self._send_buff.append(buf)
+        self.send_buffered()
+
+    ##Send as many data packets from the send buffer as the
+    #send window, receive window of the peer, congestion window and pacing
+    #allow. While data is left in the send buffer the connection is
+    #waiting for ACK. Its data socket reads from the user while the
+    #connection is within its send budget. Nothing is sent before the
+    #init packet, always the first packet of a connection, is acked.
+    #When the receive window of the peer stops the connection with
+    #nothing in flight, the window is probed after the retry interval.
+    #Data packets are cut from the send buffer without copying the rest
+    #of it, and data shorter than a data packet may be held for more
+    #data. Initiators send up to _EARLY_DATA_LIMIT bytes of early data
+    #right after the init packet, before the connection is approved.
+    def send_buffered(self):
+        early = self._connection_state in (
+            RUDPConnection._WAITING_FOR_INIT_ACK,
+            RUDPConnection._WAITING_REMOTE_CONNECTION_APPROVAL,
         )
-        self._send_buff = self._send_buff[constants._DATA_LENGTH:]
-
-    ##Returns preferred sleep time based on protocol timeouts.
-    # @returns (int) sleep time in milliseconds
-    def get_sleep_time(self):
-        t = constants._TIMEOUT
-        if self._time_send_kp_alive:
-            t_until_kp_alive = ((self._time_send_kp_alive - datetime.now()).total_seconds()) * 1000.0
-            t = min(t, t_until_kp_alive)
-        if self._time_give_up_connection_approval:
-            t_until_give_up = ((self._time_give_up_connection_approval - datetime.now()).total_seconds()) * 1000.0
-            t = min(t, t_until_give_up)
-        if self._time_send_retry:
-            t_until_retry = ((self._time_send_retry - datetime.now()).total_seconds()) * 1000.0
-            t = min(t, t_until_retry)
-        return t
-
-    ##Queues ack packet.
+        if early:
+            if not self.early_data_allowed():
+                return
+        elif self._send_base == 0 or self._connection_state not in (
+            RUDPConnection._READY_FOR_SEND,
+            RUDPConnection._WAITING_FOR_ACK,
+        ):
+            return
+        now = timers.now()
+        length = self.get_data_length()
+        held = False
+        while self._send_buff and not self.window_full():
+            if self._peer_window is not None:
+                length = min(length, self._peer_window - self._bytes_in_flight)
+            if early:
+                length = min(length, constants._EARLY_DATA_LIMIT - self._early_data)
+                if length <= 0:
+                    break
+            held = not early and self.hold_tail(length, now)
+            if held or not self._session.take_pacing_slot(now):
+                break
+            self._tail_time = None
+            data = self._send_buff.take(length)
+            if early:
+                self._early_data += len(data)
+            self.queue_segment(
+                RUDPConnection._FLAG_DATA,
+                data,
+            )
+        if not self._send_buff and len(self._fec_block) >= constants._FEC_MIN_BLOCK:
+            self.queue_parity()
+        if held:
+            self._pacing_deadline.set_at(self._tail_time + self._tail_delay)
+        elif self._send_buff and not self.window_full():
+            self._pacing_deadline.set_at(self._session.time_next_send)
+        elif self._session.window_full():
+            self._session.wait_for_window(self)
+        if (
+            self._send_buff
+            and self.peer_window_full()
+            and not self._retransmit_buffer
+            and not self._persist_deadline.pending
+        ):
+            self._persist_deadline.set(self._retry_interval)
+        if early:
+            return
+        if self._send_buff or self.window_full():
+            self._connection_state = RUDPConnection._WAITING_FOR_ACK
+        else:
+            self._connection_state = RUDPConnection._READY_FOR_SEND
+        self.close_if_sent()
+
+    ##Returns whether early data may be sent before the connection is
+    #approved. Not when a codec is offered, the answerer may refuse it
+    #and early data would be encoded for nothing, nor to legacy peers.
+    # @returns (bool) allowed or not
+    def early_data_allowed(self):
+        return (
+            not self._compression
+            and not self.legacy_peer()
+            and self._early_data < constants._EARLY_DATA_LIMIT
+        )
+
+    ##Returns whether the peer may speak the legacy protocol. Legacy
+    #receivers take any packet above the last one received as the next in
+    #order, so only one sequenced packet is in flight to them at a time.
+    #Until the init ack negotiates the version, the peer counts as legacy
+    #unless a connection with its server negotiated a newer version.
+    # @returns (bool) legacy or not
+    def legacy_peer(self):
+        if self._connection_state == RUDPConnection._WAITING_FOR_INIT_ACK:
+            version = self._rudp_manager.peer_version(self._rudp_peer)
+            return version is None or version < constants._BINARY_VERSION
+        return self._version < constants._BINARY_VERSION
+
+    ##Returns whether to hold the data left in the send buffer for more
+    #data, like Nagle's algorithm: data shorter than a data packet waits
+    #while packets are in flight, up to the tail delay. Interactive
+    #connections never hold data.
+    # @param length (int) length of the next data packet
+    # @param now (float) present time in milliseconds
+    # @returns (bool) hold or not
+    def hold_tail(self, length, now):
+        if len(self._send_buff) >= length or self._interactive or not self._retransmit_buffer:
+            return False
+        if self._tail_time is None:
+            self._tail_time = now
+        return now - self._tail_time < self._tail_delay
+
+    ##Acks a packet received, at once or delayed. Delayed ACKs are sent
+    #every _ack_frequency packets, after a share of the smoothed RTT of at
+    #most _ACK_DELAY milliseconds, or on the next data packet to the
+    #peer, whichever comes first. Packets
+    #out of order, duplicates, packets filling a gap and control packets
+    #are acked at once.
+    # @param immediate (bool) ack at once
+    def schedule_ack(self, immediate):
+        self._ack_pending += 1
+        if immediate or self._ack_pending >= self._ack_frequency:
+            self.queue_ack()
+        elif not self._ack_deadline.pending:
+            delay = constants._ACK_DELAY
+            if self._session.srtt is not None:
+                delay = min(delay, self._session.srtt * constants._ACK_DELAY_RTT_SHARE)
+            self._ack_deadline.set(delay)
+
+    ##Queues ack packet, with SACK blocks of packets received
+    #out of order.
     def queue_ack(self):
+        self._ack_pending = 0
+        self._ack_deadline.clear()
         self.queue_datagram(
             RUDPConnection._FLAG_ACK,
             self._peer_sequence_num,
-            ""
+            self.build_sack_blocks(),
         )
 
-    ##Queues keep-alive packet.
+    ##Queues keep-alive packet, the heartbeat of the session.
     def queue_kp_alive(self):
-        self.queue_datagram(
+        self.queue_segment(
             RUDPConnection._FLAG_KPALIVE,
-            self._sequence_num,
             ""
         )
 
-    ##Retry sending the last non-ack packet sent.
+    ##Retry sending every packet that has been neither acked nor
+    #selectively acked, and back off the retry interval exponentially.
     def retry_send(self):
-        datagram, params = self._last_datagram_sent
-        self.queue_datagram(
-            flag=params[RUDPConnection._FLAG],
-            sqn_num=params[RUDPConnection._SQN_NUM],
-            data=params[RUDPConnection._DATA],
-            retry=True,
+        self._times_retried += 1
+        self._retry_deadline.clear()
+        self._retry_interval = min(
+            self._retry_interval * 2,
+            constants._MAX_RETRY_INTERVAL,
         )
+        self._session.on_timeout()
+        self._fast_retransmitted.clear()
+        for sqn_num in sorted(self._retransmit_buffer):
+            flag, data, packet_number = self._retransmit_buffer[sqn_num]
+            self.queue_datagram(
+                flag=flag,
+                sqn_num=sqn_num,
+                data=data,
+                retry=True,
+            )
 
-    ##Update protocol intervals and apply logic accordingly.
-    def update(self):
-        now = datetime.now()
-        if self._time_send_kp_alive is not None and now >= self._time_send_kp_alive:
-            self.queue_kp_alive()
-        if self._time_give_up_connection_approval and now >= self._time_give_up_connection_approval:
+    ##Logic when the peer has not approved the connection in time.
+    def connection_approval_expired(self):
+        logging.info(
+            "%s: Peer not approving connection, closing connection..." % self
+        )
+        self.terminate()
+
+    ##Logic when packets have not been acked within the retry interval.
+    def retry_expired(self):
+        if not self._retransmit_buffer:
+            return
+        if self._times_retried >= self._retry_count:
             logging.info(
-                "%s: Peer not approving connection, closing connection..." % self
+                "%s: Peer not answering packets, closing connection..." % self
             )
-            self.init_close()
-        if self._time_send_retry is not None and now >= self._time_send_retry and self._connection_state in (RUDPConnection._WAITING_FOR_ACK, RUDPConnection._WAITING_FOR_INIT_ACK):
-            if self._times_retried >= self._retry_count:
-                logging.info(
-                    "%s: Peer not answering packets, closing connection..." % self
-                )
-                self.init_close(queue_close=False)
-            else:
-                self.retry_send()
-        if self._connection_state == RUDPConnection._READY_FOR_SEND and self._send_buff:
-            self.queue_buffer('')
+            self._session.retries_exhausted(self, self._retry_interval)
+            self.terminate(queue_close=False)
+        else:
+            self.retry_send()
+
+    ##Property method for packets in flight.
+    # @returns (int) sequenced packets sent and not acked
+    @property
+    def in_flight(self):
+        return len(self._retransmit_buffer)
 
     ##String representation of object.
     # @returns (string) representation
@@ -4,12 +4,19 @@
 ## @file rudpmanager.py Implementation of @ref Reliable-UDP.Server.rudpmanager
 
 from ..Common import asyncio
-import errno
+from ..Common import batchio
+import collections
+import itertools
 import random
 import socket
 from ..Common.asyncsocket import AsyncSocket
+from ..Common.resolver import Resolver
 from rudpconnection import RUDPConnection
+from rudpsession import RUDPSession
+import congestioncontrol
+import workers
 from ..Common import constants
+from ..Common import util
 import logging
 
 ## RUDP Manager
@@ -24,6 +31,24 @@ class RUDPManager(AsyncSocket):
     # @param bind_address (tuple) Bind address of UDP socket
     # @param timeout (int) Preferred timeout in milliseconds
     # @param random_drop (int) Percentage chance of dropping a packet
+    # @param send_window (int) Send window of each connection in packets
+    # @param send_budget (int) Least send budget of each connection in bytes
+    # @param tail_delay (float) Max time in milliseconds each connection
+    # holds data shorter than a data packet for more data
+    # @param congestion_control (class) Congestion controller class of
+    # each session
+    # @param recv_batch (int) Max datagrams received per read event
+    # @param send_batch (int) Max datagrams sent per write event batch
+    # @param send_mmsg (bool) Send batches with sendmmsg
+    # @param log_sample (int) Log one in every log_sample packets
+    # @param fec (bool) Send forward error correction parity to peers
+    # that speak it
+    # @param compression (class) Codec class offered for the stream of
+    # every connection initiated, None for no compression
+    # @param worker (int) Worker ID of the manager
+    # @param worker_count (int) Number of worker processes sharing the port
+    # @param run_dir (string) Run directory shared by the workers
+    # @param resolver_threads (int) Number of threads resolving host names
     # @returns (RUDPManager) RUDPManager object
     def __init__(
         self,
@@ -31,33 +56,167 @@ class RUDPManager(AsyncSocket):
         bind_address,
         timeout,
         random_drop,
+        send_window=constants._SEND_WINDOW,
+        send_budget=constants._SEND_BUDGET,
+        tail_delay=constants._TAIL_DELAY,
+        congestion_control=congestioncontrol.MAP[constants._CONGESTION_CONTROL],
+        recv_batch=constants._RECV_BATCH,
+        send_batch=constants._SEND_BATCH,
+        send_mmsg=False,
+        log_sample=constants._LOG_SAMPLE,
+        fec=False,
+        compression=None,
+        worker=0,
+        worker_count=1,
+        run_dir=None,
+        resolver_threads=constants._RESOLVER_THREADS,
     ):
         s = socket.socket(
             family=socket.AF_INET,
             type=socket.SOCK_DGRAM,
         )
         s.setblocking(0)
+        if worker_count > 1:
+            s.setsockopt(
+                socket.SOL_SOCKET,
+                getattr(socket, "SO_REUSEPORT", constants._SO_REUSEPORT),
+                1,
+            )
+        try:
+            s.setsockopt(
+                socket.IPPROTO_IP,
+                getattr(socket, "IP_MTU_DISCOVER", constants._IP_MTU_DISCOVER),
+                getattr(socket, "IP_PMTUDISC_PROBE", constants._IP_PMTUDISC_PROBE),
+            )
+        except socket.error:
+            logging.warning(
+                "Can't set the don't fragment flag, path MTU discovery may take fragmented sizes to pass"
+            )
         s.bind(bind_address)
         super(RUDPManager, self).__init__(
             async_manager=async_manager,
             socket=s,
             timeout=timeout,
         )
+        ##Batch receiver of the UDP socket
+        self._receiver = batchio.batch_receiver(
+            s,
+            recv_batch,
+            constants._MAX_DATAGRAM_SIZE,
+        )
+        ##Batch sender of the UDP socket
+        self._sender = batchio.batch_sender(
+            s,
+            send_batch,
+            constants._MAX_DATAGRAM_SIZE,
+            send_mmsg,
+        )
+        ##Max datagrams sent per batch
+        self._send_batch = send_batch
         ##Percent chance of dropping a packet
         self._random_drop = random_drop
-        ##Dictionary of remote addresses to dictionaries of CID to connection
-        #object.
-        self._connections_by_rudp_server = {}
+        ##Send window given to every connection
+        self._send_window = send_window
+        ##Least send budget given to every connection
+        self._send_budget = send_budget
+        ##Tail delay given to every connection
+        self._tail_delay = tail_delay
+        ##Congestion controller class given to every session
+        self._congestion_control = congestion_control
+        ##Per-packet log rate given to every connection
+        self._log_sample = log_sample
+        ##Forward error correction given to every connection
+        self._fec = fec
+        ##Codec class offered by every connection initiated
+        self._compression = compression
+        ##Sampler of per-packet log lines of the manager
+        self._log_sampler = util.LogSampler(log_sample)
+        ##Dictionary of remote addresses to sessions, which map CID to
+        #connection object. A session is made with the first connection
+        #with its RUDP server, and removed with the last.
+        self._sessions = {}
         ##List of all connections
         self._connections = []
-        ##List of all queued datagrams waiting for send
-        self._queued_datagrams = []
+        ##Dictionary of remote addresses to the protocol version last
+        #negotiated with them, least recently negotiated first
+        self._peer_versions = collections.OrderedDict()
+        ##Queue of all datagrams waiting for send, each a list of RUDP
+        #server address, size and frames of (connection, frame, params)
+        self._queued_datagrams = collections.deque()
+        ##Dictionary of RUDP server address to the last datagram queued
+        #for it, that frames may still be coalesced into
+        self._open_datagrams = {}
+        ##Highest number of datagrams waiting for send at once
+        self._max_queue_depth = 0
+        ##Overall datagrams sent
+        self._datagrams_sent = 0
+        ##Overall frames sent, more than datagrams when coalesced
+        self._frames_sent = 0
+        ##Overall send batches
+        self._send_batches = 0
+        ##Worker ID of the manager, owning the CIDs equal to it modulo
+        #the number of workers
+        self._worker = worker
+        ##Number of worker processes sharing the port
+        self._worker_count = worker_count
+        ##Run directory shared by the workers
+        self._run_dir = run_dir
+        ##Max connections with each RUDP server owned by this worker
+        self._max_connections = len(range(worker, constants._MAX_CONNECTIONS, worker_count))
+        ##Socket forwarding datagrams between workers, None with one worker
+        self._worker_socket = None
+        ##Timer publishing statistics for other workers, None with one worker
+        self._statistics_timer = None
+        if worker_count > 1:
+            self._worker_socket = workers.WorkerSocket(
+                async_manager=async_manager,
+                rudp_manager=self,
+                run_dir=run_dir,
+                worker=worker,
+                worker_count=worker_count,
+                timeout=timeout,
+            )
+            self.publish_statistics()
+        ##Resolver of host names of RUDP servers and users
+        self._resolver = Resolver(
+            async_manager=async_manager,
+            timeout=timeout,
+            threads=resolver_threads,
+        )
 
-    ##Receive read event and apply accoring logic.
+    ##Receive read event and apply accoring logic. Drains up to a batch
+    #of datagrams from the socket per event.
     def read(self):
-        try:
-            string, address = self._s.recvfrom(constants._MAX_RUDP_SIZE)
-            d = self.parse_datagram(string)
+        for string, address in self._receiver.receive():
+            for frame in self.split_frames(string):
+                self.receive_datagram(frame, address)
+
+    ##Split a received datagram into the frames coalesced in it. Only
+    #binary frames are coalesced, each frame is a whole packet.
+    # @param datagram (string) Datagram in string form
+    # @returns (list) frames in string form
+    def split_frames(self, datagram):
+        if not ord(datagram[0]) & constants._BINARY_HEADER_MARK:
+            return [datagram]
+        frames = []
+        offset = 0
+        while offset + RUDPConnection._HEADER.size <= len(datagram):
+            end = offset + RUDPConnection._HEADER.size + RUDPConnection._HEADER.unpack_from(datagram, offset)[-1]
+            frames.append(datagram[offset:end])
+            offset = end
+        return frames
+
+    ##Receive a packet and pass it to its connection, creating the
+    #connection on an init packet.
+    # @param string (string) Packet in string form
+    # @param address (tuple) Address of the sending RUDP server
+    def receive_datagram(self, string, address):
+        d = self.parse_datagram(string)
+        owner = d[RUDPConnection._CID] % self._worker_count
+        if owner != self._worker:
+            self._worker_socket.forward(owner, string, address)
+            return
+        if self._log_sampler.sample(logging.INFO):
             logging.info(
                 "%s: Received packet from RUDP server %s, with CID %s" % (
                     self,
@@ -65,8 +224,9 @@ class RUDPManager(AsyncSocket):
                     d[RUDPConnection._CID]
                 )
             )
-            r = random.randint(0, 99)
-            if r < self._random_drop:
+        r = random.randint(0, 99)
+        if r < self._random_drop:
+            if util.log_enabled(logging.INFO):
                 logging.info(
                     "%s: Packet from server %s, %s: dropped for testing purposes" % (
                         self,
@@ -74,12 +234,12 @@ class RUDPManager(AsyncSocket):
                         d[RUDPConnection._CID]
                     )
                 )
-            else:
-                valid = not self._closing
-                if address not in self._connections_by_rudp_server:
-                    self._connections_by_rudp_server[address] = {}
-                if d[RUDPConnection._CID] not in self._connections_by_rudp_server[address]:
-                    if d[RUDPConnection._FLAG] != RUDPConnection._FLAG_INIT:
+        else:
+            valid = not self._closing
+            session = self._sessions.get(address)
+            if session is None or d[RUDPConnection._CID] not in session:
+                if d[RUDPConnection._FLAG] != RUDPConnection._FLAG_INIT:
+                    if self._log_sampler.sample(logging.INFO):
                         logging.info(
                             "%s: Unknown RUDP address %s,%s with non-init flag, discarding packet"
                              % (
@@ -88,8 +248,9 @@ class RUDPManager(AsyncSocket):
                                 d[RUDPConnection._CID]
                             )
                         )
-                        valid = False
-                    elif d[RUDPConnection._FLAG] == RUDPConnection._FLAG_INIT and d[RUDPConnection._DATA] == "":
+                    valid = False
+                elif d[RUDPConnection._FLAG] == RUDPConnection._FLAG_INIT and RUDPConnection.is_approval(d[RUDPConnection._DATA]):
+                    if self._log_sampler.sample(logging.INFO):
                         logging.info(
                             "%s: Unknown RUDP address %s,%s sent connection approval packet, discarding packet"
                              % (
@@ -98,59 +259,130 @@ class RUDPManager(AsyncSocket):
                                 d[RUDPConnection._CID]
                             )
                         )
-                        valid = False
-                    else:
-                        logging.info(
-                            "%s: Unknown RUDP address %s,%s with init flag, creating new connection" % (self, address, d[RUDPConnection._CID])
-                        )
-                        new_connection = RUDPConnection(
-                            rudp_manager=self,
-                            async_manager=self._async_manager,
-                            rudp_peer_address=address,
-                            cid=d[RUDPConnection._CID],
-                            state=RUDPConnection._INIT_ANSWERER,
-                            keep_alive_interval=constants._KEEP_ALIVE_INTERVAL,
-                            retry_interval=constants._RETRY_INTERVAL,
-                            connection_approval_interval=constants._CONNECTION_APPROVAL_INTERVAL,
-                            retry_count=constants._RETRY_COUNT,
-                        )
-                        self.register_connection(new_connection, d[RUDPConnection._CID])
-                if valid:
-                    self._connections_by_rudp_server[address][d[RUDPConnection._CID]].receive_datagram(
-                        d
+                    valid = False
+                elif valid:
+                    logging.info(
+                        "%s: Unknown RUDP address %s,%s with init flag, creating new connection" % (self, address, d[RUDPConnection._CID])
+                    )
+                    if session is None:
+                        session = self.create_session(address)
+                    new_connection = RUDPConnection(
+                        rudp_manager=self,
+                        async_manager=self._async_manager,
+                        rudp_peer_address=address,
+                        session=session,
+                        cid=d[RUDPConnection._CID],
+                        state=RUDPConnection._INIT_ANSWERER,
+                        retry_interval=constants._RETRY_INTERVAL,
+                        connection_approval_interval=constants._CONNECTION_APPROVAL_INTERVAL,
+                        retry_count=constants._RETRY_COUNT,
+                        send_window=self._send_window,
+                        send_budget=self._send_budget,
+                        tail_delay=self._tail_delay,
+                        log_sample=self._log_sample,
+                        fec=self._fec,
+                        compression=self._compression,
                     )
-        except IOError as e:
-            if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
-                raise
+                    self.register_connection(new_connection, d[RUDPConnection._CID])
+            if valid:
+                session[d[RUDPConnection._CID]].receive_datagram(
+                    d
+                )
 
 
-    ##Queue a datagram for sending
+    ##Queue a packet for sending. Packets of connections that speak
+    #coalescing are added as frames to the last datagram queued for
+    #the same RUDP server while it has room, up to the largest datagram
+    #size known to pass to that server, whatever their connection.
+    #Other packets are datagrams of their own, and close the datagram
+    #open for their RUDP server so packets are never reordered.
     # @param connection (RUDPConnection) RUDP Connection that's queueing the datagram
     # @param datagram_str (string) Datagram in string form
     # @param datagram_dict (dict) Datagram in dict form
     def queue_datagram(self, connection, datagram_str, datagram_dict):
-        self._queued_datagrams.append((connection, datagram_str, datagram_dict))
+        peer = connection._rudp_peer
+        frame = (connection, datagram_str, datagram_dict)
+        if connection._version >= constants._COALESCE_VERSION:
+            datagram = self._open_datagrams.get(peer)
+            if datagram is not None and datagram[1] + len(datagram_str) <= connection._session.max_datagram_size:
+                datagram[1] += len(datagram_str)
+                datagram[2].append(frame)
+                return
+            datagram = self._open_datagrams[peer] = [peer, len(datagram_str), [frame]]
+        else:
+            self._open_datagrams.pop(peer, None)
+            datagram = [peer, len(datagram_str), [frame]]
+        if not self._queued_datagrams:
+            self.schedule_update()
+        self._queued_datagrams.append(datagram)
+        self._max_queue_depth = max(self._max_queue_depth, len(self._queued_datagrams))
 
-    ##Receive write event and apply according logic.
+    ##Receive write event and apply according logic. Sends the queue
+    #in batches until it is empty or the socket is full. Datagrams the
+    #socket refuses as larger than the path MTU are dropped.
     def write(self):
-        try:
-            while self._queued_datagrams:
-                d = self.get_datagram_for_send()
-                connection, datagram, params = d[0], d[1], d[2]
-                self._s.sendto(
-                    datagram,
-                    connection._rudp_peer,
-                )
-                connection.datagram_sent(datagram, params)
-        except IOError as e:
-            if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
-                raise
+        while self._queued_datagrams:
+            batch = self.get_datagrams_for_send(self._send_batch)
+            results = self._sender.send(
+                [
+                    ("".join(frame for connection, frame, params in frames), peer)
+                    for peer, size, frames in batch
+                ]
+            )
+            self._send_batches += 1
+            for sent in results:
+                datagram = self._queued_datagrams.popleft()
+                peer, size, frames = datagram
+                if self._open_datagrams.get(peer) is datagram:
+                    del self._open_datagrams[peer]
+                if sent:
+                    self._datagrams_sent += 1
+                    self._frames_sent += len(frames)
+                    for connection, frame, params in frames:
+                        connection.datagram_sent(frame, params)
+                else:
+                    logging.info(
+                        "%s: Datagram of %s bytes to %s too large for the path, dropped" % (self, size, peer)
+                    )
+                    for connection, frame, params in frames:
+                        connection.datagram_refused(frame, params)
+            if len(results) < len(batch):
+                break
 
-    ##Parse received datagram
+    ##Parse received datagram. Binary headers are told apart from legacy
+    #headers by the mark in their first byte, and may be followed by an
+    #ACK field. The receive window of ACK packets, and of ACK fields of
+    #versions that have one, is parsed with the header.
     # @param datagram (string) Datagram in string form
     # @returns (dict) Datagram in dict form
     def parse_datagram(self, datagram):
-        d = {}
+        if ord(datagram[0]) & constants._BINARY_HEADER_MARK:
+            version, flag, cid, sqn_num, length = RUDPConnection._HEADER.unpack_from(datagram)
+            start = RUDPConnection._HEADER.size
+            d = {
+                RUDPConnection._VERSION: version & ~constants._BINARY_HEADER_MARK,
+                RUDPConnection._LENGTH: length,
+                RUDPConnection._CID: cid,
+                RUDPConnection._FLAG: flag & ~RUDPConnection._ACK_FIELD_FLAG,
+                RUDPConnection._SQN_NUM: sqn_num,
+            }
+            flow_control = d[RUDPConnection._VERSION] >= constants._FLOW_CONTROL_VERSION
+            if flag & RUDPConnection._ACK_FIELD_FLAG:
+                if flow_control:
+                    d[RUDPConnection._ACK_NUM], d[RUDPConnection._WINDOW] = RUDPConnection._ACK_WINDOW_FIELD.unpack_from(datagram, start)
+                    field = RUDPConnection._ACK_WINDOW_FIELD.size
+                else:
+                    d[RUDPConnection._ACK_NUM], = RUDPConnection._ACK_FIELD.unpack_from(datagram, start)
+                    field = RUDPConnection._ACK_FIELD.size
+                start += field
+                length -= field
+            elif flow_control and d[RUDPConnection._FLAG] == RUDPConnection._FLAG_ACK:
+                d[RUDPConnection._WINDOW], = RUDPConnection._WINDOW_FIELD.unpack_from(datagram, start)
+                start += RUDPConnection._WINDOW_FIELD.size
+                length -= RUDPConnection._WINDOW_FIELD.size
+            d[RUDPConnection._DATA] = datagram[start:start + length]
+            return d
+        d = {RUDPConnection._VERSION: constants._LEGACY_VERSION}
         for component in RUDPConnection._COMPONENTS:
             d[component] = datagram[:RUDPConnection._LENGTHS[component]]
             if RUDPConnection._TYPES[component] == "int":
@@ -159,17 +391,16 @@ class RUDPManager(AsyncSocket):
         return d
 
     ##Init connection with remote server by creating Connection object.
-    # @param rudp_exit (tuple) Exit server address
+    # @param rudp_exit (tuple) Exit server address, resolved
     # @param initiator (tuple) Address of initiator user
     # @param endpoint (tuple) Address of endpoint user
     # @param data_socket (DataSocket) DataSocket object connected to
     # initiator user of connection
-    def init_connection(self, rudp_exit, initiator, endpoint, data_socket):
-        addr, port = rudp_exit
-        addr = socket.gethostbyname(addr)
-        rudp_exit = addr, port
-        if rudp_exit not in self._connections_by_rudp_server:
-            self._connections_by_rudp_server[rudp_exit] = {}
+    # @param interactive (bool) Never hold data for more data, in both
+    # directions of the connection
+    def init_connection(self, rudp_exit, initiator, endpoint, data_socket, interactive=False):
+        if rudp_exit not in self._sessions:
+            self.create_session(rudp_exit)
         cid = self.find_cid(rudp_exit)
         if cid is None:
             logging.warning(
@@ -192,54 +423,66 @@ class RUDPManager(AsyncSocket):
                 rudp_manager=self,
                 async_manager=self._async_manager,
                 rudp_peer_address=rudp_exit,
+                session=self._sessions[rudp_exit],
                 cid=cid,
                 state=RUDPConnection._INIT_INITIATOR,
-                keep_alive_interval=constants._KEEP_ALIVE_INTERVAL,
                 retry_interval=constants._RETRY_INTERVAL,
                 connection_approval_interval=constants._CONNECTION_APPROVAL_INTERVAL,
                 retry_count=constants._RETRY_COUNT,
+                send_window=self._send_window,
+                send_budget=self._send_budget,
+                tail_delay=self._tail_delay,
+                log_sample=self._log_sample,
+                fec=self._fec,
+                compression=self._compression,
+                interactive=interactive,
                 initiator=initiator,
                 endpoint=endpoint,
                 data_socket=data_socket,
             )
             self.register_connection(new_connection, cid)
             new_connection.connect_to_remote()
-            if len(self._connections_by_rudp_server[rudp_exit].keys()) == constants._MAX_CONNECTIONS:
+            if len(self._sessions[rudp_exit]) == self._max_connections:
                 logging.warning("%s: Maximum number of connections with RUDP server %s reached, accepting no more connections." % (self, rudp_exit))
             return new_connection
 
-    ##Finds the lowest available CID between the server and another RUDP server.
+    ##Finds the lowest available CID between the server and another RUDP
+    #server, among the CIDs owned by this worker.
     # @param rudp_exit (tuple) Exit server address
     # @returns (int) CID
     def find_cid(self, rudp_exit):
-        for i in range(constants._MAX_CONNECTIONS):
-            if i not in self._connections_by_rudp_server[rudp_exit]:
+        for i in range(self._worker, constants._MAX_CONNECTIONS, self._worker_count):
+            if i not in self._sessions[rudp_exit]:
                 return i
 
+    ##Creates the session with a remote RUDP server.
+    # @param rudp_peer_address (tuple) Address of remote RUDP server
+    # @returns (RUDPSession) session
+    def create_session(self, rudp_peer_address):
+        session = self._sessions[rudp_peer_address] = RUDPSession(
+            rudp_manager=self,
+            async_manager=self._async_manager,
+            rudp_peer_address=rudp_peer_address,
+            congestion_control=self._congestion_control,
+            retry_interval=constants._RETRY_INTERVAL,
+            keep_alive_interval=constants._KEEP_ALIVE_INTERVAL,
+        )
+        return session
+
     ##Registers connection to the existing data structures.
     # @param connection (RUDPConnection) RUDPConnection object.
     # @param cid (int) Connection ID between the two servers
     def register_connection(self, connection, cid):
         self._connections.append(connection)
-        self._connections_by_rudp_server[connection._rudp_peer][cid] = connection
+        self._sessions[connection._rudp_peer][cid] = connection
 
-    ##Gets the foremost datagram in the queue for sending.
-    # @returns (tuple) Datagram tuple consisting of (connection,
+    ##Gets the foremost datagrams in the queue for sending, leaving
+    #them in the queue.
+    # @param count (int) max number of datagrams
+    # @returns (list) Datagram tuples consisting of (connection,
     #datagram_str ,datagram_dict)
-    def get_datagram_for_send(self):
-        d = self._queued_datagrams[0]
-        self._queued_datagrams = self._queued_datagrams[1:]
-        return d
-
-    #Returns the preferred sleep time of the RUDP Manager.
-    # @returns (int) timeout in milliseconds
-    def get_sleep_time(self):
-        if self._connections:
-            return min(
-                [c.get_sleep_time() for c in self._connections]
-            )
-        else:
-            return self._timeout
+    def get_datagrams_for_send(self, count):
+        return list(itertools.islice(self._queued_datagrams, count))
 
     #Calculates and returns the IO mask for the RUDP Manager.
     # @returns (int) IO mask.
@@ -251,10 +494,10 @@ class RUDPManager(AsyncSocket):
             mask |= asyncio.BaseEvent.POLLOUT
         return mask
 
-    ##Updates the RUDPManager by updating all RUDPConnection
+    ##Updates the RUDPManager, after an event, a datagram queued or a
+    #connection closed. Connections are driven by their timers in the
+    #poller, and by received packets.
     def update(self):
-        for c in self._connections:
-            c.update()
         if all(
             (
                 self._closing,
@@ -266,34 +509,112 @@ class RUDPManager(AsyncSocket):
 
     ##Terminates the RUDP Manager completely.
     def terminate(self):
-        for c in self._connections:
+        for c in self._connections[:]:
             self.close_connection(c)
+        for session in self._sessions.values():
+            session.cancel_timers()
+        if self._statistics_timer is not None:
+            self._statistics_timer.cancel()
+        if self._worker_socket is not None:
+            self._worker_socket.close()
+        self._resolver.close()
         super(RUDPManager, self).terminate()
 
-    ##Close connection.
+    ##Returns statistics of this worker.
+    # @returns (dict) general statistics, and statistics of every
+    #connection by (RUDP server, CID)
+    def get_statistics(self):
+        return {
+            "general": {
+                "number_of_connections": len(self._connections),
+                "queue_depth": len(self._queued_datagrams),
+                "max_queue_depth": self._max_queue_depth,
+                "datagrams_sent": self._datagrams_sent,
+                "frames_sent": self._frames_sent,
+                "send_batches": self._send_batches,
+            },
+            "connections": {
+                (c._rudp_peer, c._cid): c.get_statistics() for c in self._connections
+            },
+        }
+
+    ##Returns statistics of the whole server, merging the statistics
+    #last published by the other workers.
+    # @returns (dict) statistics, as returned by get_statistics()
+    def get_server_statistics(self):
+        statistics = [self.get_statistics()]
+        if self._worker_count > 1:
+            statistics += workers.read_statistics(
+                self._run_dir,
+                [w for w in range(self._worker_count) if w != self._worker],
+            )
+        return workers.merge_statistics(statistics)
+
+    ##Publishes statistics of this worker for the other workers, and
+    #schedules the next publish.
+    def publish_statistics(self):
+        workers.write_statistics(self._run_dir, self._worker, self.get_statistics())
+        self._statistics_timer = self._async_manager.timers.call_later(
+            constants._STATISTICS_INTERVAL,
+            self.publish_statistics,
+        )
+
+    ##Returns the protocol version last negotiated with a remote RUDP
+    #server.
+    # @param rudp_peer_address (tuple) Address of remote RUDP server
+    # @returns (int) version, None if never negotiated
+    def peer_version(self, rudp_peer_address):
+        return self._peer_versions.get(rudp_peer_address)
+
+    ##Records the protocol version negotiated with a remote RUDP server,
+    #forgetting the least recently negotiated servers beyond the cache size.
+    # @param rudp_peer_address (tuple) Address of remote RUDP server
+    # @param version (int) version
+    def set_peer_version(self, rudp_peer_address, version):
+        self._peer_versions.pop(rudp_peer_address, None)
+        self._peer_versions[rudp_peer_address] = version
+        while len(self._peer_versions) > constants._PEER_VERSION_CACHE_SIZE:
+            self._peer_versions.popitem(last=False)
+
+    ##Close connection. The session with its RUDP server is removed
+    #with its last connection.
     # @param connection (RUDPConnection) Connection going to be closed
     def close_connection(self, connection):
+        connection.cancel_timers()
         logging.info(
             "%s: Connection %s, %s closed" % (self, connection._rudp_peer, connection._cid)
         )
-        if len(self._connections_by_rudp_server[connection._rudp_peer].keys()) == constants._MAX_CONNECTIONS:
+        self.schedule_update()
+        session = connection._session
+        if len(session) == self._max_connections:
             if not self._closing:
                 logging.warning(
                     "%s: Accepting connections through RUDP server %s again" % (self, connection._rudp_peer)
                 )
         try:
-            del self._connections_by_rudp_server[connection._rudp_peer][connection._cid]
+            del session[connection._cid]
             self._connections.remove(connection)
         except (ValueError, KeyError):
             pass
+        if not len(session) and self._sessions.get(connection._rudp_peer) is session:
+            session.cancel_timers()
+            del self._sessions[connection._rudp_peer]
 
-    ##Start clean closing sequence
+    ##Start clean closing sequence. Connections are closed at once,
+    #without waiting for the data they have left to be acked.
     def init_close(self):
         self._closing = True
-        for c in self._connections:
-            c.init_close()
+        self.schedule_update()
+        for c in self._connections[:]:
+            c.terminate()
 
     ##String representation of object.
     # @returns (string) representation
     def __repr__(self):
         return "RUDP Connection Manager (%s)" % self._fileno
+
+    ##Property method for resolver of host names.
+    # @returns (Resolver) resolver
+    @property
+    def resolver(self):
+        return self._resolver
@@ -0,0 +1,393 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Server.rudpsession
+## @file rudpsession.py Implementation of @ref Reliable-UDP.Server.rudpsession
+
+import collections
+import logging
+import random
+from ..Common import constants
+from ..Common import timers
+
+## RUDP Session
+#
+# State shared by all connections (streams) with one remote RUDP server.
+# Maps CID to connection. Every stream keeps its own sequence space, send
+# window and retransmission, so head-of-line blocking stays per stream.
+# The path to the peer is shared: one congestion controller, one RTT
+# estimate and one pacing clock for all streams, so a thousand tunnels
+# to a peer are one congestion-controlled flow instead of a thousand.
+# Liveness is shared too: any datagram from the peer proves every stream
+# alive, and an idle session sends one heartbeat, not one per stream.
+# The session also discovers the largest datagram that passes to the
+# peer, probing in the style of DPLPMTUD (RFC 8899), and estimates the
+# loss rate that sets the strength of forward error correction.
+#
+class RUDPSession(object):
+
+    ##Init RUDPSession
+    # @param rudp_manager (RUDPManager) RUDP Manager object
+    # @param async_manager (Poller) Poller object
+    # @param rudp_peer_address (tuple) Address of remote RUDP server
+    # @param congestion_control (class) Congestion controller class
+    # @param retry_interval (int) Initial retry interval (RTO) in milliseconds
+    # @param keep_alive_interval (int) Interval in milliseconds of nothing
+    # heard from the peer before sending a heartbeat
+    # @returns (RUDPSession) RUDPSession object
+    def __init__(
+        self,
+        rudp_manager,
+        async_manager,
+        rudp_peer_address,
+        congestion_control,
+        retry_interval,
+        keep_alive_interval,
+    ):
+        ##RUDP Manager object
+        self._rudp_manager = rudp_manager
+        ##Address of remote RUDP server
+        self._rudp_peer = rudp_peer_address
+        ##Dictionary of CID to connection
+        self._connections = {}
+        ##Congestion controller, sets congestion window and pacing of
+        #all streams
+        self._congestion_controller = congestion_control()
+        ##Smoothed round trip time in milliseconds, None before first sample
+        self._srtt = None
+        ##Round trip time variance in milliseconds, None before first sample
+        self._rttvar = None
+        ##Retry interval (RTO) from measured round trip times
+        self._retry_interval = retry_interval
+        ##Packet number of the next sequenced packet of any stream, counts
+        #packets for the congestion controller
+        self._packet_number = 0
+        ##Sequenced packets of all streams sent and not acked
+        self._in_flight = 0
+        ##Estimate of the share of packets lost, moving average of the
+        #packets acked and lost
+        self._loss_rate = 0.0
+        ##Time in milliseconds of when next paced packet may be sent
+        self._time_next_send = None
+        ##Ordered set of connections waiting for the congestion window
+        self._waiting = collections.OrderedDict()
+        ##Keep-alive interval of idle session before sending heartbeat
+        self._keep_alive_interval = keep_alive_interval
+        if keep_alive_interval == constants._KEEP_ALIVE_INTERVAL:
+            self._keep_alive_interval -= random.random() * 1000
+        ##Time in milliseconds of when a datagram was last received
+        #from the peer
+        self._last_heard = timers.now()
+        ##Deadline to send heartbeat
+        self._heartbeat_deadline = timers.Deadline(
+            async_manager.timers,
+            self.heartbeat_expired,
+        )
+        ##Largest datagram size known to pass to the peer (PLPMTU)
+        self._max_datagram_size = constants._BASE_DATAGRAM_SIZE
+        ##Whether path MTU discovery started
+        self._probing = False
+        ##Datagram size of the probe waiting for answer, None between
+        #searches
+        self._probe_size = None
+        ##Probes of that size sent without answer
+        self._probe_count = 0
+        ##Deadline to give up waiting for answer to a probe, or to start
+        #another search
+        self._probe_deadline = timers.Deadline(
+            async_manager.timers,
+            self.probe_expired,
+        )
+
+    ##Returns connection by CID.
+    # @param cid (int) Connection ID
+    # @returns (RUDPConnection) connection
+    def __getitem__(self, cid):
+        return self._connections[cid]
+
+    ##Adds connection.
+    # @param cid (int) Connection ID
+    # @param connection (RUDPConnection) connection
+    def __setitem__(self, cid, connection):
+        self._connections[cid] = connection
+        if not self._heartbeat_deadline.pending:
+            self._heartbeat_deadline.set(self._keep_alive_interval)
+
+    ##Removes connection, with its packets in flight, and lets
+    #connections waiting for the window they held send.
+    # @param cid (int) Connection ID
+    def __delitem__(self, cid):
+        connection = self._connections.pop(cid)
+        self._in_flight -= connection.in_flight
+        self._waiting.pop(connection, None)
+        self.send_waiting()
+
+    ##Returns whether a connection exists.
+    # @param cid (int) Connection ID
+    # @returns (bool) exists or not
+    def __contains__(self, cid):
+        return cid in self._connections
+
+    ##Returns number of connections.
+    # @returns (int) number of connections
+    def __len__(self):
+        return len(self._connections)
+
+    ##Returns CIDs of connections.
+    # @returns (list) CIDs
+    def keys(self):
+        return self._connections.keys()
+
+    ##Returns connections.
+    # @returns (list) connections
+    def values(self):
+        return self._connections.values()
+
+    ##Counts a new sequenced packet as in flight.
+    # @returns (int) packet number of the packet
+    def packet_queued(self):
+        self._in_flight += 1
+        self._packet_number += 1
+        return self._packet_number - 1
+
+    ##Logic on ACK of a stream that acknowledged new packets.
+    # @param acked (int) number of packets newly acked or selectively acked
+    # @param rtt (float) RTT sample in milliseconds, None if no sample
+    # @param ack_number (int) packet number following the packets
+    #newly acked cumulatively, 0 if none
+    def on_ack(self, acked, rtt, ack_number):
+        self._in_flight -= acked
+        self._loss_rate *= (1 - constants._FEC_LOSS_GAIN) ** acked
+        self._congestion_controller.on_ack(
+            acked,
+            rtt,
+            ack_number,
+            self._in_flight,
+        )
+
+    ##Logic on packet loss detected by SACK.
+    def on_loss(self):
+        self.update_loss_rate()
+        self._congestion_controller.on_loss(self._packet_number)
+
+    ##Logic on retransmission timeout of a stream.
+    def on_timeout(self):
+        self.update_loss_rate()
+        self._congestion_controller.on_timeout(self._packet_number)
+
+    ##Counts a lost packet in the loss rate estimate.
+    def update_loss_rate(self):
+        self._loss_rate += constants._FEC_LOSS_GAIN * (1 - self._loss_rate)
+
+    ##Update smoothed RTT, RTT variance and retry interval (RTO) with
+    #a new round trip time sample, according to Jacobson/Karels.
+    # @param rtt (float) round trip time sample in milliseconds
+    def update_rtt(self, rtt):
+        if self._srtt is None:
+            self._srtt = rtt
+            self._rttvar = rtt / 2
+        else:
+            self._rttvar = (
+                (1 - constants._RTTVAR_GAIN) * self._rttvar
+                + constants._RTTVAR_GAIN * abs(self._srtt - rtt)
+            )
+            self._srtt = (1 - constants._SRTT_GAIN) * self._srtt + constants._SRTT_GAIN * rtt
+        self._retry_interval = min(
+            max(
+                self._srtt + 4 * self._rttvar,
+                constants._MIN_RETRY_INTERVAL,
+            ),
+            constants._MAX_RETRY_INTERVAL,
+        )
+
+    ##Returns whether the congestion window is full.
+    # @returns (bool) window full or not
+    def window_full(self):
+        return self._in_flight >= self._congestion_controller.cwnd
+
+    ##Takes a pacing slot for a packet, if one is available now.
+    #Sending that was delayed may catch up in a burst of up
+    #to _PACING_BURST milliseconds.
+    # @param now (float) present time in milliseconds
+    # @returns (bool) packet may be sent or not
+    def take_pacing_slot(self, now):
+        interval = self._congestion_controller.get_pacing_interval()
+        if interval is None:
+            return True
+        if self._time_next_send is not None and now < self._time_next_send:
+            return False
+        if self._time_next_send is None or now - self._time_next_send > constants._PACING_BURST:
+            self._time_next_send = now
+        self._time_next_send += interval
+        return True
+
+    ##Logic when a datagram is received from the peer, of any stream.
+    #Postpones the heartbeat.
+    def datagram_received(self):
+        self._last_heard = timers.now()
+        self._heartbeat_deadline.set_at(self._last_heard + self._keep_alive_interval)
+
+    ##Logic when nothing was heard from the peer for the keep-alive
+    #interval. Packets in flight already test the peer, else a
+    #keep-alive packet is sent on one established stream. It is
+    #retransmitted like any packet, so a peer that stopped answering
+    #exhausts its retries.
+    def heartbeat_expired(self):
+        if not self._connections:
+            return
+        self._heartbeat_deadline.set(self._keep_alive_interval)
+        if self._in_flight:
+            return
+        for connection in self._connections.values():
+            if not connection._closing and connection._send_base:
+                connection.queue_kp_alive()
+                return
+
+    ##Logic when a stream exhausted its retries. If nothing was heard
+    #from the peer for its whole last retry interval either, the peer
+    #is gone and every stream is closed, idle streams included.
+    # @param connection (RUDPConnection) connection that exhausted retries
+    # @param retry_interval (float) last retry interval of the connection
+    #in milliseconds
+    def retries_exhausted(self, connection, retry_interval):
+        if timers.now() - self._last_heard < retry_interval:
+            return
+        logging.info(
+            "%s: Peer not answering, closing every connection..." % self
+        )
+        for c in self._connections.values():
+            if c is not connection and not c._closing:
+                c.init_close(queue_close=False)
+
+    ##Starts path MTU discovery, once a stream speaks it.
+    def start_probing(self):
+        if not self._probing:
+            self._probing = True
+            self.send_probe()
+
+    ##Sends a probe of the next size larger than the largest known to
+    #pass, on a stream that speaks path MTU discovery. The search is
+    #over when no size is left, or no such stream is left.
+    def send_probe(self):
+        sizes = [s for s in constants._PMTU_PROBE_SIZES if s > self._max_datagram_size]
+        connections = [
+            c for c in self._connections.values()
+            if not c._closing and c._version >= constants._PMTU_VERSION
+        ]
+        if not sizes or not connections:
+            self._probing = False
+            self._probe_size = None
+            return
+        self._probe_size = sizes[0]
+        self._probe_count += 1
+        connections[0].queue_probe(self._probe_size)
+        self._probe_deadline.set(self._retry_interval)
+
+    ##Logic on answer to a probe. The size passed, a larger one is
+    #probed next.
+    # @param size (int) datagram size of the probe
+    def probe_acked(self, size):
+        if size != self._probe_size:
+            return
+        logging.info(
+            "%s: Path MTU discovery: datagrams of %s bytes pass" % (self, size)
+        )
+        self._max_datagram_size = size
+        self._probe_count = 0
+        self._probe_deadline.cancel()
+        self.send_probe()
+
+    ##Logic when the socket refused a probe as larger than the path MTU
+    #known to the kernel. The probe counts as lost without waiting for
+    #its answer.
+    # @param size (int) datagram size of the probe
+    def probe_refused(self, size):
+        if size != self._probe_size:
+            return
+        self._probe_deadline.cancel()
+        self.probe_expired()
+
+    ##Logic when a probe was not answered in time, or when it is time
+    #to search again. After _MAX_PROBES probes of a size without answer
+    #the size is taken not to pass, until _PMTU_RAISE_INTERVAL passed.
+    def probe_expired(self):
+        if self._probe_size is not None and self._probe_count >= constants._MAX_PROBES:
+            logging.info(
+                "%s: Path MTU discovery: datagrams of %s bytes do not pass, using %s bytes" % (
+                    self,
+                    self._probe_size,
+                    self._max_datagram_size,
+                )
+            )
+            self._probe_size = None
+            self._probe_count = 0
+            self._probe_deadline.set(constants._PMTU_RAISE_INTERVAL)
+        else:
+            self.send_probe()
+
+    ##Cancel every timer of the session.
+    def cancel_timers(self):
+        self._heartbeat_deadline.cancel()
+        self._probe_deadline.cancel()
+
+    ##Makes a connection wait for the congestion window.
+    # @param connection (RUDPConnection) connection blocked by the window
+    def wait_for_window(self, connection):
+        self._waiting[connection] = None
+
+    ##Lets connections waiting for the congestion window send, oldest
+    #first, while the window is open.
+    def send_waiting(self):
+        while self._waiting and not self.window_full():
+            connection, _ = self._waiting.popitem(last=False)
+            connection.send_buffered()
+
+    ##String representation of object.
+    # @returns (string) representation
+    def __repr__(self):
+        return "RUDP Session (%s, %s)" % self._rudp_peer
+
+    ##Property method for congestion controller.
+    # @returns (CongestionController) congestion controller
+    @property
+    def congestion_controller(self):
+        return self._congestion_controller
+
+    ##Property method for smoothed RTT.
+    # @returns (float) smoothed RTT in milliseconds, None before first sample
+    @property
+    def srtt(self):
+        return self._srtt
+
+    ##Property method for RTT variance.
+    # @returns (float) RTT variance in milliseconds, None before first sample
+    @property
+    def rttvar(self):
+        return self._rttvar
+
+    ##Property method for retry interval.
+    # @returns (float) retry interval (RTO) in milliseconds
+    @property
+    def retry_interval(self):
+        return self._retry_interval
+
+    ##Property method for largest datagram size known to pass.
+    # @returns (int) size in bytes
+    @property
+    def max_datagram_size(self):
+        return self._max_datagram_size
+
+    ##Property method for data packets covered by one parity packet of
+    #forward error correction. Half the packets expected between losses,
+    #so a block mostly loses no more than the one packet parity rebuilds.
+    # @returns (int) number of data packets
+    @property
+    def fec_block_size(self):
+        if self._loss_rate * 2 * constants._FEC_MAX_BLOCK <= 1:
+            return constants._FEC_MAX_BLOCK
+        return max(int(1 / (2 * self._loss_rate)), constants._FEC_MIN_BLOCK)
+
+    ##Property method for time of next paced packet.
+    # @returns (float) time in milliseconds
+    @property
+    def time_next_send(self):
+        return self._time_next_send
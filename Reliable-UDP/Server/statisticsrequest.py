@@ -36,6 +36,18 @@ class StatisticsRequest(ControlRequest):
         "connected_user",
         "sequence_number",
         "peer_sequence_number",
+        "srtt",
+        "rttvar",
+        "rto",
+        "cwnd",
+        "max_datagram_size",
+        "packets_rebuilt",
+        "compression_ratio",
+        "queue_depth",
+        "max_queue_depth",
+        "datagrams_sent",
+        "frames_sent",
+        "send_batches",
     )
 
     ##Statistic info types that are connection specific
@@ -46,11 +58,23 @@ class StatisticsRequest(ControlRequest):
         "connected_user",
         "sequence_number",
         "peer_sequence_number",
+        "srtt",
+        "rttvar",
+        "rto",
+        "cwnd",
+        "max_datagram_size",
+        "packets_rebuilt",
+        "compression_ratio",
     )
 
     ##Statistic info types that are not connection-specific
     _GENERAL = (
-        "number_of_connections"
+        "number_of_connections",
+        "queue_depth",
+        "max_queue_depth",
+        "datagrams_sent",
+        "frames_sent",
+        "send_batches",
     )
 
     ##Init StatisticsRequest
@@ -64,29 +88,20 @@ class StatisticsRequest(ControlRequest):
     ##Prepare request response.
     ## @returns (bool) Preparation has been finished or not
     def prepare_response(self):
-        self.check_headers()
+        statistics = self._control_socket._rudp_manager.get_server_statistics()
+        self.check_headers(statistics)
         info = self._headers_in["info"]
-        if info == "number_of_connections":
-            self._headers_out["number_of_connections"] = len(self._control_socket._rudp_manager._connections)
+        if info in self._GENERAL:
+            self._headers_out[info] = statistics["general"][info]
         else:
             exit_addr = self._headers_in["rudp_address"], self._headers_in["rudp_port"]
             cid = self._headers_in["cid"]
-            if info == "bytes_sent":
-                self._headers_out["bytes_sent"] = self._control_socket._rudp_manager._connections_by_rudp_server[exit_addr][cid]._bytes_sent
-            elif info == "bytes_received":
-                self._headers_out["bytes_received"] = self._control_socket._rudp_manager._connections_by_rudp_server[exit_addr][cid]._bytes_received
-            elif info == "remote_user":
-                self._headers_out["remote_user"] = self._control_socket._rudp_manager._connections_by_rudp_server[exit_addr][cid]._remote_user
-            elif info == "connected_user":
-                self._headers_out["connected_user"] = self._control_socket._rudp_manager._connections_by_rudp_server[exit_addr][cid]._close_user
-            elif info == "sequence_number":
-                self._headers_out["sequence_number"] = self._control_socket._rudp_manager._connections_by_rudp_server[exit_addr][cid]._sequence_num
-            elif info == "peer_sequence_number":
-                self._headers_out["peer_sequence_number"] = self._control_socket._rudp_manager._connections_by_rudp_server[exit_addr][cid]._peer_sequence_num
+            self._headers_out[info] = statistics["connections"][(exit_addr, cid)][info]
         return super(StatisticsRequest, self).prepare_response()
 
     ##Check received headers. Raise error if invalid.
-    def check_headers(self):
+    # @param statistics (dict) statistics of the server
+    def check_headers(self, statistics):
         if self._headers_in["info"] not in self._INFO_TYPES:
             raise controlserver.ControlError(code=constants._CONTROL_INVALID_REQUEST, message="Invalid Request")
 
@@ -114,10 +129,7 @@ class StatisticsRequest(ControlRequest):
             ):
                 raise controlserver.ControlError(code=constants._CONTROL_INVALID_REQUEST, message="Invalid Request")
 
-            if addr not in self._control_socket._rudp_manager._connections_by_rudp_server:
-                raise controlserver.ControlError(code=constants._CONTROL_CONNECTION_NOT_EXIST, message="Connection Does Not Exist")
-
-            if cid not in self._control_socket._rudp_manager._connections_by_rudp_server[addr]:
+            if (addr, cid) not in statistics["connections"]:
                 raise controlserver.ControlError(code=constants._CONTROL_CONNECTION_NOT_EXIST, message="Connection Does Not Exist")
 
     ##Dict of state to matching method
@@ -0,0 +1,212 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Server.workers
+## @file workers.py Implementation of @ref Reliable-UDP.Server.workers
+
+import cPickle
+import errno
+import logging
+import os
+import random
+import shutil
+import signal
+import socket
+import struct
+from ..Common import asyncio
+from ..Common import constants
+from ..Common.asyncsocket import AsyncSocket
+
+##Header of a forwarded datagram: address and port of the RUDP server
+#that sent it
+_FORWARD_HEADER = struct.Struct("!4sH")
+
+##Statistics that are merged across workers by maximum, others are summed
+_MAX_STATISTICS = (
+    "max_queue_depth",
+)
+
+##Returns path of the forwarding socket of a worker.
+# @param run_dir (string) run directory shared by the workers
+# @param worker (int) worker ID
+# @returns (string) path
+def socket_path(run_dir, worker):
+    return os.path.join(run_dir, "worker-%s.sock" % worker)
+
+##Returns path of the statistics file of a worker.
+# @param run_dir (string) run directory shared by the workers
+# @param worker (int) worker ID
+# @returns (string) path
+def statistics_path(run_dir, worker):
+    return os.path.join(run_dir, "worker-%s.stats" % worker)
+
+##Writes statistics of a worker, replacing the previous ones at once.
+# @param run_dir (string) run directory shared by the workers
+# @param worker (int) worker ID
+# @param statistics (dict) statistics of the worker
+def write_statistics(run_dir, worker, statistics):
+    path = statistics_path(run_dir, worker)
+    with open(path + ".tmp", "wb") as f:
+        cPickle.dump(statistics, f, cPickle.HIGHEST_PROTOCOL)
+    os.rename(path + ".tmp", path)
+
+##Reads the last statistics published by workers.
+# @param run_dir (string) run directory shared by the workers
+# @param worker_ids (list) worker IDs
+# @returns (list) statistics of the workers that published any
+def read_statistics(run_dir, worker_ids):
+    statistics = []
+    for worker in worker_ids:
+        try:
+            with open(statistics_path(run_dir, worker), "rb") as f:
+                statistics.append(cPickle.load(f))
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                raise
+    return statistics
+
+##Merges statistics of workers into statistics of the server.
+# @param statistics (list) statistics of the workers
+# @returns (dict) statistics of the server
+def merge_statistics(statistics):
+    merged = {
+        "general": {},
+        "connections": {},
+    }
+    for s in statistics:
+        for info, value in s["general"].items():
+            if info not in merged["general"]:
+                merged["general"][info] = value
+            elif info in _MAX_STATISTICS:
+                merged["general"][info] = max(merged["general"][info], value)
+            else:
+                merged["general"][info] += value
+        merged["connections"].update(s["connections"])
+    return merged
+
+##Forks worker processes, and supervises them until they exit.
+#SIGINT and SIGTERM received by the supervisor are passed on to
+#the workers.
+# @param count (int) number of workers
+# @param run_dir (string) run directory shared by the workers, removed
+# when the workers exit
+# @returns (int) worker ID in a worker, None in the supervisor once
+# every worker exited
+def fork_workers(count, run_dir):
+    pids = []
+    for worker in range(count):
+        pid = os.fork()
+        if pid == 0:
+            random.seed()
+            return worker
+        pids.append(pid)
+
+    def handler_exit(signalnum, frame):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGINT)
+            except OSError:
+                pass
+    signal.signal(signal.SIGINT, handler_exit)
+    signal.signal(signal.SIGTERM, handler_exit)
+    for pid in pids:
+        while True:
+            try:
+                os.waitpid(pid, 0)
+                break
+            except OSError as e:
+                if e.errno != errno.EINTR:
+                    raise
+    shutil.rmtree(run_dir, ignore_errors=True)
+    return None
+
+## Worker Socket
+#
+# Local datagram socket of a worker. RUDP datagrams that the kernel
+# steered to a worker that does not own their connection are forwarded
+# through it to the owner, with the address of the sending RUDP server.
+#
+class WorkerSocket(AsyncSocket):
+
+    ##Init WorkerSocket
+    # @param async_manager (Poller) Poller object
+    # @param rudp_manager (RUDPManager) RUDP manager of the worker
+    # @param run_dir (string) run directory shared by the workers
+    # @param worker (int) worker ID
+    # @param worker_count (int) number of workers
+    # @param timeout (int) default timeout in milliseconds
+    # @returns (WorkerSocket) WorkerSocket object
+    def __init__(
+        self,
+        async_manager,
+        rudp_manager,
+        run_dir,
+        worker,
+        worker_count,
+        timeout,
+    ):
+        s = socket.socket(
+            family=socket.AF_UNIX,
+            type=socket.SOCK_DGRAM,
+        )
+        s.setblocking(0)
+        s.bind(socket_path(run_dir, worker))
+        super(WorkerSocket, self).__init__(
+            async_manager=async_manager,
+            socket=s,
+            timeout=timeout,
+        )
+        ##RUDP manager of the worker
+        self._rudp_manager = rudp_manager
+        ##Socket paths of all workers, by worker ID
+        self._paths = [socket_path(run_dir, w) for w in range(worker_count)]
+
+    ##Logic on read event. Passes forwarded datagrams to the RUDP manager.
+    def read(self):
+        try:
+            while True:
+                buf = self._s.recv(_FORWARD_HEADER.size + constants._MAX_DATAGRAM_SIZE)
+                addr, port = _FORWARD_HEADER.unpack_from(buf)
+                self._rudp_manager.receive_datagram(
+                    buf[_FORWARD_HEADER.size:],
+                    (socket.inet_ntoa(addr), port),
+                )
+        except IOError as e:
+            if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
+                raise
+
+    ##Forwards a datagram to the worker owning its connection. Datagrams
+    #that can't be forwarded are dropped, like any lost datagram.
+    # @param worker (int) worker ID
+    # @param datagram (string) datagram in string form
+    # @param address (tuple) address of the sending RUDP server
+    def forward(self, worker, datagram, address):
+        try:
+            self._s.sendto(
+                _FORWARD_HEADER.pack(socket.inet_aton(address[0]), address[1]) + datagram,
+                self._paths[worker],
+            )
+        except IOError as e:
+            logging.warning(
+                "%s: Couldn't forward datagram to worker %s: %s" % (self, worker, e)
+            )
+
+    ##Starts clean close. The socket stays open for the connections
+    #closing, until its RUDP manager terminates and closes it.
+    def init_close(self):
+        pass
+
+    ##Closes the socket on the next update, once its RUDP manager
+    #terminated.
+    def close(self):
+        self._closing = True
+        self.schedule_update()
+
+    ##Return IO mask for the object.
+    # @returns (int) IO mask
+    def get_io_mask(self):
+        return asyncio.BaseEvent.POLLERR | asyncio.BaseEvent.POLLIN
+
+    ##String representation of object.
+    # @returns (string) representation
+    def __repr__(self):
+        return "Worker Socket (%s)" % self._fileno
@@ -93,7 +93,7 @@ class EchoListener(TCPServerListener):
             s1, addr = self._s.accept()
             self._accepted = True
             logging.info(
-                "%s: Connection accepted from %s" % (self, s1.getpeername())
+                "%s: Connection accepted from %s" % (self, addr)
             )
             s1.setblocking(0)
             EchoSocket(
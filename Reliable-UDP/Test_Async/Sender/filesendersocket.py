@@ -70,15 +70,15 @@ class FileSenderSocket(TCPServerSocket):
     ##Handle logic of buffer received.
     # @param buf (string) Buffer received
     def handle_buf_received(self, buf):
-        self._recv_buff += buf
+        self._recv_buff.append(buf)
         if len(self._recv_buff) >= len(self._buf_sent):
-            if self._recv_buff != self._buf_sent:
+            received = self._recv_buff.take()
+            if received != self._buf_sent:
                 logging.error(
                     "%s, socket port %s, false data received, sent %s, received %s"
-                     % (self, self._s.getsockname()[1], self._buf_sent, self._recv_buff)
+                     % (self, self._s.getsockname()[1], self._buf_sent, received)
                 )
                 raise RuntimeError('Bad Data')
-            self._recv_buff = ""
             self.queue_file_block()
 
     ##Read another block from the file and queue it.
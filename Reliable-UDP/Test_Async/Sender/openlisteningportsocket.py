@@ -87,13 +87,12 @@ class OpenListeningPortSocket(TCPServerSocket):
     ##Handle logic of buffer received.
     # @param buf (string) Buffer received.
     def handle_buf_received(self, buf):
-        self._recv_buff += buf
+        self._recv_buff.append(buf)
         END = "%s%s" % (constants._LF, constants._LF)
         SEP = "="
-        i = buf.find(END)
-        if i != -1:
-            self._recv_buff = self._recv_buff[:(-len(END))]
-            lines = self._recv_buff.split("\n")
+        response = self._recv_buff.read_until(END)
+        if response is not None:
+            lines = response.split("\n")
             for line in lines:
                 field, value = line.split(SEP)
                 if field == "code" and int(value) != 0:
@@ -111,7 +110,7 @@ class OpenListeningPortSocket(TCPServerSocket):
 
     ##Start clean close of object.
     def init_close(self):
-        self._send_buff = ""
+        self._send_buff.clear()
         super(OpenListeningPortSocket, self).init_close()
 
     ##String representation of object.
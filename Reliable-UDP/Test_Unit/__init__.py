@@ -0,0 +1,3 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Test_Unit.__init__
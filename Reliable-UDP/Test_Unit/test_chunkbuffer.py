@@ -0,0 +1,59 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Test_Unit.test_chunkbuffer
+## @file test_chunkbuffer.py Implementation of @ref Reliable-UDP.Test_Unit.test_chunkbuffer
+
+import unittest
+from ..Common.chunkbuffer import ChunkBuffer
+
+##Returns data peeked from a buffer as a string.
+# @param data (memoryview or string) data
+# @returns (string) data
+def to_string(data):
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    return data
+
+## Chunk buffer test
+#
+# Reads a buffer of several chunks whose first chunk is partly consumed.
+#
+class ChunkBufferTest(unittest.TestCase):
+
+    ##Sets up a buffer of three chunks, two bytes of the first consumed.
+    def setUp(self):
+        ##Buffer under test
+        self.buff = ChunkBuffer("abcdef")
+        self.buff.append("ghi")
+        self.buff.append("jkl")
+        self.buff.consume(2)
+
+    ##Peeks within the first chunk, across chunks and past the end.
+    def test_peek(self):
+        self.assertEqual(to_string(self.buff.peek(3)), "cde")
+        self.assertEqual(to_string(self.buff.peek(6)), "cdefgh")
+        self.assertEqual(to_string(self.buff.peek(100)), "cdefghijkl")
+        self.assertEqual(len(self.buff), 10)
+
+    ##Takes within the first chunk, across chunks and the rest.
+    def test_take(self):
+        self.assertEqual(self.buff.take(2), "cd")
+        self.assertEqual(self.buff.take(5), "efghi")
+        self.assertEqual(len(self.buff), 3)
+        self.assertEqual(self.buff.take(), "jkl")
+        self.assertFalse(self.buff)
+
+    ##Reads lines split across chunks, with a separator split too.
+    def test_read_until(self):
+        buff = ChunkBuffer("xxline1\r")
+        buff.consume(2)
+        buff.append("\nli")
+        self.assertIsNone(buff.read_until("\r\n\r\n"))
+        buff.append("ne2\r\n")
+        self.assertEqual(buff.read_until("\r\n"), "line1")
+        self.assertEqual(buff.read_until("\r\n"), "line2")
+        self.assertIsNone(buff.read_until("\r\n"))
+        self.assertEqual(len(buff), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Test_Unit.test_compression
+## @file test_compression.py Implementation of @ref Reliable-UDP.Test_Unit.test_compression
+
+import random
+import unittest
+from ..Server.compression import ZlibCodec
+
+## zlib codec test
+#
+# Decodes the frames one codec encodes with another, as a peer does.
+#
+class ZlibCodecTest(unittest.TestCase):
+
+    ##Sets up the codecs of both peers, and data that compresses well
+    #and data that doesn't.
+    def setUp(self):
+        ##Codec of the sending peer
+        self.sender = ZlibCodec()
+        ##Codec of the receiving peer
+        self.receiver = ZlibCodec()
+        ##Data that compresses well
+        self.text = "".join("line %s of the stream\n" % i for i in range(500))
+        r = random.Random(1)
+        ##Data that doesn't compress
+        self.noise = "".join(chr(r.randint(0, 255)) for i in range(5000))
+
+    ##Frames cut at any point across packets are decoded once whole,
+    #and build on the frames compressed before.
+    def test_split_frames(self):
+        buffers = [self.text, self.noise, self.text[:100], self.text]
+        stream = "".join(self.sender.encode(buf) for buf in buffers)
+        decoded = []
+        for i in range(0, len(stream), 7):
+            decoded.append(self.receiver.decode(stream[i:i + 7]))
+        self.assertEqual("".join(decoded), "".join(buffers))
+        self.assertEqual(self.receiver._recv_buff, "")
+
+    ##Data that doesn't compress is sent as is, in an uncompressed frame.
+    def test_uncompressed_frame(self):
+        frame = self.sender.encode(self.noise)
+        compressed, length = ZlibCodec._FRAME_HEADER.unpack_from(frame)
+        self.assertFalse(compressed)
+        self.assertEqual(frame[ZlibCodec._FRAME_HEADER.size:], self.noise)
+        self.assertEqual(self.receiver.decode(frame), self.noise)
+
+    ##Data that compresses well is sent in a shorter, compressed frame.
+    def test_compressed_frame(self):
+        frame = self.sender.encode(self.text)
+        compressed, length = ZlibCodec._FRAME_HEADER.unpack_from(frame)
+        self.assertTrue(compressed)
+        self.assertLess(len(frame), len(self.text))
+        self.assertEqual(self.receiver.decode(frame), self.text)
+
+if __name__ == "__main__":
+    unittest.main()
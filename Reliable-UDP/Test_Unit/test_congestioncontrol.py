@@ -0,0 +1,51 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Test_Unit.test_congestioncontrol
+## @file test_congestioncontrol.py Implementation of @ref Reliable-UDP.Test_Unit.test_congestioncontrol
+
+import unittest
+from ..Common import constants
+from ..Server import congestioncontrol
+from ..Server.congestioncontrol import BBRController
+
+## BBR test
+#
+# Drives a BBR controller with ACKs on a clock of its own.
+#
+class BBRTest(unittest.TestCase):
+
+    ##Sets up the clock of the controller.
+    def setUp(self):
+        ##Present time in milliseconds
+        self.time = 0.0
+        ##Clock replaced
+        self._now = congestioncontrol._now
+        congestioncontrol._now = lambda: self.time
+
+    ##Restores the clock.
+    def tearDown(self):
+        congestioncontrol._now = self._now
+
+    ##Acks a packet every millisecond for a duration.
+    # @param bbr (BBRController) controller
+    # @param duration (int) duration in milliseconds
+    # @param rtt (float) RTT sample of every ACK
+    def ack(self, bbr, duration, rtt):
+        for i in range(duration):
+            self.time += 1
+            bbr.on_ack(1, rtt, 0, 10)
+
+    ##Once the minimum RTT was not lowered for the window, probe RTT
+    #state takes it anew and is left after its time.
+    def test_probe_rtt(self):
+        bbr = BBRController()
+        self.ack(bbr, 100, 10.0)
+        self.ack(bbr, constants._BBR_MIN_RTT_WINDOW + 20, 20.0)
+        self.assertEqual(bbr._state, BBRController._PROBE_RTT)
+        self.assertEqual(bbr.cwnd, constants._BBR_MIN_CWND)
+        self.ack(bbr, constants._BBR_PROBE_RTT_TIME + 100, 20.0)
+        self.assertNotEqual(bbr._state, BBRController._PROBE_RTT)
+        self.assertEqual(bbr._min_rtt, 20.0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,464 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Test_Unit.test_rudpconnection
+## @file test_rudpconnection.py Implementation of @ref Reliable-UDP.Test_Unit.test_rudpconnection
+
+import errno
+import random
+import socket
+import unittest
+from ..Common import asyncio
+from ..Common import constants
+from ..Common import timers
+from ..Common import util
+from ..Common.tcpserver import DisconnectError
+from ..Server.dataserver import DataListener
+from ..Server.rudpconnection import RUDPConnection
+from ..Server.rudpmanager import RUDPManager
+
+##Runs one iteration of the main loop of a poller. Pollables whose
+#user disconnected are terminated.
+# @param async_manager (Poller) Poller object
+# @param timeout (int) max time in milliseconds to wait for events
+def run_once(async_manager, timeout):
+    async_manager.timers.run_expired()
+    async_manager.update()
+    sleep = async_manager.timers.get_sleep_time(timeout)
+    for fd, event in async_manager.init_poller().poll(sleep):
+        try:
+            async_manager.receive_event(fd, event)
+        except DisconnectError:
+            async_manager._pollables[fd].terminate()
+
+## Data Socket stub
+#
+# Stands for the data socket of a connection, keeping the data the
+# connection gives to the user.
+#
+class DataSocketStub(object):
+
+    ##Init DataSocketStub
+    # @returns (DataSocketStub) DataSocketStub object
+    def __init__(self):
+        ##Closing or not
+        self._closing = False
+        ##Data given to the user
+        self.received = []
+
+    ##Queues buffer to be sent to the user.
+    # @param buf (string) buffer
+    def queue_buffer(self, buf):
+        self.received.append(buf)
+
+    ##Returns bytes queued to be sent to the user.
+    # @returns (int) bytes queued
+    def bytes_queued(self):
+        return 0
+
+    ##Starts clean close.
+    def init_close(self):
+        self._closing = True
+
+    ##Schedules update of the socket.
+    def schedule_update(self):
+        pass
+
+
+## Legacy RUDP peer
+#
+# Answers an RUDP connection like a server of the legacy protocol: takes
+# any data packet above the last one received as the next in order, and
+# acks the highest sequence number received. Drops received data packets
+# at random.
+#
+class LegacyPeer(object):
+
+    ##Init LegacyPeer
+    # @param drop (float) chance of dropping a received data packet
+    # @param seed (int) seed of the drops
+    # @returns (LegacyPeer) LegacyPeer object
+    def __init__(self, drop, seed):
+        ##UDP socket of the peer
+        self._s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._s.bind(("127.0.0.1", 0))
+        self._s.setblocking(0)
+        ##Chance of dropping a received data packet
+        self._drop = drop
+        ##Random generator of the drops
+        self._random = random.Random(seed)
+        ##Highest sequence number received
+        self._peer_sequence_num = None
+        ##Data received, in order of acceptance
+        self.stream = []
+        ##Data packets dropped
+        self.dropped = 0
+        ##Data packets received before the connection was approved
+        self.early = 0
+        ##Connection approved or not
+        self._approved = False
+
+    ##Property method for address of the peer.
+    # @returns (tuple) address
+    @property
+    def address(self):
+        return self._s.getsockname()
+
+    ##Sends a legacy packet.
+    # @param address (tuple) address of the RUDP server
+    # @param cid (int) Connection ID
+    # @param flag (int) flag
+    # @param sqn_num (int) sequence number
+    # @param data (string) data
+    def send(self, address, cid, flag, sqn_num, data=""):
+        content = "%04x%01x%04x%s" % (cid, flag, sqn_num, data)
+        self._s.sendto("%04x%s" % (len(content), content), address)
+
+    ##Receives and answers every packet waiting on the socket.
+    def receive(self):
+        while True:
+            try:
+                datagram, address = self._s.recvfrom(constants._MAX_DATAGRAM_SIZE)
+            except socket.error as e:
+                if e.errno in (errno.EWOULDBLOCK, errno.EAGAIN):
+                    return
+                raise
+            length = int(datagram[:4], 16)
+            cid = int(datagram[4:8], 16)
+            flag = int(datagram[8:9], 16)
+            sqn_num = int(datagram[9:13], 16)
+            data = datagram[13:4 + length]
+            if flag == RUDPConnection._FLAG_INIT:
+                self._peer_sequence_num = sqn_num
+                self.send(address, cid, RUDPConnection._FLAG_ACK, sqn_num)
+                if not self._approved:
+                    self._approved = True
+                    self.send(address, cid, RUDPConnection._FLAG_INIT, 0)
+            elif flag == RUDPConnection._FLAG_DATA:
+                if not self._approved:
+                    self.early += 1
+                if self._random.random() < self._drop:
+                    self.dropped += 1
+                    continue
+                if sqn_num > self._peer_sequence_num:
+                    self.stream.append(data)
+                    self._peer_sequence_num = sqn_num
+                self.send(address, cid, RUDPConnection._FLAG_ACK, self._peer_sequence_num)
+
+    ##Closes the socket of the peer.
+    def close(self):
+        self._s.close()
+
+
+## Legacy interoperability test
+#
+# Streams data to a legacy peer over a lossy link.
+#
+class LegacyPeerTest(unittest.TestCase):
+
+    ##Sets up an RUDP manager and a legacy peer.
+    def setUp(self):
+        ##Poller object
+        self.async_manager = asyncio.Poller(
+            type=asyncio.MAP[asyncio.default_poller_type()],
+            timeout=constants._TIMEOUT,
+        )
+        ##RUDP manager under test
+        self.rudp_manager = RUDPManager(
+            async_manager=self.async_manager,
+            bind_address=("127.0.0.1", 0),
+            timeout=constants._TIMEOUT,
+            random_drop=0,
+        )
+        ##Legacy peer
+        self.peer = LegacyPeer(drop=0.1, seed=1)
+
+    ##Tears down the RUDP manager and the legacy peer.
+    def tearDown(self):
+        self.async_manager.terminate()
+        self.peer.close()
+
+    ##Data streamed to a legacy peer that drops packets arrives whole and
+    #in order, and none is sent before the connection is approved.
+    def test_lossy_stream(self):
+        data_socket = DataSocketStub()
+        connection = self.rudp_manager.init_connection(
+            rudp_exit=self.peer.address,
+            initiator=("127.0.0.1", 1),
+            endpoint=("127.0.0.1", 2),
+            data_socket=data_socket,
+        )
+        sent = "".join(chr(ord("a") + i % 26) * 100 for i in range(300))
+        connection.queue_buffer(sent)
+        deadline = timers.now() + 60000
+        while len("".join(self.peer.stream)) < len(sent) and timers.now() < deadline:
+            run_once(self.async_manager, 10)
+            self.peer.receive()
+        self.assertEqual("".join(self.peer.stream), sent)
+        self.assertGreater(self.peer.dropped, 0)
+        self.assertEqual(self.peer.early, 0)
+
+
+## Forward error correction test
+#
+# Feeds parity packets to an established connection.
+#
+class ParityTest(unittest.TestCase):
+
+    ##Sets up an RUDP manager and a connection that speaks parity.
+    def setUp(self):
+        ##Poller object
+        self.async_manager = asyncio.Poller(
+            type=asyncio.MAP[asyncio.default_poller_type()],
+            timeout=constants._TIMEOUT,
+        )
+        ##RUDP manager under test
+        self.rudp_manager = RUDPManager(
+            async_manager=self.async_manager,
+            bind_address=("127.0.0.1", 0),
+            timeout=constants._TIMEOUT,
+            random_drop=0,
+        )
+        ##Data socket of the connection
+        self.data_socket = DataSocketStub()
+        ##Connection under test
+        self.connection = self.rudp_manager.init_connection(
+            rudp_exit=("127.0.0.1", 9),
+            initiator=("127.0.0.1", 1),
+            endpoint=("127.0.0.1", 2),
+            data_socket=self.data_socket,
+        )
+        self.connection.set_version(constants._PROTOCOL_VERSION)
+        self.connection._connection_state = RUDPConnection._READY_FOR_SEND
+
+    ##Tears down the RUDP manager.
+    def tearDown(self):
+        self.async_manager.terminate()
+
+    ##Receives a packet on the connection.
+    # @param flag (int) flag
+    # @param sqn_num (int) sequence number
+    # @param data (string) data
+    def receive(self, flag, sqn_num, data):
+        self.connection.receive_datagram({
+            RUDPConnection._VERSION: constants._PROTOCOL_VERSION,
+            RUDPConnection._CID: self.connection._cid,
+            RUDPConnection._FLAG: flag,
+            RUDPConnection._SQN_NUM: sqn_num,
+            RUDPConnection._DATA: data,
+        })
+
+    ##Parity packets too short for their header, or of empty or oversized
+    #blocks, are dropped.
+    def test_invalid_parity(self):
+        self.receive(RUDPConnection._FLAG_FEC, 0, "\x02")
+        self.receive(RUDPConnection._FLAG_FEC, 0, RUDPConnection._FEC_HEADER.pack(0, 0))
+        self.receive(
+            RUDPConnection._FLAG_FEC,
+            0,
+            RUDPConnection._FEC_HEADER.pack(constants._FEC_MAX_BLOCK + 1, 0),
+        )
+        self.assertEqual(self.data_socket.received, [])
+        self.assertEqual(self.connection._packets_rebuilt, 0)
+
+    ##Receives the parity packet of a block of data packets.
+    # @param first (int) sequence number of the first packet of the block
+    # @param data (list) data of the packets of the block
+    def receive_parity(self, first, data):
+        lengths = 0
+        for d in data:
+            lengths ^= len(d)
+        self.receive(
+            RUDPConnection._FLAG_FEC,
+            first,
+            RUDPConnection._FEC_HEADER.pack(len(data), lengths) + util.xor_strings(data),
+        )
+
+    ##A data packet lost from a block of packets of different lengths is
+    #rebuilt from parity, shorter or longer than the others.
+    def test_rebuild(self):
+        self.receive(RUDPConnection._FLAG_DATA, 0, "x")
+        self.receive(RUDPConnection._FLAG_DATA, 1, "y")
+        self.receive_parity(0, ["x", "y"])
+        self.receive(RUDPConnection._FLAG_DATA, 2, "abc")
+        self.receive(RUDPConnection._FLAG_DATA, 4, "fghij")
+        self.receive_parity(2, ["abc", "de", "fghij"])
+        self.receive(RUDPConnection._FLAG_DATA, 5, "k")
+        self.receive_parity(5, ["k", "lmnopq"])
+        self.assertEqual(
+            self.data_socket.received,
+            ["x", "y", "abc", "de", "fghij", "k", "lmnopq"],
+        )
+        self.assertEqual(self.connection._packets_rebuilt, 2)
+        self.assertEqual(self.connection._peer_sequence_num, 6)
+
+
+## Closing test
+#
+# Feeds closing packets to an established connection.
+#
+class CloseTest(unittest.TestCase):
+
+    ##Sets up an RUDP manager and a connection that speaks sequenced
+    #closing packets.
+    def setUp(self):
+        ##Poller object
+        self.async_manager = asyncio.Poller(
+            type=asyncio.MAP[asyncio.default_poller_type()],
+            timeout=constants._TIMEOUT,
+        )
+        ##RUDP manager under test
+        self.rudp_manager = RUDPManager(
+            async_manager=self.async_manager,
+            bind_address=("127.0.0.1", 0),
+            timeout=constants._TIMEOUT,
+            random_drop=0,
+        )
+        ##Data socket of the connection
+        self.data_socket = DataSocketStub()
+        ##Connection under test
+        self.connection = self.rudp_manager.init_connection(
+            rudp_exit=("127.0.0.1", 9),
+            initiator=("127.0.0.1", 1),
+            endpoint=("127.0.0.1", 2),
+            data_socket=self.data_socket,
+        )
+        self.connection.set_version(constants._CLOSE_VERSION)
+        self.connection._connection_state = RUDPConnection._READY_FOR_SEND
+
+    ##Tears down the RUDP manager.
+    def tearDown(self):
+        self.async_manager.terminate()
+
+    ##Receives a packet on the connection.
+    # @param flag (int) flag
+    # @param sqn_num (int) sequence number
+    # @param data (string) data
+    def receive(self, flag, sqn_num, data):
+        self.connection.receive_datagram({
+            RUDPConnection._VERSION: constants._CLOSE_VERSION,
+            RUDPConnection._CID: self.connection._cid,
+            RUDPConnection._FLAG: flag,
+            RUDPConnection._SQN_NUM: sqn_num,
+            RUDPConnection._DATA: data,
+        })
+
+    ##A closing packet that overtakes data waits for the data, and is
+    #acked once received.
+    def test_close_in_order(self):
+        self.receive(RUDPConnection._FLAG_DATA, 0, "a")
+        self.receive(RUDPConnection._FLAG_CLOSE, 2, "")
+        self.assertFalse(self.connection._closing)
+        self.receive(RUDPConnection._FLAG_DATA, 1, "b")
+        self.assertEqual(self.data_socket.received, ["a", "b"])
+        self.assertTrue(self.connection._closing)
+        connection, datagram, params = self.rudp_manager._queued_datagrams[-1][2][-1]
+        self.assertEqual(params[RUDPConnection._FLAG], RUDPConnection._FLAG_ACK)
+        self.assertEqual(params[RUDPConnection._SQN_NUM], 2)
+
+    ##A closing packet that aborts the connection is received at once.
+    def test_abort(self):
+        self.receive(RUDPConnection._FLAG_DATA, 0, "a")
+        self.receive(RUDPConnection._FLAG_CLOSE, 2, RUDPConnection._ABORT_DATA)
+        self.assertTrue(self.connection._closing)
+
+
+## Upload then close test
+#
+# A user uploads through two RUDP servers over a lossy link, and
+# disconnects right after writing its data.
+#
+class UploadCloseTest(unittest.TestCase):
+
+    ##Sets up two RUDP managers that drop packets, a data listener on the
+    #entry one, and a target user listening behind the exit one.
+    def setUp(self):
+        random.seed(1)
+        ##Poller object
+        self.async_manager = asyncio.Poller(
+            type=asyncio.MAP[asyncio.default_poller_type()],
+            timeout=constants._TIMEOUT,
+        )
+        ##Entry RUDP manager
+        self.entry = RUDPManager(
+            async_manager=self.async_manager,
+            bind_address=("127.0.0.1", 0),
+            timeout=constants._TIMEOUT,
+            random_drop=10,
+        )
+        ##Exit RUDP manager
+        self.exit = RUDPManager(
+            async_manager=self.async_manager,
+            bind_address=("127.0.0.1", 0),
+            timeout=constants._TIMEOUT,
+            random_drop=10,
+        )
+        ##Listening socket of the target user
+        self.target = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.target.bind(("127.0.0.1", 0))
+        self.target.listen(1)
+        self.target.setblocking(0)
+        ##Data listener of the entry server
+        self.listener = DataListener(
+            bind_address=("127.0.0.1", 0),
+            exit_address=self.exit._s.getsockname(),
+            dest_address=self.target.getsockname(),
+            async_manager=self.async_manager,
+            rudp_manager=self.entry,
+            timeout=constants._TIMEOUT,
+            block_size=constants._DATA_BLOCK_SIZE,
+            buff_limit=constants._DATA_BUFF_LIMIT,
+            ttl=0,
+        )
+
+    ##Tears down the managers and the sockets.
+    def tearDown(self):
+        self.async_manager.terminate()
+        self.target.close()
+
+    ##Data written right before the user disconnects reaches the target
+    #user whole, before the target user is disconnected.
+    def test_upload_close(self):
+        sent = "".join(chr(ord("a") + i % 26) * 1000 for i in range(200))
+        user = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        user.connect(self.listener._s.getsockname())
+        user.setblocking(0)
+        left = sent
+        target = None
+        received = []
+        deadline = timers.now() + 60000
+        while timers.now() < deadline:
+            run_once(self.async_manager, 10)
+            if user is not None:
+                try:
+                    left = left[user.send(left):]
+                except socket.error as e:
+                    if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
+                        raise
+                if not left:
+                    user.close()
+                    user = None
+            if target is None:
+                try:
+                    target = self.target.accept()[0]
+                    target.setblocking(0)
+                except socket.error as e:
+                    if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
+                        raise
+                    continue
+            try:
+                buf = target.recv(constants._DATA_BLOCK_SIZE)
+            except socket.error as e:
+                if e.errno not in (errno.EWOULDBLOCK, errno.EAGAIN):
+                    raise
+                continue
+            if not buf:
+                break
+            received.append(buf)
+        if target is not None:
+            target.close()
+        received = "".join(received)
+        self.assertEqual(len(received), len(sent))
+        self.assertEqual(received, sent)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Test_Unit.test_rudpmanager
+## @file test_rudpmanager.py Implementation of @ref Reliable-UDP.Test_Unit.test_rudpmanager
+
+import errno
+import socket
+import unittest
+from ..Common import asyncio
+from ..Common import batchio
+from ..Common import constants
+from ..Server.rudpconnection import RUDPConnection
+from ..Server.rudpmanager import RUDPManager
+from test_rudpconnection import DataSocketStub
+
+## Small MTU socket stub
+#
+# Stands for a UDP socket on a path with a small MTU: datagrams larger
+# than the MTU are refused like the kernel does with the don't fragment
+# flag set.
+#
+class SmallMTUSocket(object):
+
+    ##Init SmallMTUSocket
+    # @param mtu (int) largest datagram size passing
+    # @returns (SmallMTUSocket) SmallMTUSocket object
+    def __init__(self, mtu):
+        ##Largest datagram size passing
+        self._mtu = mtu
+        ##Datagrams sent
+        self.sent = []
+
+    ##Sends a datagram, or refuses it as too large.
+    # @param data (string) datagram
+    # @param address (tuple) address
+    def sendto(self, data, address):
+        if len(data) > self._mtu:
+            raise socket.error(errno.EMSGSIZE, "Message too long")
+        self.sent.append(data)
+
+
+## Path MTU discovery test
+#
+# Probes a path whose MTU is smaller than the probe sizes.
+#
+class SmallMTUTest(unittest.TestCase):
+
+    ##Sets up an RUDP manager sending on a small MTU path.
+    def setUp(self):
+        ##Poller object
+        self.async_manager = asyncio.Poller(
+            type=asyncio.MAP[asyncio.default_poller_type()],
+            timeout=constants._TIMEOUT,
+        )
+        ##RUDP manager under test
+        self.rudp_manager = RUDPManager(
+            async_manager=self.async_manager,
+            bind_address=("127.0.0.1", 0),
+            timeout=constants._TIMEOUT,
+            random_drop=0,
+        )
+        ##Socket of the small MTU path
+        self.socket = SmallMTUSocket(1400)
+        self.rudp_manager._sender = batchio.LoopSender(self.socket, constants._SEND_BATCH)
+
+    ##Tears down the RUDP manager.
+    def tearDown(self):
+        self.async_manager.terminate()
+
+    ##Probes refused by the socket fail without stopping the manager, and
+    #the session keeps the base datagram size.
+    def test_probe_refused(self):
+        peer = ("127.0.0.1", 9)
+        connection = self.rudp_manager.init_connection(
+            rudp_exit=peer,
+            initiator=("127.0.0.1", 1),
+            endpoint=("127.0.0.1", 2),
+            data_socket=DataSocketStub(),
+        )
+        connection.set_version(constants._PROTOCOL_VERSION)
+        session = self.rudp_manager._sessions[peer]
+        session.start_probing()
+        self.rudp_manager.write()
+        self.assertFalse(self.rudp_manager._queued_datagrams)
+        self.assertEqual(len(self.socket.sent), 1)
+        self.assertEqual(session.max_datagram_size, constants._BASE_DATAGRAM_SIZE)
+        self.assertIsNone(session._probe_size)
+        self.assertTrue(session._probe_deadline.pending)
+
+
+## Session lifetime test
+#
+# Sessions exist only while they have connections.
+#
+class SessionTest(unittest.TestCase):
+
+    ##Sets up an RUDP manager.
+    def setUp(self):
+        ##Poller object
+        self.async_manager = asyncio.Poller(
+            type=asyncio.MAP[asyncio.default_poller_type()],
+            timeout=constants._TIMEOUT,
+        )
+        ##RUDP manager under test
+        self.rudp_manager = RUDPManager(
+            async_manager=self.async_manager,
+            bind_address=("127.0.0.1", 0),
+            timeout=constants._TIMEOUT,
+            random_drop=0,
+        )
+
+    ##Tears down the RUDP manager.
+    def tearDown(self):
+        self.async_manager.terminate()
+
+    ##Packets from unknown addresses that are not init packets create
+    #no session.
+    def test_unknown_packet(self):
+        content = "%04x%01x%04x%s" % (0, RUDPConnection._FLAG_DATA, 1, "data")
+        self.rudp_manager.receive_datagram("%04x%s" % (len(content), content), ("127.0.0.1", 9))
+        self.assertEqual(self.rudp_manager._sessions, {})
+
+    ##The session is removed with its last connection, and its timers
+    #are cancelled.
+    def test_last_connection_closed(self):
+        peer = ("127.0.0.1", 9)
+        connections = [
+            self.rudp_manager.init_connection(
+                rudp_exit=peer,
+                initiator=("127.0.0.1", 1),
+                endpoint=("127.0.0.1", 2),
+                data_socket=DataSocketStub(),
+            ) for i in range(2)
+        ]
+        session = self.rudp_manager._sessions[peer]
+        self.rudp_manager.close_connection(connections[0])
+        self.assertIs(self.rudp_manager._sessions[peer], session)
+        self.rudp_manager.close_connection(connections[1])
+        self.assertNotIn(peer, self.rudp_manager._sessions)
+        self.assertFalse(session._heartbeat_deadline.pending)
+        self.assertFalse(session._probe_deadline.pending)
+
+if __name__ == "__main__":
+    unittest.main()
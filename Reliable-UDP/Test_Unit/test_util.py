@@ -0,0 +1,43 @@
+#!/usr/bin/python
+
+## @package Reliable-UDP.Test_Unit.test_util
+## @file test_util.py Implementation of @ref Reliable-UDP.Test_Unit.test_util
+
+import unittest
+from ..Common import constants
+from ..Common import util
+
+## Serial number test
+#
+# Unwraps sequence numbers across the wrap of their width on the wire.
+#
+class SerialTest(unittest.TestCase):
+
+    ##Checks unwrapping around the wrap of a width.
+    # @param bits (int) width of serial numbers in bits
+    def check_wrap(self, bits):
+        wrap = 1 << bits
+        mask = wrap - 1
+        for reference in (wrap - 2, wrap - 1, wrap, wrap + 1, 3 * wrap - 1):
+            for sqn in range(reference - 3, reference + 4):
+                self.assertEqual(util.serial_diff(sqn & mask, reference & mask, bits), sqn - reference)
+                self.assertEqual(util.serial_unwrap(sqn & mask, reference, bits), sqn)
+
+    ##Legacy sequence numbers unwrap across the 16-bit wrap.
+    def test_legacy_wrap(self):
+        self.check_wrap(constants._LEGACY_SQN_BITS)
+
+    ##Binary sequence numbers unwrap across the 32-bit wrap.
+    def test_binary_wrap(self):
+        self.check_wrap(constants._SQN_BITS)
+
+    ##Numbers half the space ahead are taken as behind.
+    def test_half_space(self):
+        bits = constants._LEGACY_SQN_BITS
+        half = 1 << (bits - 1)
+        self.assertEqual(util.serial_diff(half - 1, 0, bits), half - 1)
+        self.assertEqual(util.serial_diff(half, 0, bits), -half)
+        self.assertEqual(util.serial_unwrap(half, 1 << bits, bits), half)
+
+if __name__ == "__main__":
+    unittest.main()